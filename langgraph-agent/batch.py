@@ -0,0 +1,195 @@
+# batch.py
+"""
+Enterprise Ops Copilot — Batch Runner
+Runs many questions through copilot_graph with bounded concurrency.
+
+Same-tier LLM calls issued by concurrent runs (e.g. every route_intent
+Tier 0 call) are collected for a few milliseconds and sent as one
+llm.abatch() call. Results are yielded in completion order.
+
+Usage:
+    async for item in arun_batch(["What is the refund policy?", ...], concurrency=8):
+        print(item["index"], item["total_cost"])
+"""
+from __future__ import annotations
+import asyncio
+from typing import Any, AsyncIterator, Iterable, Optional
+from langchain_core.messages import HumanMessage
+from llm_selector import base_llm, use_llm_factory
+from tokens import run_usage
+from config import BATCH_CONCURRENCY, LLM_BATCH_MAX_SIZE, LLM_BATCH_WAIT_MS
+
+
+# ── LLM Call Batching ────────────────────────────────────────────
+
+class LLMBatcher:
+    """Groups concurrent same-tier ainvoke() calls into llm.abatch() calls.
+
+    A batch is flushed when it reaches max_batch_size prompts or when
+    max_wait_ms has passed since its first prompt arrived. Only calls with
+    the same call options (stop, response_format, ...) share a batch; each
+    prompt keeps its own run config (callbacks, tags) within it.
+    """
+
+    def __init__(self, max_batch_size: int = LLM_BATCH_MAX_SIZE, max_wait_ms: float = LLM_BATCH_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: dict[tuple, list[tuple[list, Optional[dict], asyncio.Future]]] = {}
+        self._options: dict[tuple, dict[str, Any]] = {}     # batch key → call options
+        self._timers: dict[tuple, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.stats = {"calls": 0, "batches": 0}
+
+    def llm(self, tier: int) -> "BatchedLLM":
+        """LLM facade for get_llm() — see llm_selector.use_llm_factory."""
+        return BatchedLLM(self, tier)
+
+    async def submit(self, tier: int, messages: list, config: Optional[dict] = None, options: Optional[dict] = None):
+        """Queue one prompt and wait for its response."""
+        options = options or {}
+        key = (tier, *sorted((name, repr(value)) for name, value in options.items()))
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((messages, config, future))
+        self._options.setdefault(key, options)
+        self.stats["calls"] += 1
+
+        if len(pending) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait_ms / 1000, self._flush, key)
+        return await future
+
+    def _flush(self, key: tuple) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        options = self._options.pop(key, {})
+        if not batch:
+            return
+        self.stats["batches"] += 1
+        task = asyncio.ensure_future(self._dispatch(key[0], options, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, tier: int, options: dict[str, Any], batch: list[tuple[list, Optional[dict], asyncio.Future]]) -> None:
+        llm = base_llm(tier)
+        configs = [config for _, config, _ in batch]
+        try:
+            responses = await llm.abatch(
+                [messages for messages, _, _ in batch],
+                config=configs if any(configs) else None,
+                return_exceptions=True,
+                **options,
+            )
+        except Exception as e:
+            responses = [e] * len(batch)
+        for (_, _, future), response in zip(batch, responses):
+            if future.done():
+                continue
+            if isinstance(response, Exception):
+                future.set_exception(response)
+            else:
+                future.set_result(response)
+
+
+class BatchedLLM:
+    """Per-tier LLM facade that sends ainvoke()/astream() through an LLMBatcher.
+
+    Call options and config are forwarded (see LLMBatcher). bind_tools() and
+    with_structured_output() return the tier's model bound as asked; calls
+    through them go to the model directly, unbatched.
+    """
+
+    def __init__(self, batcher: LLMBatcher, tier: int):
+        self.batcher = batcher
+        self.tier = tier
+
+    def invoke(self, messages: list, **kwargs):
+        # Sync callers can't join an async batch — call the model directly
+        return base_llm(self.tier).invoke(messages, **kwargs)
+
+    async def ainvoke(self, messages: list, config: Optional[dict] = None, **kwargs):
+        return await self.batcher.submit(self.tier, messages, config, kwargs)
+
+    async def astream(self, messages: list, config: Optional[dict] = None, **kwargs):
+        # Batched calls complete as a whole; emit the response as a single chunk
+        yield await self.batcher.submit(self.tier, messages, config, kwargs)
+
+    def bind_tools(self, tools: list, **kwargs):
+        return base_llm(self.tier).bind_tools(tools, **kwargs)
+
+    def with_structured_output(self, schema, **kwargs):
+        return base_llm(self.tier).with_structured_output(schema, **kwargs)
+
+
+# ── Batch Runner ─────────────────────────────────────────────────
+
+async def arun_batch(
+    questions: Iterable[str],
+    concurrency: int = BATCH_CONCURRENCY,
+    batch_llm_calls: bool = True,
+    graph=None,
+    caller: Optional[dict[str, Any]] = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Run every question through the graph, yielding results as they complete.
+
+    caller ({session_id, tenant_id, user_role}) goes into every run's
+    initial state, so the budget ledger charges each run to those accounts.
+
+    Each item: {index, question, final_answer, intent, llm_tier, risk_level,
+    total_cost, usage, citations, trace_log, error}.
+    """
+    if graph is None:
+        from graph import copilot_graph as graph
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    batcher = LLMBatcher() if batch_llm_calls else None
+
+    async def run_one(index: int, question: str) -> dict[str, Any]:
+        async with semaphore:
+            item = {"index": index, "question": question, "error": None}
+            initial_state = {
+                "messages": [HumanMessage(content=question)],
+                **(caller or {}),
+            }
+            try:
+                if batcher is not None:
+                    with use_llm_factory(batcher.llm):
+                        result = await graph.ainvoke(initial_state)
+                else:
+                    result = await graph.ainvoke(initial_state)
+            except Exception as e:
+                item.update({"final_answer": None, "total_cost": 0.0, "trace_log": [], "error": str(e)})
+                return item
+
+            item.update({
+                "final_answer": result.get("final_answer"),
+                "intent": result.get("intent"),
+                "llm_tier": result.get("llm_tier"),
+                "risk_level": result.get("risk_level"),
+                "total_cost": result.get("total_cost", 0.0),
+                "usage": run_usage(result.get("trace_log", [])),
+                "citations": result.get("citations", []),
+                "trace_log": result.get("trace_log", []),
+            })
+            return item
+
+    tasks = [asyncio.create_task(run_one(i, q)) for i, q in enumerate(questions)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def run_batch(questions: Iterable[str], **kwargs) -> list[dict[str, Any]]:
+    """Sync wrapper around arun_batch(); returns results ordered by index."""
+
+    async def collect():
+        return [item async for item in arun_batch(questions, **kwargs)]
+
+    return sorted(asyncio.run(collect()), key=lambda item: item["index"])
@@ -0,0 +1,91 @@
+"""
+Benchmark: throughput and latency per worker vs concurrency, with simulated model timing.
+
+Runs copilot_graph.ainvoke on one event loop (one uvicorn worker) with
+MOCK_LLM_SIMULATE on: every LLM call waits a time to first token drawn
+per tier plus decode time for its output tokens, and --error-rate /
+--timeout-rate of calls fail. For each concurrency level it reports
+requests/sec, end-to-end p50/p95/p99 and failed requests — a rough
+capacity curve without an API key.
+
+Usage (from langgraph-agent/):
+    python benchmarks/bench_capacity.py --requests 200 --concurrency 1,8,32,128
+    python benchmarks/bench_capacity.py --error-rate 0.02 --timeout-rate 0.005 --timeout-s 5
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+QUESTIONS = [
+    "What is the refund policy? Cite sources.",
+    "Is this medical claim HIPAA compliant?",
+    "Summarize the escalation matrix",
+    "Calculate 25000 * 0.85",
+]
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+async def _run(graph, n: int, concurrency: int) -> tuple[float, list[float], int]:
+    from langchain_core.messages import HumanMessage
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one(i: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await graph.ainvoke({"messages": [HumanMessage(content=QUESTIONS[i % len(QUESTIONS)])]})
+            except Exception:
+                failures += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return time.perf_counter() - start, latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--concurrency", default="1,8,32,128", help="comma-separated in-flight limits")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of LLM calls that fail")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="share of LLM calls that time out")
+    parser.add_argument("--timeout-s", type=float, default=5.0, help="LLM_TIMEOUT_S for simulated timeouts")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ.update(
+        MOCK_LLM="true",
+        MOCK_LLM_SIMULATE="true",
+        MOCK_ERROR_RATE=str(args.error_rate),
+        MOCK_TIMEOUT_RATE=str(args.timeout_rate),
+        LLM_TIMEOUT_S=str(args.timeout_s),
+        MOCK_SEED=str(args.seed),
+    )
+    from graph import copilot_graph
+
+    print(f"{args.requests} requests per level, error rate {args.error_rate:.1%}, "
+          f"timeout rate {args.timeout_rate:.1%} ({args.timeout_s:g}s)")
+    print(f"{'concurrency':>12}{'req/s':>9}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}{'failed':>8}")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        elapsed, latencies, failures = asyncio.run(_run(copilot_graph, args.requests, concurrency))
+        ok = latencies or [0.0]
+        print(f"{concurrency:>12}{len(latencies) / elapsed:>9.1f}{_percentile(ok, 50):>8.2f}"
+              f"{_percentile(ok, 95):>8.2f}{_percentile(ok, 99):>8.2f}{failures:>8}")
+
+
+if __name__ == "__main__":
+    main()
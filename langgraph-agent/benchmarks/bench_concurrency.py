@@ -0,0 +1,70 @@
+"""
+Benchmark: requests/sec per worker, blocking invoke() vs native ainvoke().
+
+Simulates one uvicorn worker: N concurrent requests share a single event loop.
+"before" mirrors the old handler (sync copilot_graph.invoke inside async def),
+"after" awaits copilot_graph.ainvoke. MockLLM latency is injected so the
+numbers reflect I/O-bound behavior.
+
+Usage (from langgraph-agent/):
+    python benchmarks/bench_concurrency.py --requests 50 --latency-ms 50
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+QUESTIONS = [
+    "What is the refund policy? Cite sources.",
+    "Is this medical claim HIPAA compliant?",
+    "Summarize the escalation matrix",
+    "Calculate 25000 * 0.85",
+]
+
+
+async def _blocking_handler(graph, question: str) -> dict:
+    from langchain_core.messages import HumanMessage
+    return graph.invoke({"messages": [HumanMessage(content=question)]})
+
+
+async def _async_handler(graph, question: str) -> dict:
+    from langchain_core.messages import HumanMessage
+    return await graph.ainvoke({"messages": [HumanMessage(content=question)]})
+
+
+async def _run(handler, graph, n: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(graph, QUESTIONS[i % len(QUESTIONS)]) for i in range(n)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="concurrent requests per run")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="injected MockLLM latency per call")
+    args = parser.parse_args()
+
+    os.environ["MOCK_LLM"] = "true"
+    os.environ["MOCK_LLM_LATENCY_MS"] = str(args.latency_ms)
+    from graph import copilot_graph
+
+    # Warm up both paths once
+    asyncio.run(_run(_blocking_handler, copilot_graph, 1))
+    asyncio.run(_run(_async_handler, copilot_graph, 1))
+
+    before = asyncio.run(_run(_blocking_handler, copilot_graph, args.requests))
+    after = asyncio.run(_run(_async_handler, copilot_graph, args.requests))
+
+    print(f"{args.requests} concurrent requests, MockLLM latency {args.latency_ms:.0f} ms/call")
+    print(f"  before (blocking invoke): {before:7.3f}s  {args.requests / before:8.1f} req/s")
+    print(f"  after  (ainvoke):         {after:7.3f}s  {args.requests / after:8.1f} req/s")
+    print(f"  speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
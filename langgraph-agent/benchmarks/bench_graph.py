@@ -0,0 +1,263 @@
+"""
+Benchmark: copilot_graph end to end, per node — latency, allocations, peak memory.
+
+Drives the graph offline (MockLLM, no injected latency) over a fixed
+corpus that covers every branch: Q&A, compliance, summarize (single call
+and map-reduce), LLM-planned actions and a structured dispatch. Node
+boundaries come from LangGraph's callback events, so nothing in the
+graph is instrumented.
+
+Two passes:
+  timing  wall time per node and per run (p50/p95/p99), tracing off
+  memory  tracemalloc on: per node, net allocated blocks and the peak
+          traced memory above the node's starting point
+
+Results are compared with a stored baseline; any metric worse than the
+baseline by more than --threshold (and by more than the noise floor)
+is reported as a regression and the script exits with status 1.
+Baselines are machine-specific — refresh with --save-baseline after a
+hardware or Python change, or on purpose after an accepted slowdown.
+
+Usage (from langgraph-agent/):
+    python benchmarks/bench_graph.py                       # compare with benchmarks/baselines/graph.json
+    python benchmarks/bench_graph.py --iterations 50 --save-baseline
+    python benchmarks/bench_graph.py --mode async --threshold 0.3
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "graph.json")
+
+LONG_CASE_HISTORY = "\n\n".join(
+    " ".join(f"Day {d}: customer reported export job failure E{d}{i}; agent restarted the worker and "
+             f"asked for logs." for i in range(25))
+    for d in range(8)
+)
+
+# (label, question, extra initial state)
+CORPUS = [
+    ("qa", "What is the refund policy? Cite sources.", {}),
+    ("qa_case", "What is the escalation process for P1 incidents?", {}),
+    ("compliance", "Is this medical claim HIPAA compliant?", {}),
+    ("summarize", "Summarize the escalation matrix", {}),
+    ("summarize_long", "Summarize this case history:\n\n" + LONG_CASE_HISTORY, {}),
+    ("action_calc", "Calculate 25000 * 0.85", {}),
+    ("action_jira", "Create a Jira ticket for login bug on mobile", {}),
+    ("action_cpq", "CPQ checklist for Enterprise Suite", {}),
+    ("dispatch", "[ACTION: calculator] {\"expression\": \"2+2\"}", {
+        "dispatch": {"tool": "calculator", "params": {"expression": "2+2"}, "message_id": "bench-dispatch"},
+        "intent": "action", "required_tools": ["calculator"], "llm_tier": 0, "risk_level": "low",
+    }),
+]
+
+# Metrics compared with the baseline, and the absolute change below which a difference is noise
+COMPARED = {"p50_ms": 0.05, "p95_ms": 0.1, "peak_kib": 16.0}
+
+
+# ── Node instrumentation ─────────────────────────────────────────
+
+def _node_timer_class():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class NodeTimer(BaseCallbackHandler):
+        """Collects per-node wall time (and, with tracemalloc on, memory) from callback events."""
+
+        def __init__(self, trace_memory: bool = False):
+            self.trace_memory = trace_memory
+            self._open: dict = {}
+            self.samples: dict[str, list[float]] = defaultdict(list)
+            self.blocks: dict[str, list[int]] = defaultdict(list)
+            self.peaks: dict[str, list[int]] = defaultdict(list)
+
+        def on_chain_start(self, serialized, inputs, *, run_id, tags=None, metadata=None, **kwargs):
+            node = (metadata or {}).get("langgraph_node")
+            # Node runnables carry a graph:step tag; their inner steps share the node name but not the tag
+            if node is None or kwargs.get("name") != node or not any(t.startswith("graph:step:") for t in tags or ()):
+                return
+            start_mem = 0
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+                start_mem = tracemalloc.get_traced_memory()[0]
+            self._open[run_id] = (node, time.perf_counter(), sys.getallocatedblocks(), start_mem)
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            opened = self._open.pop(run_id, None)
+            if opened is None:
+                return
+            node, start, start_blocks, start_mem = opened
+            self.samples[node].append((time.perf_counter() - start) * 1000)
+            if self.trace_memory:
+                self.blocks[node].append(sys.getallocatedblocks() - start_blocks)
+                self.peaks[node].append(tracemalloc.get_traced_memory()[1] - start_mem)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self._open.pop(run_id, None)
+
+    return NodeTimer
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def _initial_state(question: str, extra: dict) -> dict:
+    from langchain_core.messages import HumanMessage
+    # A dispatch only applies to the message whose id it carries (graph._turn_dispatch)
+    message_id = extra.get("dispatch", {}).get("message_id")
+    return {"messages": [HumanMessage(content=question, id=message_id)], **extra}
+
+
+def _run_corpus(graph, timer, iterations: int, mode: str) -> list[float]:
+    """Run every corpus query `iterations` times; returns per-run wall times (ms)."""
+    config = {"callbacks": [timer]}
+    runs = []
+
+    async def arun(state):
+        return await graph.ainvoke(state, config=config)
+
+    for _ in range(iterations):
+        for _, question, extra in CORPUS:
+            state = _initial_state(question, extra)
+            start = time.perf_counter()
+            if mode == "async":
+                asyncio.run(arun(state))
+            else:
+                graph.invoke(state, config=config)
+            runs.append((time.perf_counter() - start) * 1000)
+    return runs
+
+
+# ── Measurement ──────────────────────────────────────────────────
+
+def measure(iterations: int, mode: str) -> dict:
+    from graph import copilot_graph
+    NodeTimer = _node_timer_class()
+
+    _run_corpus(copilot_graph, NodeTimer(), 2, mode)   # warm caches, clients, lazy imports
+
+    timer = NodeTimer()
+    runs = _run_corpus(copilot_graph, timer, iterations, mode)
+
+    memory = NodeTimer(trace_memory=True)
+    tracemalloc.start()
+    try:
+        _run_corpus(copilot_graph, memory, max(1, iterations // 5), mode)
+    finally:
+        tracemalloc.stop()
+
+    nodes = {}
+    for node, samples in sorted(timer.samples.items()):
+        nodes[node] = {
+            "calls": len(samples),
+            "p50_ms": round(_percentile(samples, 50), 4),
+            "p95_ms": round(_percentile(samples, 95), 4),
+            "p99_ms": round(_percentile(samples, 99), 4),
+            "blocks": int(_percentile(memory.blocks[node], 50)) if memory.blocks[node] else 0,
+            "peak_kib": round(max(memory.peaks[node]) / 1024, 1) if memory.peaks[node] else 0.0,
+        }
+    nodes["(graph run)"] = {
+        "calls": len(runs),
+        "p50_ms": round(_percentile(runs, 50), 4),
+        "p95_ms": round(_percentile(runs, 95), 4),
+        "p99_ms": round(_percentile(runs, 99), 4),
+        "blocks": 0,
+        "peak_kib": 0.0,
+    }
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "mode": mode,
+            "iterations": iterations,
+            "corpus": [label for label, _, _ in CORPUS],
+        },
+        "nodes": nodes,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Regressions of current vs baseline, as printable lines."""
+    regressions = []
+    for node, metrics in current["nodes"].items():
+        base = baseline.get("nodes", {}).get(node)
+        if base is None:
+            continue
+        for metric, noise in COMPARED.items():
+            now, then = metrics.get(metric, 0), base.get(metric, 0)
+            if now - then > noise and now > then * (1 + threshold):
+                regressions.append(f"{node:<24}{metric:<10}{then:>10.3f} → {now:>10.3f}  (+{(now / then - 1) if then else 1:.0%})")
+    return regressions
+
+
+def print_report(result: dict, baseline: dict | None) -> None:
+    meta = result["meta"]
+    print(f"copilot_graph ({meta['mode']}), {meta['iterations']} × {len(meta['corpus'])} queries, "
+          f"Python {meta['python']}")
+    print(f"{'node':<24}{'calls':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'blocks':>8}{'peak KiB':>10}{'Δp50':>8}")
+    for node, m in result["nodes"].items():
+        base = (baseline or {}).get("nodes", {}).get(node)
+        delta = f"{m['p50_ms'] / base['p50_ms'] - 1:+.0%}" if base and base["p50_ms"] else ""
+        print(f"{node:<24}{m['calls']:>6}{m['p50_ms']:>9.3f}{m['p95_ms']:>9.3f}{m['p99_ms']:>9.3f}"
+              f"{m['blocks']:>8}{m['peak_kib']:>10.1f}{delta:>8}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20, help="passes over the corpus (timing pass)")
+    parser.add_argument("--mode", choices=("sync", "async"), default="sync", help="invoke() or ainvoke()")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON path")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    args = parser.parse_args()
+
+    os.environ["MOCK_LLM"] = "true"
+    os.environ["MOCK_LLM_LATENCY_MS"] = "0"
+    os.environ["MOCK_PROMPT_CACHE"] = "false"
+
+    result = measure(args.iterations, args.mode)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("mode") != args.mode:
+            print(f"Baseline was recorded in {baseline['meta'].get('mode')} mode; not comparing.\n")
+            baseline = None
+
+    print_report(result, baseline)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+        return
+    if baseline is None:
+        print("\nNo baseline to compare with — run with --save-baseline to record one.")
+        return
+
+    regressions = compare(result, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print("  " + line)
+        sys.exit(1)
+    print(f"\nNo regressions beyond {args.threshold:.0%} vs baseline.")
+
+
+if __name__ == "__main__":
+    main()
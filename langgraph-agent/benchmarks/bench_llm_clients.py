@@ -0,0 +1,95 @@
+"""
+Benchmark: per-call LLM client overhead, fresh ChatOpenAI vs pooled get_llm().
+
+Starts a local stand-in OpenAI-compatible server (HTTP/1.1 keep-alive,
+canned chat.completion) so only client-side overhead is measured: client
+construction, connection setup and request/response handling.
+
+Usage (from langgraph-agent/):
+    python benchmarks/bench_llm_clients.py --calls 200
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "{\"intent\": \"qa\"}"}}],
+    "usage": {"prompt_tokens": 50, "completion_tokens": 10, "total_tokens": 60},
+}).encode()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    disable_nagle_algorithm = True
+    connections = set()
+
+    def do_POST(self):
+        StandInHandler.connections.add(self.client_address)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+def _time_calls(make_llm, calls: int) -> list[float]:
+    from langchain_core.messages import HumanMessage
+    prompt = [HumanMessage(content="What is the refund policy?")]
+    latencies = []
+    for _ in range(calls):
+        t = time.perf_counter()
+        make_llm().invoke(prompt)
+        latencies.append((time.perf_counter() - t) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    os.environ.update(MOCK_LLM="false", OPENAI_API_KEY="sk-bench", OPENAI_BASE_URL=base_url)
+    from langchain_openai import ChatOpenAI
+    import llm_selector
+
+    def fresh():
+        return ChatOpenAI(model="gpt-4o-mini", temperature=0.0, max_tokens=512, base_url=base_url)
+
+    results = {}
+    for name, make_llm in (("fresh ChatOpenAI per call", fresh), ("pooled get_llm(0)", lambda: llm_selector.get_llm(0))):
+        StandInHandler.connections = set()
+        _time_calls(make_llm, 5)   # warm-up
+        latencies = _time_calls(make_llm, args.calls)
+        results[name] = (latencies, len(StandInHandler.connections))
+
+    print(f"{args.calls} sequential calls against a local stand-in server")
+    for name, (latencies, conns) in results.items():
+        print(f"  {name:<28} mean {statistics.mean(latencies):6.3f} ms  "
+              f"p50 {statistics.median(latencies):6.3f} ms  TCP connections: {conns}")
+    print(f"  pool stats: {llm_selector.pool_stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark: BM25 inverted index vs the old per-query linear scan.
+
+Builds a synthetic corpus (Zipf-distributed vocabulary, ~40-word chunks),
+then measures index build time, query latency percentiles and incremental
+add/remove cost. With --dense it also builds an on-disk, memory-mapped
+dense index (HashingEmbedder) and times matmul + argpartition queries.
+With --corpus it writes the chunks as a memory-mapped Corpus and compares
+its open time, Python heap and query latency with the in-memory index.
+
+Usage (from langgraph-agent/):
+    python benchmarks/bench_search.py --chunks 100000 --queries 500 [--dense] [--corpus]
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from search_index import BM25Index
+
+
+def make_corpus(n_chunks: int, vocab_size: int = 20000, words_per_chunk: int = 40, seed: int = 7):
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    weights = [1.0 / (rank + 1) for rank in range(vocab_size)]   # Zipf
+    return [
+        {"id": f"CHUNK-{i}", "text": " ".join(rng.choices(vocab, weights, k=words_per_chunk)), "source": f"Synthetic {i}"}
+        for i in range(n_chunks)
+    ], vocab
+
+
+def linear_scan(docs: list[dict], query: str) -> list[dict]:
+    """The original search_docs algorithm."""
+    query_lower = query.lower()
+    scored = []
+    for doc in docs:
+        relevance = sum(1 for word in query_lower.split() if word in doc["text"].lower())
+        scored.append({**doc, "relevance": relevance})
+    return sorted(scored, key=lambda x: x["relevance"], reverse=True)[:3]
+
+
+def pct(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--scan-queries", type=int, default=3, help="queries to time with the old linear scan")
+    parser.add_argument("--dense", action="store_true", help="also benchmark the memory-mapped dense index")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--corpus", action="store_true", help="also benchmark the memory-mapped corpus")
+    args = parser.parse_args()
+
+    docs, vocab = make_corpus(args.chunks)
+    rng = random.Random(11)
+    # Queries mix mid-frequency and rare terms, like real support questions
+    queries = [" ".join(rng.choice(vocab[50:]) for _ in range(rng.randint(2, 5))) for _ in range(args.queries)]
+
+    index = BM25Index()
+    start = time.perf_counter()
+    for doc in docs:
+        index.add(doc["id"], doc["text"], doc)
+    build_s = time.perf_counter() - start
+
+    latencies = []
+    for q in queries:
+        t = time.perf_counter()
+        index.search(q, k=3)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    extra = make_corpus(1000, seed=99)[0]
+    t = time.perf_counter()
+    for doc in extra:
+        index.add("NEW-" + doc["id"], doc["text"], doc)
+    add_us = (time.perf_counter() - t) / len(extra) * 1e6
+    t = time.perf_counter()
+    for doc in extra:
+        index.remove("NEW-" + doc["id"])
+    remove_us = (time.perf_counter() - t) / len(extra) * 1e6
+
+    scan = []
+    for q in queries[: args.scan_queries]:
+        t = time.perf_counter()
+        linear_scan(docs, q)
+        scan.append((time.perf_counter() - t) * 1000)
+
+    print(f"corpus: {args.chunks:,} chunks, {len(index._postings):,} terms")
+    print(f"  index build:       {build_s:8.2f} s  ({args.chunks / build_s:,.0f} chunks/s)")
+    print(f"  BM25 query:        p50 {pct(latencies, 50):.3f} ms  p95 {pct(latencies, 95):.3f} ms  "
+          f"p99 {pct(latencies, 99):.3f} ms  mean {statistics.mean(latencies):.3f} ms")
+    print(f"  incremental add:   {add_us:8.1f} us/doc")
+    print(f"  incremental remove:{remove_us:8.1f} us/doc")
+    print(f"  old linear scan:   mean {statistics.mean(scan):.1f} ms/query ({len(scan)} queries)")
+
+    if args.dense:
+        bench_dense(docs, queries, args.dtype)
+    if args.corpus:
+        bench_corpus(docs, queries)
+
+
+def bench_dense(docs: list[dict], queries: list[str], dtype: str):
+    from search_index.dense import DenseIndex, HashingEmbedder
+
+    embedder = HashingEmbedder(dim=256)
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        DenseIndex.build(path, ((d["id"], d["text"]) for d in docs), embedder, count=len(docs), dtype=dtype)
+        build_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = DenseIndex.load(path, embedder)
+        load_ms = (time.perf_counter() - start) * 1000
+
+        latencies = []
+        for q in queries:
+            t = time.perf_counter()
+            index.search(q, k=3)
+            latencies.append((time.perf_counter() - t) * 1000)
+
+        print(f"dense ({dtype}, dim 256, mmap):")
+        print(f"  build (embed + write): {build_s:6.2f} s")
+        print(f"  load (mmap):           {load_ms:6.2f} ms")
+        print(f"  query:             p50 {pct(latencies, 50):.3f} ms  p95 {pct(latencies, 95):.3f} ms  "
+              f"p99 {pct(latencies, 99):.3f} ms")
+
+
+def bench_corpus(docs: list[dict], queries: list[str]):
+    import tracemalloc
+    from search_index.corpus import Corpus
+
+    tracemalloc.start()
+    index = BM25Index()
+    for doc in docs:
+        index.add(doc["id"], doc["text"], {"id": doc["id"], "text": doc["text"], "source": doc["source"]})
+    heap_mib = tracemalloc.get_traced_memory()[0] / 2**20
+    tracemalloc.stop()
+    del index
+
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        Corpus.build(path, iter(docs))
+        build_s = time.perf_counter() - start
+        disk_mib = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 2**20
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        corpus = Corpus.load(path)
+        load_ms = (time.perf_counter() - start) * 1000
+        corpus_kib = tracemalloc.get_traced_memory()[0] / 1024
+        tracemalloc.stop()
+
+        latencies = []
+        for q in queries:
+            t = time.perf_counter()
+            corpus.search(q, k=3)
+            latencies.append((time.perf_counter() - t) * 1000)
+
+        print("corpus (mmap, shared across workers):")
+        print(f"  build (write):         {build_s:6.2f} s  ({len(docs) / build_s:,.0f} chunks/s, {disk_mib:.1f} MiB on disk)")
+        print(f"  load (mmap):           {load_ms:6.2f} ms")
+        print(f"  Python heap:           {corpus_kib:6.1f} KiB  (in-memory BM25Index: {heap_mib:.1f} MiB per worker)")
+        print(f"  query:             p50 {pct(latencies, 50):.3f} ms  p95 {pct(latencies, 95):.3f} ms  "
+              f"p99 {pct(latencies, 99):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
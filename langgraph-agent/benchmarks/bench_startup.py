@@ -0,0 +1,130 @@
+"""
+Benchmark: cold start — import time, warm-up and first-request latency.
+
+Each repeat starts fresh interpreters (nothing cached in-process) and
+measures:
+
+  import server      time to `import server` (what uvicorn pays before
+                     /health answers); heavy libraries still unloaded after it
+  warm-up            warmup.warm_up() per step (what runs before /ready)
+  first request      first graph run in a process that skipped warm-up
+                     (pays the deferred imports and the compile) vs one
+                     that ran it, and a second, warm run for reference
+
+--importtime adds the slowest top-level imports of `import server` from
+`python -X importtime`. --max-import-s turns the median import time into
+a check (exit status 1 when over), e.g. for CI.
+
+Usage (from langgraph-agent/):
+    python benchmarks/bench_startup.py --repeats 5
+    python benchmarks/bench_startup.py --importtime --max-import-s 0.6
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+HEAVY_MODULES = ("langchain_core", "langgraph", "openai", "numpy", "tiktoken")
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import server
+result = {"import_s": time.perf_counter() - start,
+          "loaded": [m for m in %(heavy)r if m in sys.modules]}
+if %(warm)r:
+    from warmup import warm_up
+    start = time.perf_counter()
+    result["steps"] = warm_up()
+    result["warmup_s"] = time.perf_counter() - start
+for key in ("first_request_s", "warm_request_s"):
+    start = time.perf_counter()
+    from graph import get_graph
+    get_graph().invoke({"messages": [server._user_message("What is the refund policy? Cite sources.")]})
+    result[key] = time.perf_counter() - start
+print(json.dumps(result))
+"""
+
+
+def _env() -> dict[str, str]:
+    return {
+        **os.environ,
+        "MOCK_LLM": "true",
+        "MOCK_LLM_LATENCY_MS": "0",
+        "MOCK_LLM_SIMULATE": "false",
+        "WARMUP_ON_STARTUP": "false",
+        "CHECKPOINT_BACKEND": "memory",
+        "LEDGER_BACKEND": "memory",
+    }
+
+
+def _probe(warm: bool) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE % {"heavy": HEAVY_MODULES, "warm": warm}],
+        cwd=HERE, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _importtime(top: int) -> list[tuple[float, str]]:
+    """Slowest direct imports of `import server` by cumulative time (seconds, module)."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=HERE, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth != 1:   # only server's own imports; deeper ones count in their parent
+            continue
+        rows.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=5, help="fresh processes per measurement")
+    parser.add_argument("--importtime", action="store_true", help="list the slowest imports of server")
+    parser.add_argument("--top", type=int, default=12, help="rows shown with --importtime")
+    parser.add_argument("--max-import-s", type=float, default=None, help="fail when median import time exceeds this")
+    args = parser.parse_args()
+
+    cold = [_probe(warm=False) for _ in range(args.repeats)]
+    warm = [_probe(warm=True) for _ in range(args.repeats)]
+
+    def median(runs: list[dict], key: str) -> float:
+        return statistics.median(run[key] for run in runs)
+
+    import_s = statistics.median(run["import_s"] for run in cold + warm)
+    loaded = sorted({m for run in cold + warm for m in run["loaded"]})
+    print(f"median of {args.repeats} fresh processes each\n")
+    print(f"{'import server':<34}{import_s * 1000:>9.1f} ms   heavy modules loaded: {', '.join(loaded) or 'none'}")
+    print(f"{'warm-up':<34}{median(warm, 'warmup_s') * 1000:>9.1f} ms")
+    for step in warm[0]["steps"]:
+        print(f"  {step:<32}{statistics.median(run['steps'][step] for run in warm) * 1000:>9.1f} ms")
+    print(f"{'first request, no warm-up':<34}{median(cold, 'first_request_s') * 1000:>9.1f} ms")
+    print(f"{'first request, after warm-up':<34}{median(warm, 'first_request_s') * 1000:>9.1f} ms")
+    print(f"{'warm request':<34}{median(warm, 'warm_request_s') * 1000:>9.1f} ms")
+
+    if args.importtime:
+        print("\nslowest imports of `import server` (cumulative):")
+        for seconds, name in _importtime(args.top):
+            print(f"  {name:<32}{seconds * 1000:>9.1f} ms")
+
+    if args.max_import_s is not None and import_s > args.max_import_s:
+        print(f"\nFAIL: import server took {import_s:.3f}s (limit {args.max_import_s:.3f}s)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
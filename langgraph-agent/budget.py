@@ -3,31 +3,230 @@
 Enterprise Ops Copilot — Budget Guard
 Checks remaining budget before LLM calls.
 Can downgrade tier or stop execution if budget is exhausted.
+
+Two limits apply: MAX_BUDGET_PER_RUN to the current turn (cost since
+run_cost_start) and MAX_BUDGET_PER_SESSION to everything a checkpointed
+session has spent. Without a session both windows are the same run.
+
+Before the skill branch runs, the guard also prices its next LLM call
+from locally counted prompt tokens. If the worst case (output capped at
+TIER_MAX_TOKENS) would not fit in what is left, the call is downgraded
+to a cheaper tier or blocked up front instead of overspending. The
+estimate is stored in cost_estimate and compared with the node's actual
+usage in its trace entry (score_estimate).
+
+With a ledger (ledger.py), spend is also capped across requests per
+session, tenant and role within a tenant: the tightest account's headroom
+joins the limits above, calls at LEDGER_RESERVE_MIN_TIER or higher hold
+their worst-case cost on every account first, and final_response settles
+the run's actual cost (settle_ledger). A skill node that raises releases
+the hold on its way out (release_ledger), so a failed run never keeps
+headroom reserved until LEDGER_RESERVATION_TTL_S. Cheaper calls are only checked
+against headroom, so concurrent runs can overshoot by at most their
+lower-tier spend.
+
+Ledger calls can wait on another worker's transaction (SQLite busy
+timeout), so the async variants (abudget_guard, asettle_ledger,
+arelease_ledger) make them on a worker thread, never on the event loop.
 """
 from __future__ import annotations
+import asyncio
+import math
+from functools import lru_cache
+from typing import Optional
 from state import AgentState
-from config import MAX_BUDGET_PER_RUN, BUDGET_WARNING_PCT, GRACEFUL_DEGRADE
+from llm_selector import estimate_cost
+from prompts.registry import prompt_registry
+from skills.compaction import conversation_context
+from skills.summarizer import estimate_summary_tokens
+from tokens import count_message_tokens, count_prompt_tokens, message_text
+from ledger import BudgetLedger, build_ledger
+from config import (
+    MAX_BUDGET_PER_RUN,
+    MAX_BUDGET_PER_SESSION,
+    BUDGET_WARNING_PCT,
+    GRACEFUL_DEGRADE,
+    TIER_MODELS,
+    TIER_MAX_TOKENS,
+    TIER_CONTEXT_TOKENS,
+    EXPECTED_OUTPUT_TOKENS,
+    LEDGER_RESERVE_MIN_TIER,
+    MAX_BUDGET_PER_TENANT,
+    ROLE_BUDGETS,
+)
+
+# LLM call each branch makes after the guard:
+#   intent → (node, (prompt template, version), tier — None follows the router's llm_tier)
+NEXT_LLM_CALL = {
+    "qa":         ("answer_with_citations", ("rag_answer", "v2"), None),
+    "multi_step": ("answer_with_citations", ("rag_answer", "v2"), None),
+    "compliance": ("compliance_check", ("compliance", "v2"), 2),
+    "action":     ("execute_action", ("action", "v1"), 0),
+    "summarize":  ("summarize", ("summarize", "v2"), 0),
+}
+
+
+@lru_cache(maxsize=1)
+def get_ledger() -> Optional[BudgetLedger]:
+    """Process-wide ledger for the configured backend (None if disabled)."""
+    return build_ledger()
+
+
+def ledger_accounts(state: AgentState) -> dict[str, float]:
+    """Ledger accounts this run is charged to, with their limits (USD per window)."""
+    session_id = state.get("session_id")
+    tenant_id = state.get("tenant_id")
+    user_role = state.get("user_role")
+    accounts = {}
+    if session_id:
+        accounts[f"session:{session_id}"] = MAX_BUDGET_PER_SESSION
+    if tenant_id:
+        accounts[f"tenant:{tenant_id}"] = MAX_BUDGET_PER_TENANT if MAX_BUDGET_PER_TENANT > 0 else math.inf
+    if user_role in ROLE_BUDGETS:
+        accounts[f"tenant:{tenant_id or '-'}/role:{user_role}"] = float(ROLE_BUDGETS[user_role])
+    return accounts
+
+
+def settle_ledger(state: AgentState) -> dict:
+    """Charge this run's actual cost to its ledger accounts, settling any reservation."""
+    accounts = ledger_accounts(state)
+    ledger = get_ledger() if accounts else None
+    if ledger is None:
+        return {}
+    run_cost = state.get("total_cost", 0.0) - state.get("run_cost_start", 0.0)
+    reservation_id = state.get("ledger_reservation")
+    if reservation_id:
+        ledger.settle(reservation_id, run_cost)
+    elif run_cost > 0:
+        ledger.debit(list(accounts), run_cost)
+    return {"ledger_reservation": ""}
+
+
+def release_ledger(state: AgentState) -> None:
+    """Release the reservation of a run that failed after budget_guard, charging the spend recorded so far."""
+    reservation_id = state.get("ledger_reservation")
+    ledger = get_ledger() if reservation_id else None
+    if ledger is None:
+        return
+    run_cost = state.get("total_cost", 0.0) - state.get("run_cost_start", 0.0)
+    try:
+        ledger.settle(reservation_id, run_cost)
+    except Exception:
+        pass   # the run's own error is the one to surface; the hold still expires after the TTL
+
+
+async def asettle_ledger(state: AgentState) -> dict:
+    """Async variant of settle_ledger — the ledger transaction runs on a worker thread."""
+    if not ledger_accounts(state):
+        return {}
+    return await asyncio.to_thread(settle_ledger, state)
+
+
+async def arelease_ledger(state: AgentState) -> None:
+    """Async variant of release_ledger — the ledger transaction runs on a worker thread."""
+    if state.get("ledger_reservation"):
+        await asyncio.to_thread(release_ledger, state)
+
+
+def remaining_budget(state: AgentState) -> float:
+    """USD left for this run: the tighter of the per-run and per-session limits."""
+    total_cost = state.get("total_cost", 0.0)
+    run_cost = total_cost - state.get("run_cost_start", 0.0)
+    return min(MAX_BUDGET_PER_RUN - run_cost, MAX_BUDGET_PER_SESSION - total_cost)
+
+
+def estimate_next_call(state: AgentState, tier: Optional[int] = None) -> Optional[dict]:
+    """Predict tokens and cost of the branch's next LLM call (None if it makes none).
+
+    Prompt tokens are counted from the template, the question, history and
+    known context; chunks that retrieval has yet to fetch are bounded by the
+    context packer's TIER_CONTEXT_TOKENS budget. A long summarize runs
+    map-reduce, so its estimate (and worst case) covers every call.
+    """
+    if state.get("dispatch"):
+        return None
+    node, template, fixed_tier = NEXT_LLM_CALL.get(state.get("intent"), NEXT_LLM_CALL["qa"])
+    if fixed_tier is not None:
+        tier = fixed_tier
+    elif tier is None:
+        tier = state.get("llm_tier", 1)
+    model = TIER_MODELS[tier]
+
+    if node == "summarize":
+        # Map-reduce summaries make several calls — the skill plans them
+        input_tokens, output_tokens, llm_calls = estimate_summary_tokens(state)
+    else:
+        messages = state.get("messages", [])
+        question = message_text(messages[-1]) if messages else ""
+        input_tokens = count_prompt_tokens([prompt_registry.compiled(*template).literal_text, question], model)
+        if node in ("answer_with_citations", "compliance_check"):
+            input_tokens += TIER_CONTEXT_TOKENS[tier]
+        if node == "answer_with_citations":
+            input_tokens += count_message_tokens(conversation_context(state), model)
+        output_tokens = min(EXPECTED_OUTPUT_TOKENS.get(node, TIER_MAX_TOKENS[tier]), TIER_MAX_TOKENS[tier])
+        llm_calls = 1
+
+    return {
+        "node": node,
+        "tier": tier,
+        "tier_adjustable": fixed_tier is None,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "llm_calls": llm_calls,
+        "cost": estimate_cost(tier, input_tokens, output_tokens),
+        "max_cost": estimate_cost(tier, input_tokens, llm_calls * TIER_MAX_TOKENS[tier]),
+    }
+
+
+def score_estimate(state: AgentState, update: dict) -> dict:
+    """Annotate a node's trace entry with the guard's estimate and its error vs actual."""
+    estimate = state.get("cost_estimate") or {}
+    for entry in (update or {}).get("trace_log", []):
+        if entry.get("node") != estimate.get("node") or "input_tokens" not in entry:
+            continue
+        actual = entry.get("cost", 0.0)
+        entry["estimated_input_tokens"] = estimate["input_tokens"]
+        entry["estimated_output_tokens"] = estimate["output_tokens"]
+        entry["estimated_cost"] = estimate["cost"]
+        entry["estimate_error_pct"] = round(100 * (estimate["cost"] - actual) / actual, 1) if actual else None
+    return update
 
 
 def budget_guard(state: AgentState) -> dict:
     """Check budget before proceeding to skill execution.
     
-    Reads: total_cost, llm_tier
+    Reads: total_cost, run_cost_start, llm_tier, intent, messages, session_id, tenant_id, user_role
     May modify: llm_tier (downgrade), budget_remaining
-    Sets: error (if budget exhausted)
+    Sets: cost_estimate, ledger_reservation, error (if budget exhausted or the next call can't fit)
     Appends to: trace_log
     """
     total_cost = state.get("total_cost", 0.0)
+    run_cost = total_cost - state.get("run_cost_start", 0.0)
     current_tier = state.get("llm_tier", 0)
-    budget_remaining = MAX_BUDGET_PER_RUN - total_cost
+    budget_remaining = remaining_budget(state)
+
+    # Cross-request limits: the tightest ledger account caps this run too
+    accounts = ledger_accounts(state)
+    ledger = get_ledger() if accounts else None
+    if ledger is None:
+        accounts = {}
+    headroom = ledger.headroom(accounts) if accounts else {}
+    limiting_account = min(headroom, key=headroom.get) if headroom else None
+    if limiting_account is not None and headroom[limiting_account] < budget_remaining:
+        budget_remaining = headroom[limiting_account]
+    else:
+        limiting_account = None
 
     trace_entry = {
         "node": "budget_guard",
         "total_cost": total_cost,
+        "run_cost": run_cost,
         "budget_remaining": budget_remaining,
         "original_tier": current_tier,
         "cost": 0.0,
     }
+    if headroom:
+        trace_entry["ledger_headroom"] = headroom
 
     result = {
         "budget_remaining": budget_remaining,
@@ -36,38 +235,97 @@ def budget_guard(state: AgentState) -> dict:
 
     # Budget exhausted — stop
     if budget_remaining <= 0:
+        if limiting_account is not None:
+            spent = f"Budget for {limiting_account} exhausted (${accounts[limiting_account]:.2f} per window). "
+        elif MAX_BUDGET_PER_SESSION - total_cost <= 0:
+            spent = f"Session budget exhausted (${total_cost:.4f} / ${MAX_BUDGET_PER_SESSION:.2f}). "
+        else:
+            spent = f"Budget exhausted (${run_cost:.4f} / ${MAX_BUDGET_PER_RUN:.2f}). "
         result["final_answer"] = (
-            f"Budget exhausted (${total_cost:.4f} / ${MAX_BUDGET_PER_RUN:.2f}). "
-            "Cannot continue processing. Please start a new session or increase budget."
+            spent + "Cannot continue processing. Please start a new session or increase budget."
         )
         result["error"] = "budget_exhausted"
         trace_entry["action"] = "blocked"
-        prev_trace = state.get("trace_log", [])
-        result["trace_log"] = prev_trace + [trace_entry]
+        result["trace_log"] = [trace_entry]
         return result
 
-    # Budget warning — downgrade if enabled
-    used_pct = total_cost / MAX_BUDGET_PER_RUN
-    if used_pct >= BUDGET_WARNING_PCT and GRACEFUL_DEGRADE and current_tier > 0:
-        new_tier = max(0, current_tier - 1)
-        result["llm_tier"] = new_tier
-        trace_entry["action"] = f"downgraded_tier_{current_tier}_to_{new_tier}"
-        trace_entry["reason"] = f"Budget {used_pct:.0%} used, degrading to save cost"
+    # Pre-flight — the next call's worst case must fit in what's left
+    estimate = estimate_next_call(state)
+    if estimate is not None and estimate["max_cost"] > budget_remaining:
+        requested_max_cost = estimate["max_cost"]
+        if GRACEFUL_DEGRADE and estimate["tier_adjustable"]:
+            for tier in range(estimate["tier"] - 1, -1, -1):
+                candidate = estimate_next_call(state, tier)
+                if candidate["max_cost"] <= budget_remaining:
+                    estimate = candidate
+                    break
+        if estimate["max_cost"] > budget_remaining:
+            result["final_answer"] = (
+                f"This request could cost up to ${estimate['max_cost']:.4f} but only "
+                f"${budget_remaining:.4f} of budget is left. Please start a new session or increase budget."
+            )
+            result["error"] = "budget_insufficient"
+            result["cost_estimate"] = estimate
+            trace_entry["action"] = "blocked_preflight"
+            trace_entry["estimate"] = estimate
+            result["trace_log"] = [trace_entry]
+            return result
+        result["llm_tier"] = estimate["tier"]
+        trace_entry["action"] = f"downgraded_tier_{current_tier}_to_{estimate['tier']}"
+        trace_entry["reason"] = (
+            f"Next call could cost up to ${requested_max_cost:.4f} at tier {current_tier}; "
+            f"${budget_remaining:.4f} left"
+        )
     else:
-        trace_entry["action"] = "passed"
+        # Budget warning — downgrade if enabled
+        used_pct = max(run_cost / MAX_BUDGET_PER_RUN, total_cost / MAX_BUDGET_PER_SESSION)
+        if used_pct >= BUDGET_WARNING_PCT and GRACEFUL_DEGRADE and current_tier > 0:
+            new_tier = max(0, current_tier - 1)
+            result["llm_tier"] = new_tier
+            trace_entry["action"] = f"downgraded_tier_{current_tier}_to_{new_tier}"
+            trace_entry["reason"] = f"Budget {used_pct:.0%} used, degrading to save cost"
+            if estimate is not None and estimate["tier_adjustable"]:
+                estimate = estimate_next_call(state, new_tier)
+        else:
+            trace_entry["action"] = "passed"
+
+    # Hold the worst case of an expensive call on every account before making it
+    if accounts and estimate is not None and estimate["tier"] >= LEDGER_RESERVE_MIN_TIER:
+        reservation_id = ledger.reserve(accounts, estimate["max_cost"])
+        if reservation_id is None:
+            result["final_answer"] = (
+                f"This request could cost up to ${estimate['max_cost']:.4f}, more than the budget "
+                f"left for this session or tenant. Please try again later or increase budget."
+            )
+            result["error"] = "budget_insufficient"
+            result["cost_estimate"] = estimate
+            trace_entry["action"] = "blocked_reservation"
+            trace_entry["estimate"] = estimate
+            result["trace_log"] = [trace_entry]
+            return result
+        result["ledger_reservation"] = reservation_id
+        trace_entry["reserved"] = estimate["max_cost"]
 
-    prev_trace = state.get("trace_log", [])
-    result["trace_log"] = prev_trace + [trace_entry]
+    result["cost_estimate"] = estimate or {}
+    trace_entry["estimate"] = estimate
+    result["trace_log"] = [trace_entry]
     return result
 
 
+async def abudget_guard(state: AgentState) -> dict:
+    """Async variant of budget_guard — a run with ledger accounts is checked on a worker thread."""
+    if not ledger_accounts(state):
+        return budget_guard(state)
+    return await asyncio.to_thread(budget_guard, state)
+
+
 def should_stop_for_budget(state: AgentState) -> str:
     """Conditional edge function: check if budget guard blocked execution.
     
     Returns:
-        "blocked" — budget exhausted, go to final response
+        "blocked" — budget exhausted or the next call can't fit, go to final response
         "continue" — budget OK, proceed to skill
     """
-    if state.get("error") == "budget_exhausted":
+    if state.get("error") in ("budget_exhausted", "budget_insufficient"):
         return "blocked"
     return "continue"
\ No newline at end of file
@@ -0,0 +1,408 @@
+# checkpoint.py
+"""
+Enterprise Ops Copilot — Session Checkpointing
+LangGraph checkpointer keyed on session_id (thread_id), backed by SQLite.
+
+Each checkpoint row stores the full serialized state, so resuming a
+session is a single primary-key lookup of the latest row — never a replay
+of earlier turns. Retention is bounded two ways:
+
+  • per session, only the newest CHECKPOINT_KEEP_PER_SESSION checkpoints
+    (and their pending writes) are kept;
+  • sessions idle for longer than CHECKPOINT_TTL_S are deleted.
+
+Recently used sessions keep their latest serialized checkpoint in an LRU
+cache (CHECKPOINT_CACHE_SESSIONS entries); idle sessions fall out of the
+cache and are read back from disk on their next turn. A cache hit is
+validated against the latest checkpoint id on disk, so several workers
+can share one database file.
+
+Backends (CHECKPOINT_BACKEND):
+    sqlite  file at CHECKPOINT_PATH (default DATA_DIR/checkpoints.db)
+    memory  SQLite ":memory:" — same code path, nothing survives a restart
+    none    no checkpointer; session_id is ignored
+Any other BaseCheckpointSaver can be passed to graph.build_graph().
+"""
+from __future__ import annotations
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from config import (
+    CHECKPOINT_BACKEND,
+    CHECKPOINT_PATH,
+    CHECKPOINT_KEEP_PER_SESSION,
+    CHECKPOINT_TTL_S,
+    CHECKPOINT_CACHE_SESSIONS,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id      TEXT NOT NULL,
+    checkpoint_ns  TEXT NOT NULL DEFAULT '',
+    checkpoint_id  TEXT NOT NULL,
+    parent_id      TEXT,
+    type           TEXT,
+    checkpoint     BLOB,
+    metadata_type  TEXT,
+    metadata       BLOB,
+    updated_at     REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_updated_at ON checkpoints (updated_at);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id      TEXT NOT NULL,
+    checkpoint_ns  TEXT NOT NULL DEFAULT '',
+    checkpoint_id  TEXT NOT NULL,
+    task_id        TEXT NOT NULL,
+    idx            INTEGER NOT NULL,
+    channel        TEXT NOT NULL,
+    type           TEXT,
+    value          BLOB,
+    task_path      TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+# How often put() sweeps sessions past their TTL
+_EXPIRY_SWEEP_INTERVAL_S = 60.0
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver):
+    """Bounded-retention SQLite checkpointer with an LRU cache of latest checkpoints."""
+
+    def __init__(
+        self,
+        path: str = CHECKPOINT_PATH,
+        keep_per_session: int = CHECKPOINT_KEEP_PER_SESSION,
+        ttl_s: float = CHECKPOINT_TTL_S,
+        cache_sessions: int = CHECKPOINT_CACHE_SESSIONS,
+        serde: Any = None,
+    ):
+        super().__init__(serde=serde)
+        self.path = path
+        self.keep_per_session = max(1, keep_per_session)
+        self.ttl_s = ttl_s
+        self.cache_sessions = cache_sessions
+        self._lock = threading.Lock()
+        # (thread_id, checkpoint_ns) → latest row, most recently used last
+        self._cache: OrderedDict[tuple[str, str], tuple] = OrderedDict()
+        self._last_sweep = 0.0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+            self._cache.clear()
+
+    # ── LRU cache of latest rows ─────────────────────────────────
+
+    def _cache_get(self, key: tuple[str, str]) -> Optional[tuple]:
+        row = self._cache.get(key)
+        if row is not None:
+            self._cache.move_to_end(key)
+        return row
+
+    def _cache_put(self, key: tuple[str, str], row: tuple) -> None:
+        if self.cache_sessions <= 0:
+            return
+        self._cache[key] = row
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_sessions:
+            self._cache.popitem(last=False)
+
+    def _cache_drop_thread(self, thread_id: str) -> None:
+        for key in [k for k in self._cache if k[0] == thread_id]:
+            del self._cache[key]
+
+    # ── Read ─────────────────────────────────────────────────────
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Latest checkpoint of a session (or the one named by checkpoint_id)."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        key = (thread_id, checkpoint_ns)
+
+        with self._lock:
+            if checkpoint_id is None:
+                latest = self._conn.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+                if latest is None:
+                    self._cache.pop(key, None)
+                    return None
+                checkpoint_id = latest[0]
+
+            cached = self._cache_get(key)
+            if cached is not None and cached[0] == checkpoint_id:
+                row = cached
+            else:
+                row = self._conn.execute(
+                    "SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+                if row is None:
+                    return None
+                if get_checkpoint_id(config) is None:
+                    self._cache_put(key, row)
+            writes = self._conn.execute(
+                "SELECT task_id, channel, type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchall()
+
+        return self._to_tuple(thread_id, checkpoint_ns, row, writes)
+
+    def list(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> Iterator[CheckpointTuple]:
+        """Retained checkpoints, newest first."""
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints"
+        )
+        clauses: list[str] = []
+        params: list[Any] = []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        for thread_id, checkpoint_ns, *row in rows:
+            if filter:
+                metadata = self.serde.loads_typed((row[4], row[5]))
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            with self._lock:
+                writes = self._conn.execute(
+                    "SELECT task_id, channel, type, value FROM writes "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                    (thread_id, checkpoint_ns, row[0]),
+                ).fetchall()
+            yield self._to_tuple(thread_id, checkpoint_ns, tuple(row), writes)
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row: tuple, writes: list) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata = row
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((w_type, value)))
+                for task_id, channel, w_type, value in writes
+            ],
+        )
+
+    # ── Write ────────────────────────────────────────────────────
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Store a full checkpoint and drop the session's older ones beyond the retention limit."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+        type_, blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        row = (checkpoint["id"], parent_id, type_, blob, metadata_type, metadata_blob)
+        now = time.time()
+
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, *row, now),
+                )
+                stale = self._conn.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+                    (thread_id, checkpoint_ns, self.keep_per_session),
+                ).fetchall()
+                for (stale_id,) in stale:
+                    self._conn.execute(
+                        "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                        (thread_id, checkpoint_ns, stale_id),
+                    )
+                    self._conn.execute(
+                        "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                        (thread_id, checkpoint_ns, stale_id),
+                    )
+            self._cache_put((thread_id, checkpoint_ns), row)
+            if self.ttl_s > 0 and now - self._last_sweep >= _EXPIRY_SWEEP_INTERVAL_S:
+                self._delete_expired(now)
+
+        return {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Store intermediate writes for a checkpoint (regular writes are never overwritten)."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel, type_, blob, task_path,
+            ))
+        verb = "INSERT OR REPLACE" if all(channel in WRITES_IDX_MAP for channel, _ in writes) else "INSERT OR IGNORE"
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint and write of a session."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self._cache_drop_thread(thread_id)
+
+    def delete_expired(self) -> int:
+        """Delete sessions idle for longer than ttl_s. Returns the number deleted."""
+        with self._lock:
+            return self._delete_expired(time.time())
+
+    def _delete_expired(self, now: float) -> int:
+        self._last_sweep = now
+        cutoff = now - self.ttl_s
+        expired = [tid for (tid,) in self._conn.execute(
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(updated_at) < ?",
+            (cutoff,),
+        )]
+        if not expired:
+            return 0
+        with self._conn:
+            self._conn.execute("BEGIN")
+            for thread_id in expired:
+                self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+                self._cache_drop_thread(thread_id)
+        return len(expired)
+
+    # ── Async (SQLite calls run off the event loop) ──────────────
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def build_checkpointer(backend: str = CHECKPOINT_BACKEND) -> Optional[BaseCheckpointSaver]:
+    """Checkpointer for the configured backend (None = sessions disabled)."""
+    backend = backend.lower()
+    if backend == "sqlite":
+        return SQLiteCheckpointer(CHECKPOINT_PATH)
+    if backend == "memory":
+        return SQLiteCheckpointer(":memory:")
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown CHECKPOINT_BACKEND {backend!r} (expected sqlite | memory | none)")
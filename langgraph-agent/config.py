@@ -4,13 +4,35 @@ Enterprise Ops Copilot — Configuration
 Central config for model tiers, cost tables, budget limits, and mock mode.
 """
 
+import json
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Local state (ledger, sessions, profiles) lives here unless a path is set
+# explicitly — never in the working directory
+DATA_DIR = os.path.abspath(os.path.expanduser(os.getenv("DATA_DIR", "~/.ops-copilot")))
+
 
 MOCK_LLM = os.getenv("MOCK_LLM", "true").lower() == "true"
+MOCK_LLM_LATENCY_MS = float(os.getenv("MOCK_LLM_LATENCY_MS", "0"))   # simulated per-call latency
+MOCK_PROMPT_CACHE   = os.getenv("MOCK_PROMPT_CACHE", "true").lower() == "true"   # simulate provider prefix caching
+
+
+# ── Mock LLM Simulation ─────────────────────────────────────────
+# MOCK_LLM_SIMULATE replaces the flat MOCK_LLM_LATENCY_MS with hosted-model
+# timing: time to first token (lognormal around a per-tier median, plus
+# prefill time for the prompt), then output tokens at a per-tier decode rate.
+# The failure rates apply to every mock call, simulated or not.
+MOCK_LLM_SIMULATE         = os.getenv("MOCK_LLM_SIMULATE", "false").lower() == "true"
+MOCK_TTFT_MS              = {int(k): float(v) for k, v in json.loads(os.getenv("MOCK_TTFT_MS", '{"0": 250, "1": 450, "2": 700}')).items()}
+MOCK_TTFT_SIGMA           = float(os.getenv("MOCK_TTFT_SIGMA", "0.4"))               # lognormal spread of TTFT (0 = fixed)
+MOCK_PREFILL_TOKENS_PER_S = float(os.getenv("MOCK_PREFILL_TOKENS_PER_S", "20000"))   # prompt processing, added to TTFT
+MOCK_TOKENS_PER_S         = {int(k): float(v) for k, v in json.loads(os.getenv("MOCK_TOKENS_PER_S", '{"0": 120, "1": 70, "2": 45}')).items()}
+MOCK_ERROR_RATE           = float(os.getenv("MOCK_ERROR_RATE", "0"))     # share of calls failing with MockLLMError (5xx / 429)
+MOCK_TIMEOUT_RATE         = float(os.getenv("MOCK_TIMEOUT_RATE", "0"))   # share of calls hanging LLM_TIMEOUT_S, then MockLLMTimeout
+MOCK_SEED                 = int(os.getenv("MOCK_SEED")) if os.getenv("MOCK_SEED") else None   # reproducible draws
 
 
 #__LLMTIER_CONFIG____________________________________________
@@ -24,18 +46,114 @@ TIER_TEMPERATURES = {0: 0.0, 1: 0.2, 2: 0.3}
 TIER_MAX_TOKENS   = {0: 512, 1: 2048, 2: 4096}
 
 
+# ── LLM HTTP Connection Pool (shared by all tiers) ─────────────
+OPENAI_BASE_URL             = os.getenv("OPENAI_BASE_URL", "")   # OpenAI-compatible gateway; empty = default
+LLM_POOL_MAX_CONNECTIONS    = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+LLM_POOL_MAX_KEEPALIVE      = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20"))
+LLM_POOL_KEEPALIVE_EXPIRY_S = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY_S", "30"))
+LLM_HTTP2                   = os.getenv("LLM_HTTP2", "true").lower() == "true"   # needs the h2 package
+LLM_TIMEOUT_S               = float(os.getenv("LLM_TIMEOUT_S", "60"))
+
+
 
 # ── Cost per 1K Tokens (USD) ────────────────────────────────────
+# cached_input: prompt tokens served from the provider's prefix cache
 COST_PER_1K = {
-    "gpt-4o-mini": {"input": 0.00015, "output": 0.0006},
-    "gpt-4o":      {"input": 0.0025,  "output": 0.01},
+    "gpt-4o-mini": {"input": 0.00015, "cached_input": 0.000075, "output": 0.0006},
+    "gpt-4o":      {"input": 0.0025,  "cached_input": 0.00125,  "output": 0.01},
 }
 
 # ── Budget Defaults ─────────────────────────────────────────────
 MAX_BUDGET_PER_RUN  = float(os.getenv("MAX_BUDGET_PER_RUN", "0.50"))
+MAX_BUDGET_PER_SESSION = float(os.getenv("MAX_BUDGET_PER_SESSION", "5.00"))   # across all turns of a session_id
 BUDGET_WARNING_PCT  = 0.80    # warn at 80% usage
 GRACEFUL_DEGRADE    = True    # drop to cheaper tier if budget tight
 
+# Budget ledger: spend across requests per session, tenant and role within a tenant
+LEDGER_BACKEND           = os.getenv("LEDGER_BACKEND", "sqlite")        # sqlite | memory | none
+LEDGER_PATH              = os.getenv("LEDGER_PATH", os.path.join(DATA_DIR, "ledger.db"))   # shared by all workers on a host
+LEDGER_WINDOW_S          = float(os.getenv("LEDGER_WINDOW_S", "86400"))  # spend resets each window; 0 = never
+LEDGER_RESERVATION_TTL_S = float(os.getenv("LEDGER_RESERVATION_TTL_S", "300"))  # unsettled holds expire
+LEDGER_RESERVE_MIN_TIER  = int(os.getenv("LEDGER_RESERVE_MIN_TIER", "2"))   # hold worst-case cost before calls at this tier+
+MAX_BUDGET_PER_TENANT    = float(os.getenv("MAX_BUDGET_PER_TENANT", "100.00"))   # per window; 0 = unlimited
+ROLE_BUDGETS             = json.loads(os.getenv("ROLE_BUDGETS", "{}"))    # {"support_agent": 20.0, ...} per tenant, per window
+
+# Pre-flight estimate of the next LLM call (budget_guard)
+TOKENIZER                 = os.getenv("TOKENIZER", "auto")    # auto (tiktoken if available) | heuristic
+EXPECTED_OUTPUT_TOKENS = {     # typical completion size per node; worst case is TIER_MAX_TOKENS
+    "answer_with_citations": 250,
+    "compliance_check": 200,
+    "execute_action": 80,
+    "summarize": 200,
+}
+
+
+# ── Retrieval ───────────────────────────────────────────────────
+RETRIEVAL_MODE    = os.getenv("RETRIEVAL_MODE", "bm25")          # bm25 | dense | hybrid
+CORPUS_PATH       = os.getenv("CORPUS_PATH", "")                 # memory-mapped corpus dir; empty = MOCK_DOCS in memory
+EMBEDDING_MODEL   = os.getenv("EMBEDDING_MODEL", "hashing")      # "hashing" (offline) or an OpenAI model
+EMBEDDING_DIM     = int(os.getenv("EMBEDDING_DIM", "256"))       # hashing embedder only
+DENSE_INDEX_PATH  = os.getenv("DENSE_INDEX_PATH", "")            # on-disk index dir; empty = build in memory
+RRF_K             = 60                                           # reciprocal-rank-fusion constant
+
+# Document ingestion (python ingest.py): corpus generations under INGEST_DIR,
+# swapped in by search_docs without a restart. Takes precedence over CORPUS_PATH.
+INGEST_DIR              = os.getenv("INGEST_DIR", "")                        # generation root; empty = off
+INGEST_CHUNK_TOKENS     = int(os.getenv("INGEST_CHUNK_TOKENS", "300"))       # max tokens per indexed chunk
+INGEST_KEEP_GENERATIONS = int(os.getenv("INGEST_KEEP_GENERATIONS", "3"))     # older generations deleted after a swap
+INGEST_RELOAD_S         = float(os.getenv("INGEST_RELOAD_S", "5"))           # how often each worker checks for a new one
+
+
+# Context packing: retrieved chunks are fit into a per-tier prompt budget
+TIER_CONTEXT_TOKENS      = {0: 800, 1: 1500, 2: 2500}
+CONTEXT_CHUNK_MAX_TOKENS = int(os.getenv("CONTEXT_CHUNK_MAX_TOKENS", "400"))      # longer chunks cut at a sentence
+CONTEXT_DEDUPE_THRESHOLD = float(os.getenv("CONTEXT_DEDUPE_THRESHOLD", "0.8"))    # MinHash Jaccard for near-duplicates
+
+
+# Summarization: content over the threshold is split and summarized map-reduce
+SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS = int(os.getenv("SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS", "1500"))  # below = one call
+SUMMARY_CHUNK_TOKENS                = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1000"))     # content per map / reduce call
+SUMMARY_PARTIAL_MAX_TOKENS          = int(os.getenv("SUMMARY_PARTIAL_MAX_TOKENS", "150"))  # length of each partial summary
+SUMMARY_MAX_CONCURRENCY             = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "8"))     # map calls in flight
+
+
+# ── Batch Execution ─────────────────────────────────────────────
+BATCH_CONCURRENCY     = int(os.getenv("BATCH_CONCURRENCY", "8"))      # default graph runs in flight
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "64"))
+BATCH_MAX_QUESTIONS   = int(os.getenv("BATCH_MAX_QUESTIONS", "10000"))
+LLM_BATCH_MAX_SIZE    = int(os.getenv("LLM_BATCH_MAX_SIZE", "16"))    # prompts per provider batch call
+LLM_BATCH_WAIT_MS     = float(os.getenv("LLM_BATCH_WAIT_MS", "5"))    # how long to collect a batch
+
+
+# ── Session Checkpointing ───────────────────────────────────────
+CHECKPOINT_BACKEND          = os.getenv("CHECKPOINT_BACKEND", "sqlite")          # sqlite | memory | none
+CHECKPOINT_PATH             = os.getenv("CHECKPOINT_PATH", os.path.join(DATA_DIR, "checkpoints.db"))
+CHECKPOINT_KEEP_PER_SESSION = int(os.getenv("CHECKPOINT_KEEP_PER_SESSION", "2"))  # newest checkpoints kept on disk
+CHECKPOINT_TTL_S            = float(os.getenv("CHECKPOINT_TTL_S", str(7 * 24 * 3600)))  # idle sessions deleted; 0 = never
+CHECKPOINT_CACHE_SESSIONS   = int(os.getenv("CHECKPOINT_CACHE_SESSIONS", "1024"))  # LRU of latest checkpoints in memory
+CHECKPOINT_DURABILITY       = os.getenv("CHECKPOINT_DURABILITY", "exit")         # exit = one write per turn | async | sync
+
+
+# ── Conversation Compaction ─────────────────────────────────────
+COMPACTION_TRIGGER_TOKENS     = int(os.getenv("COMPACTION_TRIGGER_TOKENS", "2000"))  # compact once earlier turns exceed this
+COMPACTION_WINDOW_TOKENS      = int(os.getenv("COMPACTION_WINDOW_TOKENS", "800"))    # most recent turns kept verbatim
+COMPACTION_SUMMARY_MAX_TOKENS = int(os.getenv("COMPACTION_SUMMARY_MAX_TOKENS", "300"))
+
+
+# ── Observability ───────────────────────────────────────────────
+TRACE_LOG_MAX_ENTRIES = int(os.getenv("TRACE_LOG_MAX_ENTRIES", "200"))   # ring-buffer cap; 0 = unbounded
+METRICS_ENABLED       = os.getenv("METRICS_ENABLED", "true").lower() == "true"   # aggregate metrics at GET /metrics
+METRICS_LATENCY_BUCKETS_S = tuple(
+    float(b) for b in os.getenv("METRICS_LATENCY_BUCKETS_S", "0.001,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30").split(",")
+)
+
+# On-demand profiling (X-Profile header / ?profile=true on /agent/query, main.py --profile)
+PROFILING_ENABLED          = os.getenv("PROFILING_ENABLED", "true").lower() == "true"   # accept per-request captures
+PROFILE_DIR                = os.getenv("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))   # <trace_id>.json + <trace_id>.collapsed
+PROFILE_MAX_ARTIFACTS      = int(os.getenv("PROFILE_MAX_ARTIFACTS", "50"))            # oldest captures pruned
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "2"))
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "32"))       # allocation traceback depth
+
 
 # ── Intent Categories ───────────────────────────────────────────
 INTENTS = ["qa", "action", "multi_step", "summarize", "compliance"]
@@ -48,6 +166,12 @@ RISK_LEVELS = ["low", "medium", "high", "critical"]
 # ── Service URLs ────────────────────────────────────────────────
 NESTJS_BACKEND_URL = os.getenv("NESTJS_BACKEND_URL", "http://localhost:3000")
 
+# ── Tool Timeouts (seconds) ─────────────────────────────────────
+TOOL_TIMEOUT_S = float(os.getenv("TOOL_TIMEOUT_S", "5.0"))    # default per-tool budget in retrieve
+TOOL_TIMEOUTS = {                                              # per-tool overrides
+    "search_docs": float(os.getenv("SEARCH_DOCS_TIMEOUT_S", "2.0")),
+}
+
 # ── Tool Registry (available tools) ─────────────────────────────
 AVAILABLE_TOOLS = [
     "search_docs",
@@ -57,4 +181,15 @@ AVAILABLE_TOOLS = [
     "calculator",
 ]
 
+# Tools that change external systems — runs that call them are never shared between requests
+SIDE_EFFECT_TOOLS = {"create_jira_ticket"}
+
+
+# ── Startup ─────────────────────────────────────────────────────
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "true").lower() == "true"   # /ready stays 503 until warm-up finishes
+
+
+# ── Request Coalescing ──────────────────────────────────────────
+COALESCE_QUERIES = os.getenv("COALESCE_QUERIES", "true").lower() == "true"   # identical concurrent queries share a run
+
 
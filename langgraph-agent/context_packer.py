@@ -0,0 +1,214 @@
+# context_packer.py
+"""
+Enterprise Ops Copilot — Context Packer
+Fits retrieved chunks into a per-tier prompt token budget.
+
+  1. Near-duplicates are dropped: each chunk gets a MinHash signature over
+     word 3-shingles, and a chunk whose estimated Jaccard similarity to a
+     higher-value chunk is ≥ CONTEXT_DEDUPE_THRESHOLD is skipped.
+  2. Chunks longer than CONTEXT_CHUNK_MAX_TOKENS are cut at a sentence
+     boundary (word boundary if a single sentence is too long).
+  3. A 0/1 knapsack picks the subset with the highest total score that
+     fits TIER_CONTEXT_TOKENS[tier]; leftover room goes to the best chunk
+     that didn't fit, truncated to size.
+
+Citation markers live in each chunk's "marker" field and are added by
+format_chunks(), so truncation never touches them. Packed chunks keep
+their retrieval order, so markers stay in sequence.
+"""
+from __future__ import annotations
+import math
+import re
+import zlib
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+from tokens import count_tokens
+from text_split import SENTENCE_END_RE
+from config import CONTEXT_CHUNK_MAX_TOKENS, CONTEXT_DEDUPE_THRESHOLD
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MINHASH_PERMUTATIONS = 64
+KNAPSACK_GRANULARITY = 8      # tokens per DP cell — weights round up, so the budget is never exceeded
+MIN_PARTIAL_TOKENS = 48       # smallest truncated chunk worth adding to leftover room
+
+_WORD_RE = re.compile(r"\w+")
+
+
+# ── Formatting ───────────────────────────────────────────────────
+
+def format_chunk(chunk: dict) -> str:
+    """One chunk as it appears in a prompt: marker, text, source line."""
+    return f"{chunk.get('marker', '[?]')} {chunk.get('text', '')}\n   Source: {chunk.get('source', 'Unknown')}"
+
+
+def format_chunks(chunks: list[dict]) -> str:
+    return "\n\n".join(format_chunk(c) for c in chunks)
+
+
+def filter_citations(citations: list[str], packed: list[dict]) -> list[str]:
+    """Citations ("[marker] source") whose chunk made it into the prompt."""
+    markers = {c.get("marker") for c in packed}
+    return [c for c in citations if c.split(" ", 1)[0] in markers]
+
+
+# ── Near-duplicate detection ─────────────────────────────────────
+
+@lru_cache(maxsize=1)
+def _minhash_params() -> tuple:
+    """(p, a, b) for universal hashing h(x) = (a·x + b) mod p over 32-bit shingle hashes.
+
+    a·x + b stays below 2^64, so uint64 arithmetic is exact. Built on first
+    use, so importing this module doesn't import numpy.
+    """
+    import numpy as np
+    rng = np.random.default_rng(20240601)
+    return (
+        np.uint64(4294967311),
+        rng.integers(1, 2**32, MINHASH_PERMUTATIONS, dtype=np.uint64),
+        rng.integers(0, 2**32, MINHASH_PERMUTATIONS, dtype=np.uint64),
+    )
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """MinHash signature of a text's word 3-shingles."""
+    import numpy as np
+    prime, perm_a, perm_b = _minhash_params()
+    words = _WORD_RE.findall(text.lower())
+    shingles = {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+    )
+    return ((perm_a[:, None] * hashes[None, :] + perm_b[:, None]) % prime).min(axis=1)
+
+
+def estimated_jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    return float((a == b).mean())
+
+
+# ── Truncation ───────────────────────────────────────────────────
+
+def truncate_at_sentence(text: str, max_tokens: int, model: Optional[str] = None) -> tuple[str, bool]:
+    """Cut text to at most max_tokens at a sentence boundary. Returns (text, truncated)."""
+    if count_tokens(text, model) <= max_tokens:
+        return text, False
+
+    kept, used = [], 0
+    for sentence in SENTENCE_END_RE.split(text):
+        cost = count_tokens(sentence + " ", model)
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept), True
+
+    # A single sentence is over budget — fall back to a word boundary
+    words, used = [], count_tokens(" …", model)
+    for word in text.split():
+        cost = count_tokens(word + " ", model)
+        if used + cost > max_tokens:
+            break
+        words.append(word)
+        used += cost
+    return (" ".join(words) + " …") if words else "", True
+
+
+# ── Packing ──────────────────────────────────────────────────────
+
+def pack_context(chunks: list[dict], budget_tokens: int, model: Optional[str] = None) -> tuple[list[dict], dict]:
+    """Select, dedupe and truncate chunks to fit budget_tokens.
+
+    Returns (packed chunks in retrieval order, stats).
+    """
+    stats = {
+        "chunks_in": len(chunks),
+        "context_tokens_in": _context_tokens(chunks, model),
+        "budget_tokens": budget_tokens,
+        "duplicates_dropped": 0,
+        "chunks_truncated": 0,
+    }
+    values = _chunk_values(chunks)
+
+    # 1. Dedupe, best chunks first so the kept copy is the higher-scoring one
+    candidates: list[int] = []
+    signatures: list[np.ndarray] = []
+    for i in sorted(range(len(chunks)), key=lambda i: -values[i]):
+        signature = minhash_signature(chunks[i].get("text", ""))
+        if any(estimated_jaccard(signature, s) >= CONTEXT_DEDUPE_THRESHOLD for s in signatures):
+            stats["duplicates_dropped"] += 1
+            continue
+        candidates.append(i)
+        signatures.append(signature)
+
+    # 2. Cap each chunk's length
+    items: dict[int, dict] = {}
+    for i in candidates:
+        text, truncated = truncate_at_sentence(chunks[i].get("text", ""), CONTEXT_CHUNK_MAX_TOKENS, model)
+        items[i] = {**chunks[i], "text": text, "truncated": truncated} if truncated else chunks[i]
+
+    # 3. Knapsack over formatted chunk sizes (+2 for the blank-line separator)
+    weights = {i: count_tokens(format_chunk(c), model) + 2 for i, c in items.items()}
+    order = list(items)
+    chosen = set(_knapsack([weights[i] for i in order], [values[i] for i in order], budget_tokens))
+    selected = {order[j] for j in chosen}
+
+    # Leftover room: the best chunk that didn't fit, truncated to what's left
+    leftover = budget_tokens - sum(weights[i] for i in selected)
+    for i in sorted((i for i in order if i not in selected), key=lambda i: -values[i]):
+        if leftover < MIN_PARTIAL_TOKENS:
+            break
+        overhead = weights[i] - count_tokens(items[i].get("text", ""), model)
+        text, _ = truncate_at_sentence(items[i].get("text", ""), leftover - overhead, model)
+        if not text:
+            continue
+        items[i] = {**items[i], "text": text, "truncated": True}
+        weights[i] = count_tokens(format_chunk(items[i]), model) + 2
+        if weights[i] <= leftover:
+            selected.add(i)
+            leftover -= weights[i]
+
+    packed = [items[i] for i in sorted(selected)]
+    stats["chunks_packed"] = len(packed)
+    stats["chunks_truncated"] = sum(1 for c in packed if c.get("truncated"))
+    stats["context_tokens_packed"] = _context_tokens(packed, model)
+    return packed, stats
+
+
+def _context_tokens(chunks: list[dict], model: Optional[str]) -> int:
+    return count_tokens(format_chunks(chunks), model) if chunks else 0
+
+
+def _chunk_values(chunks: list[dict]) -> list[float]:
+    """Knapsack value per chunk: score normalized within its tool (scores aren't comparable across tools)."""
+    best: dict[str, float] = {}
+    for c in chunks:
+        tool = c.get("tool", "")
+        best[tool] = max(best.get(tool, 0.0), c.get("score", 0.0))
+    return [
+        0.05 + (c.get("score", 0.0) / best[c.get("tool", "")] if best[c.get("tool", "")] > 0 else 1.0)
+        for c in chunks
+    ]
+
+
+def _knapsack(weights: list[int], values: list[float], capacity: int) -> list[int]:
+    """Indices of the max-value subset with total weight ≤ capacity (0/1 knapsack DP)."""
+    cells = capacity // KNAPSACK_GRANULARITY
+    if cells <= 0:
+        return []
+    sizes = [math.ceil(w / KNAPSACK_GRANULARITY) for w in weights]
+    best = [0.0] * (cells + 1)
+    took = [[False] * (cells + 1) for _ in weights]
+    for i, (size, value) in enumerate(zip(sizes, values)):
+        for c in range(cells, size - 1, -1):
+            if best[c - size] + value > best[c]:
+                best[c] = best[c - size] + value
+                took[i][c] = True
+
+    chosen, c = [], cells
+    for i in range(len(weights) - 1, -1, -1):
+        if took[i][c]:
+            chosen.append(i)
+            c -= sizes[i]
+    return chosen
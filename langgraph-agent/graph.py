@@ -4,7 +4,8 @@ Enterprise Ops Copilot — LangGraph StateGraph
 The main ReAct agent graph. Wires all skills together.
 
 Flow:
-  ingest → route_intent → budget_guard → [skill branch] → final_response
+  ingest → compact_history → route_intent → budget_guard → [skill branch] → final_response
+  ingest → budget_guard → dispatch_action → final_response   (structured action, no LLM)
 
 Branches (based on router output):
   qa         → retrieve → answer_with_citations → final
@@ -12,37 +13,94 @@ Branches (based on router output):
   summarize  → summarize → final
   compliance → retrieve → compliance_check → final
   multi_step → retrieve → answer_with_citations → final (same as qa for now)
+
+Every skill node, and budget_guard and final_response (which call the
+budget ledger), carries both a sync and an async implementation:
+copilot_graph.invoke() runs the sync path (CLI), copilot_graph.ainvoke()
+runs the async path (FastAPI server) without blocking the event loop.
+
+copilot_graph (or get_graph()) is stateless (one run per call) and is
+compiled on first access, not at import. get_session_graph() is the same
+graph compiled with a checkpointer: pass session_config(session_id) and
+each call resumes that session's latest checkpoint.
 """
 from __future__ import annotations
+from functools import lru_cache
+from typing import Optional
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Overwrite
 from state import AgentState
-from skills.router import route_intent
-from skills.retrieval import retrieve
-from skills.answer_with_citations import answer_with_citations
-from skills.action_executor import execute_action
-from skills.compliance_check import compliance_check
-from skills.summarizer import summarize
-from budget import budget_guard, should_stop_for_budget
-from config import MAX_BUDGET_PER_RUN
+from skills import ALL_SKILLS, ALL_ASYNC_SKILLS
+from budget import (
+    budget_guard, abudget_guard, should_stop_for_budget, remaining_budget, score_estimate,
+    settle_ledger, asettle_ledger, arelease_ledger, release_ledger,
+)
+from checkpoint import build_checkpointer
+from metrics import instrument_node
 
 
 # ── Node: Ingest User Input ─────────────────────────────────────
 
 def ingest_user(state: AgentState) -> dict:
-    """Initialize state defaults for a new run."""
+    """Initialize state for a new run.
+
+    In a checkpointed session the state already holds earlier turns:
+    messages and total_cost / token_usage are kept; the previous turn's
+    answer, citations, retrieved chunks, compliance and action results,
+    error and trace are cleared (a summarize turn must read this turn's
+    input, not the last turn's chunks), and run_cost_start opens this
+    run's budget window. A dispatch is kept only if it was sent with this
+    turn's message (see _turn_dispatch).
+    """
+    total_cost = state.get("total_cost", 0.0)
     return {
-        "total_cost": state.get("total_cost", 0.0),
-        "budget_remaining": MAX_BUDGET_PER_RUN - state.get("total_cost", 0.0),
-        "trace_log": state.get("trace_log", []),
+        "dispatch": _turn_dispatch(state),
+        "run_cost_start": total_cost,
+        "budget_remaining": remaining_budget({"total_cost": total_cost, "run_cost_start": total_cost}),
+        "final_answer": "",
+        "citations": [],
+        "retrieved_chunks": [],
+        "compliance_result": {},
+        "action_result": {},
+        "error": "",
+        "ledger_reservation": "",
+        "trace_log": Overwrite([]),
         "current_node": "ingest_user",
     }
 
 
+def _turn_dispatch(state: AgentState) -> dict:
+    """The structured action sent with this turn's message, or {}.
+
+    A turn interrupted before final_response leaves its dispatch in the
+    session checkpoint; without this check the session's next question
+    would route straight to that tool and run it again. A dispatch
+    belongs to the message whose id it carries as message_id.
+    """
+    dispatch = state.get("dispatch") or {}
+    messages = state.get("messages") or []
+    if dispatch and messages and dispatch.get("message_id") == messages[-1].id:
+        return dispatch
+    return {}
+
+
 # ── Node: Final Response ────────────────────────────────────────
 
 def final_response(state: AgentState) -> dict:
-    """Package the final response with metadata."""
-    answer = state.get("final_answer", "I couldn't process your request.")
+    """Package the final response, record it in the conversation and settle the run's spend."""
+    return {**settle_ledger(state), **_final_answer(state)}
+
+
+async def afinal_response(state: AgentState) -> dict:
+    """Async variant of final_response — settles the run's spend off the event loop."""
+    return {**await asettle_ledger(state), **_final_answer(state)}
+
+
+def _final_answer(state: AgentState) -> dict:
+    answer = state.get("final_answer") or "I couldn't process your request."
     citations = state.get("citations", [])
     total_cost = state.get("total_cost", 0.0)
 
@@ -53,16 +111,27 @@ def final_response(state: AgentState) -> dict:
 
     return {
         "final_answer": answer,
+        "messages": [AIMessage(content=answer)],
+        "dispatch": {},  # a structured action applies to its own turn only
         "current_node": "final_response",
     }
 
 
 # ── Routing Functions ────────────────────────────────────────────
 
+def route_entry(state: AgentState) -> str:
+    """Conditional edge: structured actions skip the LLM router entirely."""
+    if state.get("dispatch"):
+        return "dispatch"
+    return "route"
+
+
 def route_by_intent(state: AgentState) -> str:
     """Conditional edge: route to the right skill based on intent."""
     intent = state.get("intent", "qa")
 
+    if state.get("dispatch"):
+        return "dispatch_action"
     if intent == "compliance":
         return "retrieve_for_compliance"
     elif intent == "action":
@@ -75,28 +144,91 @@ def route_by_intent(state: AgentState) -> str:
         return "retrieve_for_qa"  # default fallback
 
 
+# ── Sync + Async Skill Nodes ─────────────────────────────────────
+
+def _skill_node(name: str, skill: str) -> RunnableLambda:
+    """Wrap a skill so the graph picks invoke() or ainvoke() per execution mode.
+
+    Both paths record node metrics (see metrics.instrument_node) and score
+    budget_guard's pre-flight estimate against the node's actual usage
+    (see budget.score_estimate). If the skill raises (or is cancelled), the
+    run won't reach final_response, so its ledger reservation is released
+    here (see budget.release_ledger).
+    """
+    sync_skill, async_skill = ALL_SKILLS[skill], ALL_ASYNC_SKILLS[skill]
+
+    def run(state: AgentState) -> dict:
+        try:
+            return score_estimate(state, sync_skill(state))
+        except BaseException:
+            release_ledger(state)
+            raise
+
+    async def arun(state: AgentState) -> dict:
+        try:
+            return score_estimate(state, await async_skill(state))
+        except BaseException:
+            await arelease_ledger(state)
+            raise
+
+    return RunnableLambda(instrument_node(name, run), afunc=instrument_node(name, arun), name=name)
+
+
+class _LedgerNode(Runnable):
+    """budget_guard / final_response: sync and async implementations, both instrumented.
+
+    These nodes call no model or tool, so unlike a skill node they need no
+    run config; a RunnableLambda would cost ~0.2 ms per call for the child
+    run it opens.
+    """
+
+    def __init__(self, name: str, func, afunc):
+        self.name = name
+        self._func = instrument_node(name, func)
+        self._afunc = instrument_node(name, afunc)
+
+    def invoke(self, input: AgentState, config=None, **kwargs) -> dict:
+        return self._func(input)
+
+    async def ainvoke(self, input: AgentState, config=None, **kwargs) -> dict:
+        return await self._afunc(input)
+
+
 # ── Build the Graph ──────────────────────────────────────────────
 
-def build_graph() -> StateGraph:
-    """Construct and compile the Enterprise Ops Copilot graph."""
+def build_graph(checkpointer: Optional[BaseCheckpointSaver] = None) -> StateGraph:
+    """Construct and compile the Enterprise Ops Copilot graph.
+
+    With a checkpointer, runs are keyed on config["configurable"]["thread_id"].
+    """
 
     graph = StateGraph(AgentState)
 
     # Add all nodes
-    graph.add_node("ingest_user", ingest_user)
-    graph.add_node("route_intent", route_intent)
-    graph.add_node("budget_guard", budget_guard)
-    graph.add_node("retrieve_for_qa", retrieve)
-    graph.add_node("retrieve_for_compliance", retrieve)
-    graph.add_node("answer_with_citations", answer_with_citations)
-    graph.add_node("execute_action", execute_action)
-    graph.add_node("compliance_check", compliance_check)
-    graph.add_node("summarize", summarize)
-    graph.add_node("final_response", final_response)
+    graph.add_node("ingest_user", instrument_node("ingest_user", ingest_user))
+    graph.add_node("compact_history", _skill_node("compact_history", "compact_history"))
+    graph.add_node("route_intent", _skill_node("route_intent", "route_intent"))
+    graph.add_node("budget_guard", _LedgerNode("budget_guard", budget_guard, abudget_guard))
+    graph.add_node("retrieve_for_qa", _skill_node("retrieve_for_qa", "retrieve"))
+    graph.add_node("retrieve_for_compliance", _skill_node("retrieve_for_compliance", "retrieve"))
+    graph.add_node("answer_with_citations", _skill_node("answer_with_citations", "answer_with_citations"))
+    graph.add_node("execute_action", _skill_node("execute_action", "execute_action"))
+    graph.add_node("dispatch_action", _skill_node("dispatch_action", "dispatch_action"))
+    graph.add_node("compliance_check", _skill_node("compliance_check", "compliance_check"))
+    graph.add_node("summarize", _skill_node("summarize", "summarize"))
+    graph.add_node("final_response", _LedgerNode("final_response", final_response, afinal_response))
 
     # Entry point
     graph.add_edge(START, "ingest_user")
-    graph.add_edge("ingest_user", "route_intent")
+    graph.add_conditional_edges(
+        "ingest_user",
+        route_entry,
+        {
+            "route": "compact_history",
+            "dispatch": "budget_guard",
+        },
+    )
+    graph.add_edge("compact_history", "route_intent")
     graph.add_edge("route_intent", "budget_guard")
 
     # Budget guard: blocked → final, continue → skill branch
@@ -110,7 +242,7 @@ def build_graph() -> StateGraph:
     )
 
     # Invisible routing node — fans out by intent
-    graph.add_node("skill_router", lambda state: state)  # pass-through
+    graph.add_node("skill_router", instrument_node("skill_router", lambda state: {}))  # pass-through (no state change)
     graph.add_conditional_edges(
         "skill_router",
         route_by_intent,
@@ -118,6 +250,7 @@ def build_graph() -> StateGraph:
             "retrieve_for_qa": "retrieve_for_qa",
             "retrieve_for_compliance": "retrieve_for_compliance",
             "execute_action": "execute_action",
+            "dispatch_action": "dispatch_action",
             "summarize": "summarize",
         },
     )
@@ -130,8 +263,9 @@ def build_graph() -> StateGraph:
     graph.add_edge("retrieve_for_compliance", "compliance_check")
     graph.add_edge("compliance_check", "final_response")
 
-    # Action path: execute → final
+    # Action path: execute → final (dispatch: tool only, no LLM)
     graph.add_edge("execute_action", "final_response")
+    graph.add_edge("dispatch_action", "final_response")
 
     # Summarize path: summarize → final
     graph.add_edge("summarize", "final_response")
@@ -139,8 +273,31 @@ def build_graph() -> StateGraph:
     # End
     graph.add_edge("final_response", END)
 
-    return graph.compile()
+    return graph.compile(checkpointer=checkpointer)
+
+
+# ── Compiled graph instances ─────────────────────────────────────
+
+@lru_cache(maxsize=1)
+def get_graph():
+    """The stateless graph, compiled on first use (warm-up compiles it before readiness)."""
+    return build_graph()
+
+
+def __getattr__(name: str):
+    # `from graph import copilot_graph` keeps working; the compile happens on that first access
+    if name == "copilot_graph":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@lru_cache(maxsize=1)
+def get_session_graph():
+    """Graph compiled with the configured checkpointer, or None if sessions are disabled."""
+    checkpointer = build_checkpointer()
+    return build_graph(checkpointer) if checkpointer is not None else None
 
 
-# ── Compiled graph instance ──────────────────────────────────────
-copilot_graph = build_graph()
+def session_config(session_id: str) -> dict:
+    """Run config that resumes (or starts) the session's thread."""
+    return {"configurable": {"thread_id": session_id}}
@@ -0,0 +1,270 @@
+# ingest.py
+"""
+Enterprise Ops Copilot — Document Ingestion
+Streams files into the search_docs index as a new corpus generation under
+INGEST_DIR and swaps it in atomically (search_index.generations).
+
+  read    JSONL (one {"id", "text", "source", ...} record per line),
+          Markdown (.md) and plain text (.txt); directories are walked
+  chunk   paragraphs packed up to INGEST_CHUNK_TOKENS; Markdown sections
+          never share a chunk, long paragraphs split at sentences, then words
+  build   the chunks of the given documents, then every chunk of the live
+          generation whose document was neither re-ingested (upsert) nor
+          deleted, streamed into Corpus.build
+  swap    publish the generation; each worker switches on its next check
+          of CURRENT (INGEST_RELOAD_S), the ingesting process at once
+
+Every stage is a generator, so memory is bounded by one file or JSONL
+record plus Corpus.build's spill threshold, whatever the corpus size.
+The live generation keeps answering queries while the next one is built.
+Generations are immutable: each ingest rewrites the whole corpus (one
+streaming pass), so upsert documents in batches rather than one at a time.
+
+A document's chunks are stored as "<document id>#<n>" with the document
+id in a doc_id column. A file's document id is its path relative to
+--base / base=, by default the directory given (or the file's own
+directory when the file itself is given). JSONL records carry their own id.
+
+Usage (from langgraph-agent/):
+    python ingest.py docs/ faq.jsonl               # upsert these documents
+    python ingest.py --base docs/ docs/faq/sla.md  # re-ingest one file under id faq/sla.md
+    python ingest.py --delete faq/sla.md           # delete by document id
+    python ingest.py --full docs/                  # replace the corpus with these
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from itertools import chain
+from typing import Iterable, Iterator, Optional
+from search_index import Corpus, generations
+from text_split import pack_paragraphs
+from config import INGEST_DIR, INGEST_CHUNK_TOKENS, INGEST_KEEP_GENERATIONS, RETRIEVAL_MODE
+
+CHUNK_COLUMNS = ("source", "doc_id")
+TEXT_EXTENSIONS = {".md": "markdown", ".markdown": "markdown", ".txt": "text", ".jsonl": "jsonl"}
+
+_HEADING_RE = re.compile(r"^#{1,6}\s+\S", re.MULTILINE)
+
+
+# ── Reading ──────────────────────────────────────────────────────
+
+def read_documents(paths: Iterable[str], base: Optional[str] = None) -> Iterator[dict]:
+    """Documents ({id, text, source, ...}) from files and directories, one at a time."""
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, subdirs, files in os.walk(path):
+                subdirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(directory, name)
+                    if os.path.splitext(name)[1].lower() in TEXT_EXTENSIONS:
+                        yield from _read_file(file_path, os.path.relpath(file_path, base or path))
+        elif os.path.isfile(path):
+            yield from _read_file(path, os.path.relpath(path, base or os.path.dirname(path) or "."))
+        else:
+            raise FileNotFoundError(path)
+
+
+def _read_file(path: str, doc_id: str) -> Iterator[dict]:
+    kind = TEXT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), "text")
+    doc_id = doc_id.replace(os.sep, "/")
+    if kind == "jsonl":
+        yield from _read_jsonl(path)
+        return
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    source = doc_id
+    if kind == "markdown":
+        title = re.search(r"^#\s+(.+)$", text, re.MULTILINE)
+        if title:
+            source = f"{title.group(1).strip()} ({doc_id})"
+    yield {"id": doc_id, "text": text, "source": source}
+
+
+def _read_jsonl(path: str) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get("id") or not isinstance(record.get("text"), str):
+                raise ValueError(f"{path}:{line_number}: a record needs an \"id\" and a \"text\"")
+            record["id"] = str(record["id"])
+            record.setdefault("source", os.path.basename(path))
+            yield record
+
+
+# ── Chunking ─────────────────────────────────────────────────────
+
+def chunk_document(doc: dict, max_tokens: int = INGEST_CHUNK_TOKENS) -> Iterator[dict]:
+    """A document's chunks ({id, doc_id, text, source}) of at most max_tokens each."""
+    for n, text in enumerate(_pack(_sections(doc["text"]), max_tokens)):
+        yield {"id": f"{doc['id']}#{n}", "doc_id": doc["id"], "text": text, "source": doc.get("source", "")}
+
+
+def _sections(text: str) -> Iterator[str]:
+    """Text split before each Markdown heading (a single section when there are none).
+
+    A heading with no body of its own (e.g. the title above the first
+    subsection) is carried into the next section.
+    """
+    starts = [m.start() for m in _HEADING_RE.finditer(text)]
+    bounds = [0, *starts, len(text)]
+    pending = ""
+    for start, end in zip(bounds, bounds[1:]):
+        section = text[start:end].strip()
+        if not section:
+            continue
+        if start in starts and "\n" not in section and end != len(text):
+            pending += section + "\n\n"
+            continue
+        yield pending + section
+        pending = ""
+    if pending:
+        yield pending.strip()
+
+
+def _pack(sections: Iterable[str], max_tokens: int) -> Iterator[str]:
+    """Paragraphs of each section joined into chunks of at most max_tokens."""
+    for section in sections:
+        yield from pack_paragraphs(section, max_tokens)
+
+
+# ── Generations ──────────────────────────────────────────────────
+
+def ingest(
+    paths: Iterable[str] = (),
+    delete: Iterable[str] = (),
+    *,
+    root: str = INGEST_DIR,
+    base: Optional[str] = None,
+    full: bool = False,
+    max_tokens: int = INGEST_CHUNK_TOKENS,
+    dense: Optional[bool] = None,
+    keep: int = INGEST_KEEP_GENERATIONS,
+) -> dict:
+    """Build and publish a new generation: upsert the documents under `paths`, delete
+    the document ids in `delete`, keep everything else (nothing else with full=True).
+
+    File document ids are relative to base (see the module docstring).
+    dense builds the generation's dense index as well (default: when
+    RETRIEVAL_MODE uses one). Returns the ingestion report.
+    """
+    if not root:
+        raise ValueError("No ingestion root: set INGEST_DIR or pass root=")
+    if dense is None:
+        dense = RETRIEVAL_MODE in ("dense", "hybrid")
+    start = time.perf_counter()
+    deleting = set(delete)
+    upserted: set[str] = set()
+    deleted: set[str] = set()
+    counts = {"chunks": 0, "kept": 0}
+
+    def new_chunks() -> Iterator[dict]:
+        for doc in read_documents(paths, base):
+            if doc["id"] in upserted:
+                raise ValueError(f"document {doc['id']!r} appears twice in the input")
+            upserted.add(doc["id"])
+            for chunk in chunk_document(doc, max_tokens):
+                counts["chunks"] += 1
+                yield chunk
+
+    def kept_chunks(previous: Optional[Corpus]) -> Iterator[dict]:
+        # Runs after new_chunks() is exhausted, so `upserted` is complete
+        if previous is None:
+            return
+        for _, chunk in previous.items():
+            doc_id = chunk.get("doc_id") or chunk["id"]
+            if doc_id in upserted:
+                continue
+            if doc_id in deleting:
+                deleted.add(doc_id)
+                continue
+            counts["kept"] += 1
+            yield chunk
+
+    with generations.writer(root) as build:
+        live = generations.current(root)
+        previous = Corpus.load(live) if live and not full else None
+        corpus = Corpus.build(build, chain(new_chunks(), kept_chunks(previous)), columns=CHUNK_COLUMNS)
+        if dense:
+            _build_dense(build, corpus)
+        path = generations.publish(root, build, keep)
+
+    served = sys.modules.get("tools.search_docs")
+    if served is not None and INGEST_DIR and os.path.abspath(INGEST_DIR) == os.path.abspath(root):
+        served.reload_index()   # this process switches now; other workers within INGEST_RELOAD_S
+
+    seconds = time.perf_counter() - start
+    written = counts["chunks"] + counts["kept"]
+    return {
+        "generation": path,
+        "documents": len(upserted),
+        "chunks": counts["chunks"],
+        "kept": counts["kept"],
+        "deleted": len(deleted),
+        "not_found": sorted(deleting - deleted - upserted),
+        "total_chunks": len(corpus),
+        "seconds": round(seconds, 3),
+        "chunks_per_s": round(written / seconds, 1) if seconds else 0.0,
+    }
+
+
+async def aingest(*args, **kwargs) -> dict:
+    """ingest() on a worker thread, so an event loop keeps serving queries during the build."""
+    return await asyncio.to_thread(ingest, *args, **kwargs)
+
+
+def _build_dense(path: str, corpus: Corpus) -> None:
+    from search_index.dense import DenseIndex
+    from llm_selector import get_embedder
+
+    DenseIndex.build(
+        os.path.join(path, "dense"),
+        ((doc_id, chunk["text"]) for doc_id, chunk in corpus.items()),
+        get_embedder(),
+        count=len(corpus),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="files or directories to upsert (.jsonl, .md, .txt)")
+    parser.add_argument("--delete", action="append", default=[], metavar="DOC_ID", help="document id to delete (repeatable)")
+    parser.add_argument("--base", default=None, help="directory file ids are relative to")
+    parser.add_argument("--full", action="store_true", help="drop every document not given in this run")
+    parser.add_argument("--root", default=INGEST_DIR, help="generation root (default: INGEST_DIR)")
+    parser.add_argument("--chunk-tokens", type=int, default=INGEST_CHUNK_TOKENS)
+    parser.add_argument("--dense", action=argparse.BooleanOptionalAction, default=None,
+                        help="also build the dense index (default: when RETRIEVAL_MODE uses it)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    if not args.root:
+        parser.error("set INGEST_DIR or pass --root")
+    if not args.paths and not args.delete and not args.full:
+        parser.error("nothing to do: give paths to upsert, --delete or --full")
+
+    try:
+        report = ingest(args.paths, args.delete, root=args.root, base=args.base, full=args.full,
+                        max_tokens=args.chunk_tokens, dense=args.dense)
+    except (OSError, ValueError) as e:
+        sys.exit(f"ingest failed: {e}")
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Published {report['generation']}: {report['total_chunks']} chunks")
+    print(f"  upserted  {report['documents']} documents, {report['chunks']} chunks")
+    print(f"  kept      {report['kept']} chunks")
+    print(f"  deleted   {report['deleted']} documents")
+    if report["not_found"]:
+        print(f"  not found {', '.join(report['not_found'])}")
+    print(f"  {report['seconds']:.2f}s, {report['chunks_per_s']:,.0f} chunks/s")
+
+
+if __name__ == "__main__":
+    main()
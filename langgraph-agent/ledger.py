@@ -0,0 +1,291 @@
+# ledger.py
+"""
+Enterprise Ops Copilot — Budget Ledger
+Spend tracked across requests, per account: a session, a tenant, or a
+role within a tenant (see budget.ledger_accounts). Each account has a USD
+limit per LEDGER_WINDOW_S window (0 = one lifetime window).
+
+  headroom()  what each account has left (limit − spent − reserved)
+  reserve()   atomically hold an amount on every account, or refuse if
+              any account can't cover it — taken before expensive calls
+  settle()    release a reservation and debit the actual cost
+  debit()     record spend without a reservation
+
+Reservations left behind by a crashed worker expire after
+LEDGER_RESERVATION_TTL_S.
+
+Backends (LEDGER_BACKEND):
+    sqlite  file at LEDGER_PATH (default DATA_DIR/ledger.db) — one file
+            can be shared by several uvicorn workers; reserve() runs in a
+            BEGIN IMMEDIATE transaction, so check-and-hold is atomic across
+            processes
+    memory  in-process dict; one worker only
+    none    no ledger; only the per-run and per-session checks apply
+"""
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+from config import LEDGER_BACKEND, LEDGER_PATH, LEDGER_WINDOW_S, LEDGER_RESERVATION_TTL_S
+
+# Float slack when comparing accumulated spend with a limit
+_EPSILON = 1e-9
+
+
+class BudgetLedger(ABC):
+    """Interface shared by the ledger backends. accounts maps account key → USD limit."""
+
+    def __init__(self, window_s: float = LEDGER_WINDOW_S, reservation_ttl_s: float = LEDGER_RESERVATION_TTL_S):
+        self.window_s = window_s
+        self.reservation_ttl_s = reservation_ttl_s
+
+    def window(self, now: Optional[float] = None) -> int:
+        """Index of the current spend window."""
+        if self.window_s <= 0:
+            return 0
+        return int((now if now is not None else time.time()) // self.window_s)
+
+    @abstractmethod
+    def headroom(self, accounts: dict[str, float]) -> dict[str, float]:
+        """What each account has left in the current window (limit − spent − reserved)."""
+
+    @abstractmethod
+    def reserve(self, accounts: dict[str, float], amount: float) -> Optional[str]:
+        """Hold amount on every account; returns a reservation id, or None if any account is short."""
+
+    @abstractmethod
+    def settle(self, reservation_id: str, actual: float) -> None:
+        """Release a reservation and debit the actual cost to its accounts."""
+
+    @abstractmethod
+    def debit(self, accounts: list[str], amount: float) -> None:
+        """Record spend without a reservation."""
+
+    @abstractmethod
+    def balances(self, account: str) -> dict:
+        """{"window", "spent", "reserved"} for an account in the current window."""
+
+
+# ── In-memory backend ────────────────────────────────────────────
+
+class InMemoryLedger(BudgetLedger):
+    """Single-process ledger guarded by a lock."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self._balances: dict[tuple[str, int], list[float]] = {}     # (account, window) → [spent, reserved]
+        self._reservations: dict[str, tuple[list[str], int, float, float]] = {}  # id → (accounts, window, amount, created)
+
+    def _balance(self, account: str, window: int) -> list[float]:
+        return self._balances.setdefault((account, window), [0.0, 0.0])
+
+    def _expire(self, now: float) -> None:
+        if self.reservation_ttl_s <= 0:
+            return
+        for rid in [r for r, (_, _, _, created) in self._reservations.items() if now - created > self.reservation_ttl_s]:
+            self._release(rid)
+
+    def _release(self, reservation_id: str) -> Optional[list[str]]:
+        held = self._reservations.pop(reservation_id, None)
+        if held is None:
+            return None
+        accounts, window, amount, _ = held
+        for account in accounts:
+            balance = self._balance(account, window)
+            balance[1] = max(0.0, balance[1] - amount)
+        return accounts
+
+    def headroom(self, accounts: dict[str, float]) -> dict[str, float]:
+        window = self.window()
+        with self._lock:
+            return {
+                account: limit - sum(self._balances.get((account, window), (0.0, 0.0)))
+                for account, limit in accounts.items()
+            }
+
+    def reserve(self, accounts: dict[str, float], amount: float) -> Optional[str]:
+        now = time.time()
+        window = self.window(now)
+        with self._lock:
+            self._expire(now)
+            for account, limit in accounts.items():
+                if limit - sum(self._balance(account, window)) < amount - _EPSILON:
+                    return None
+            for account in accounts:
+                self._balance(account, window)[1] += amount
+            reservation_id = uuid.uuid4().hex
+            self._reservations[reservation_id] = (list(accounts), window, amount, now)
+            return reservation_id
+
+    def settle(self, reservation_id: str, actual: float) -> None:
+        window = self.window()
+        with self._lock:
+            accounts = self._release(reservation_id)
+            for account in accounts or []:
+                self._balance(account, window)[0] += actual
+
+    def debit(self, accounts: list[str], amount: float) -> None:
+        window = self.window()
+        with self._lock:
+            for account in accounts:
+                self._balance(account, window)[0] += amount
+
+    def balances(self, account: str) -> dict:
+        window = self.window()
+        with self._lock:
+            spent, reserved = self._balances.get((account, window), (0.0, 0.0))
+        return {"window": window, "spent": spent, "reserved": reserved}
+
+
+# ── SQLite backend ───────────────────────────────────────────────
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS balances (
+    account   TEXT NOT NULL,
+    window    INTEGER NOT NULL,
+    spent     REAL NOT NULL DEFAULT 0,
+    reserved  REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (account, window)
+);
+CREATE TABLE IF NOT EXISTS reservations (
+    id          TEXT PRIMARY KEY,
+    accounts    TEXT NOT NULL,
+    window      INTEGER NOT NULL,
+    amount      REAL NOT NULL,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reservations_created_at ON reservations (created_at);
+"""
+
+_UPSERT = (
+    "INSERT INTO balances (account, window, spent, reserved) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (account, window) DO UPDATE SET "
+    "spent = spent + excluded.spent, reserved = MAX(0, reserved + excluded.reserved)"
+)
+
+
+class SQLiteLedger(BudgetLedger):
+    """File-backed ledger; safe to share between processes (WAL + BEGIN IMMEDIATE)."""
+
+    def __init__(self, path: str = LEDGER_PATH, busy_timeout_ms: int = 5000, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, fn):
+        """Run fn(conn) in one BEGIN IMMEDIATE transaction (holds the file's write lock)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def _release(self, conn: sqlite3.Connection, reservation_id: str) -> Optional[list[str]]:
+        row = conn.execute("SELECT accounts, window, amount FROM reservations WHERE id = ?", (reservation_id,)).fetchone()
+        if row is None:
+            return None
+        accounts, window, amount = json.loads(row[0]), row[1], row[2]
+        conn.executemany(_UPSERT, [(account, window, 0.0, -amount) for account in accounts])
+        conn.execute("DELETE FROM reservations WHERE id = ?", (reservation_id,))
+        return accounts
+
+    def _expire(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.reservation_ttl_s <= 0:
+            return
+        expired = conn.execute(
+            "SELECT id FROM reservations WHERE created_at < ?", (now - self.reservation_ttl_s,)
+        ).fetchall()
+        for (reservation_id,) in expired:
+            self._release(conn, reservation_id)
+
+    def _balances(self, conn: sqlite3.Connection, accounts, window: int) -> dict[str, float]:
+        accounts = list(accounts)
+        rows = conn.execute(
+            f"SELECT account, spent + reserved FROM balances WHERE window = ? "
+            f"AND account IN ({', '.join('?' * len(accounts))})",
+            (window, *accounts),
+        ).fetchall()
+        used = dict(rows)
+        return {account: used.get(account, 0.0) for account in accounts}
+
+    def headroom(self, accounts: dict[str, float]) -> dict[str, float]:
+        if not accounts:
+            return {}
+        with self._lock:
+            used = self._balances(self._conn, accounts, self.window())
+        return {account: limit - used[account] for account, limit in accounts.items()}
+
+    def reserve(self, accounts: dict[str, float], amount: float) -> Optional[str]:
+        now = time.time()
+        window = self.window(now)
+
+        def hold(conn: sqlite3.Connection) -> Optional[str]:
+            self._expire(conn, now)
+            used = self._balances(conn, accounts, window)
+            if any(limit - used[account] < amount - _EPSILON for account, limit in accounts.items()):
+                return None
+            conn.executemany(_UPSERT, [(account, window, 0.0, amount) for account in accounts])
+            reservation_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO reservations (id, accounts, window, amount, created_at) VALUES (?, ?, ?, ?, ?)",
+                (reservation_id, json.dumps(list(accounts)), window, amount, now),
+            )
+            return reservation_id
+
+        return self._write(hold)
+
+    def settle(self, reservation_id: str, actual: float) -> None:
+        window = self.window()
+
+        def apply(conn: sqlite3.Connection) -> None:
+            accounts = self._release(conn, reservation_id)
+            conn.executemany(_UPSERT, [(account, window, actual, 0.0) for account in accounts or []])
+
+        self._write(apply)
+
+    def debit(self, accounts: list[str], amount: float) -> None:
+        window = self.window()
+        self._write(lambda conn: conn.executemany(_UPSERT, [(account, window, amount, 0.0) for account in accounts]))
+
+    def balances(self, account: str) -> dict:
+        window = self.window()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT spent, reserved FROM balances WHERE account = ? AND window = ?", (account, window)
+            ).fetchone()
+        spent, reserved = row if row else (0.0, 0.0)
+        return {"window": window, "spent": spent, "reserved": reserved}
+
+
+def build_ledger(backend: str = LEDGER_BACKEND) -> Optional[BudgetLedger]:
+    """Ledger for the configured backend (None = cross-request budgets disabled)."""
+    backend = backend.lower()
+    if backend == "sqlite":
+        return SQLiteLedger(LEDGER_PATH)
+    if backend == "memory":
+        return InMemoryLedger()
+    if backend == "none":
+        return None
+    raise ValueError(f"Unknown LEDGER_BACKEND {backend!r} (expected sqlite | memory | none)")
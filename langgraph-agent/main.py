@@ -4,10 +4,13 @@ Interactive chat loop for testing the agent locally.
 Shows routing decisions, model tier, cost per turn, and total cost.
 """
 from __future__ import annotations
+import argparse
 from langchain_core.messages import HumanMessage
 from colorama import init, Fore, Style
 from graph import copilot_graph
-from config import MAX_BUDGET_PER_RUN
+from tokens import run_usage
+from profiling import ProfileCapture, format_summary
+from config import MAX_BUDGET_PER_RUN, PROFILE_DIR
 
 init(autoreset=True)
 
@@ -44,11 +47,30 @@ def print_trace(trace_log: list[dict]):
             extra = f" [chunks: {entry['chunks_found']}]"
         if entry.get("tool_called"):
             extra = f" [tool: {entry['tool_called']}]"
+        if entry.get("cached_input_tokens"):
+            extra += f" [cached: {entry['cached_input_tokens']}/{entry['input_tokens']}]"
         print(f"  {node:<30} model={model:<8} cost=${cost:.6f}{extra}")
     print(f"{'─'*50}{Style.RESET_ALL}")
 
 
+def run_profiled(initial_state: dict, label: str) -> tuple[dict, ProfileCapture]:
+    """Run one turn under a ProfileCapture and store its artifacts."""
+    capture = ProfileCapture(label=label)
+    try:
+        with capture:
+            result = copilot_graph.invoke(initial_state, config={"callbacks": capture.callbacks})
+    finally:
+        if capture.report:
+            capture.save()
+    return result, capture
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Enterprise Ops Copilot — interactive CLI")
+    parser.add_argument("--profile", action="store_true",
+                        help="profile every turn (sampled stacks + tracemalloc), saved under PROFILE_DIR")
+    args = parser.parse_args()
+
     print_banner()
     session_cost = 0.0
 
@@ -70,8 +92,12 @@ def main():
             "messages": [HumanMessage(content=user_input)],
         }
 
+        capture = None
         try:
-            result = copilot_graph.invoke(initial_state)
+            if args.profile:
+                result, capture = run_profiled(initial_state, user_input)
+            else:
+                result = copilot_graph.invoke(initial_state)
         except Exception as e:
             print(f"{Fore.RED}Error: {e}{Style.RESET_ALL}")
             continue
@@ -83,18 +109,22 @@ def main():
         risk = result.get("risk_level", "?")
         cost = result.get("total_cost", 0.0)
         trace = result.get("trace_log", [])
+        usage = run_usage(trace)
 
         session_cost += cost
 
         # Display routing info
         risk_color = Fore.RED if risk in ("high", "critical") else Fore.YELLOW if risk == "medium" else Fore.GREEN
-        print(f"\n{Fore.MAGENTA}[intent={intent}  tier={tier}  risk={risk_color}{risk}{Fore.MAGENTA}  cost=${cost:.6f}  session=${session_cost:.6f}]{Style.RESET_ALL}")
+        print(f"\n{Fore.MAGENTA}[intent={intent}  tier={tier}  risk={risk_color}{risk}{Fore.MAGENTA}  cost=${cost:.6f}  session=${session_cost:.6f}  cached={usage['cached_input_tokens']}/{usage['input_tokens']}]{Style.RESET_ALL}")
 
         # Display answer
         print(f"\n{Fore.CYAN}Agent > {Style.RESET_ALL}{answer}")
 
         # Display trace
         print_trace(trace)
+        if capture is not None:
+            print(f"{Fore.WHITE}{Style.DIM}{format_summary(capture.report)}")
+            print(f"  flamegraph input: {PROFILE_DIR}/{capture.trace_id}.collapsed{Style.RESET_ALL}")
         print()
 
 
@@ -0,0 +1,236 @@
+# metrics.py
+"""
+Enterprise Ops Copilot — Metrics
+Aggregate counters and latency histograms for graph nodes, tools and LLM
+usage, rendered in the Prometheus text format at GET /metrics.
+
+  copilot_node_duration_seconds{node}               histogram
+  copilot_node_errors_total{node}                   counter
+  copilot_tool_duration_seconds{tool}               histogram
+  copilot_tool_calls_total{tool,status}             counter   status = ok | error
+  copilot_llm_tokens_total{tier,model,kind}         counter   kind = input | cached_input | output
+  copilot_llm_cost_usd_total{tier,model}            counter
+  copilot_llm_cache_hits_total{tier,model}          counter   LLM steps that read a cached prompt prefix
+  copilot_llm_cache_savings_usd_total{tier,model}   counter
+
+LLM figures come from the trace entries each node returns, so they add
+up to what the per-request trace_log reports.
+
+Recording is per thread: each thread updates its own shard (plain dict
+writes, no lock), and a scrape sums the shards. On the server every node
+runs on the event-loop thread; sync tools run on executor threads.
+"""
+from __future__ import annotations
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Iterable
+from config import METRICS_ENABLED, METRICS_LATENCY_BUCKETS_S, TIER_MODELS
+
+# name → (type, help, label names)
+METRICS = {
+    "copilot_node_duration_seconds": ("histogram", "Wall time of one graph node execution.", ("node",)),
+    "copilot_node_errors_total": ("counter", "Graph node executions that raised.", ("node",)),
+    "copilot_tool_duration_seconds": ("histogram", "Wall time of one tool call.", ("tool",)),
+    "copilot_tool_calls_total": ("counter", "Tool calls by outcome.", ("tool", "status")),
+    "copilot_llm_tokens_total": ("counter", "LLM tokens billed, by kind.", ("tier", "model", "kind")),
+    "copilot_llm_cost_usd_total": ("counter", "Estimated LLM spend in USD.", ("tier", "model")),
+    "copilot_llm_cache_hits_total": ("counter", "LLM steps that read a cached prompt prefix.", ("tier", "model")),
+    "copilot_llm_cache_savings_usd_total": ("counter", "USD saved by cached prompt tokens.", ("tier", "model")),
+}
+
+
+class MetricsRegistry:
+    """Counters and histograms sharded per thread; render() merges the shards."""
+
+    def __init__(self, buckets: Iterable[float] = METRICS_LATENCY_BUCKETS_S):
+        self.buckets = tuple(sorted(buckets))
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()   # guards the shard list only
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: tuple, value: float = 1.0) -> None:
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0.0) + value
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        """Record one histogram sample: per-bucket counts (last = +Inf) followed by the running sum."""
+        shard = self._shard()
+        key = (name, labels)
+        histogram = shard.get(key)
+        if histogram is None:
+            histogram = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect_left(self.buckets, value)] += 1
+        histogram[-1] += value
+
+    def snapshot(self) -> dict[str, dict[tuple, Any]]:
+        """Merged view: {metric name: {label values: counter value | histogram list}}."""
+        with self._lock:
+            shards = list(self._shards)
+        merged: dict[str, dict[tuple, Any]] = {}
+        for shard in shards:
+            for (name, labels), value in shard.copy().items():   # dict.copy() is atomic under the GIL
+                series = merged.setdefault(name, {})
+                if isinstance(value, list):
+                    total = series.get(labels)
+                    series[labels] = list(value) if total is None else [a + b for a, b in zip(total, value)]
+                else:
+                    series[labels] = series.get(labels, 0.0) + value
+        return merged
+
+    def reset(self) -> None:
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        merged = self.snapshot()
+        lines = []
+        for name, (kind, help_text, label_names) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(merged.get(name, {}).items()):
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(label_names, labels))
+                if kind == "counter":
+                    lines.append(f"{name}{{{label_text}}} {_number(value)}")
+                    continue
+                prefix = label_text + "," if label_text else ""
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), value[:-1]):
+                    cumulative += count
+                    le = bound if isinstance(bound, str) else _number(bound)
+                    lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum{{{label_text}}} {_number(value[-1])}")
+                lines.append(f"{name}_count{{{label_text}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+metrics = MetricsRegistry()
+
+
+# ── Recording helpers ────────────────────────────────────────────
+
+def record_trace(entries: Iterable[dict]) -> None:
+    """Add the LLM tokens, cost and cache hits of a node's trace entries to the counters."""
+    for entry in entries:
+        model = entry.get("model")
+        if not model or not model.startswith("tier_"):
+            continue
+        tier = model[len("tier_"):]
+        labels = (tier, TIER_MODELS.get(int(tier), model))
+        cached = entry.get("cached_input_tokens", 0)
+        metrics.inc("copilot_llm_tokens_total", (*labels, "input"), entry.get("input_tokens", 0))
+        metrics.inc("copilot_llm_tokens_total", (*labels, "cached_input"), cached)
+        metrics.inc("copilot_llm_tokens_total", (*labels, "output"), entry.get("output_tokens", 0))
+        metrics.inc("copilot_llm_cost_usd_total", labels, entry.get("cost", 0.0))
+        if cached:
+            metrics.inc("copilot_llm_cache_hits_total", labels)
+            metrics.inc("copilot_llm_cache_savings_usd_total", labels, entry.get("cache_savings", 0.0))
+
+
+def _record_error(name: str, start: float) -> None:
+    metrics.observe("copilot_node_duration_seconds", (name,), time.perf_counter() - start)
+    metrics.inc("copilot_node_errors_total", (name,))
+
+
+def _record_node(name: str, start: float, update: Any) -> None:
+    metrics.observe("copilot_node_duration_seconds", (name,), time.perf_counter() - start)
+    entries = update.get("trace_log") if isinstance(update, dict) else None
+    if isinstance(entries, list):   # not Overwrite(...) from ingest_user
+        record_trace(entries)
+
+
+def instrument_node(name: str, func: Callable) -> Callable:
+    """Wrap a node function (sync or async) to record latency, errors and LLM usage."""
+    if not METRICS_ENABLED:
+        return func
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def arun(state):
+            start = time.perf_counter()
+            try:
+                update = await func(state)
+            except Exception:
+                _record_error(name, start)
+                raise
+            _record_node(name, start, update)
+            return update
+        return arun
+
+    @functools.wraps(func)
+    def run(state):
+        start = time.perf_counter()
+        try:
+            update = func(state)
+        except Exception:
+            _record_error(name, start)
+            raise
+        _record_node(name, start, update)
+        return update
+    return run
+
+
+def _timed_tool(name: str, func: Callable) -> Callable:
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = func(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            metrics.observe("copilot_tool_duration_seconds", (name,), time.perf_counter() - start)
+            metrics.inc("copilot_tool_calls_total", (name, status))
+    call.metrics_instrumented = True
+    return call
+
+
+def _atimed_tool(name: str, coroutine: Callable) -> Callable:
+    @functools.wraps(coroutine)
+    async def call(*args, **kwargs):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            result = await coroutine(*args, **kwargs)
+            status = "ok"
+            return result
+        finally:
+            metrics.observe("copilot_tool_duration_seconds", (name,), time.perf_counter() - start)
+            metrics.inc("copilot_tool_calls_total", (name, status))
+    call.metrics_instrumented = True
+    return call
+
+
+def instrument_tools(tools: Iterable) -> None:
+    """Time every call of each StructuredTool (sync func and, if present, coroutine) in place."""
+    if not METRICS_ENABLED:
+        return
+    for tool in tools:
+        if getattr(tool.func, "metrics_instrumented", False) or getattr(tool.coroutine, "metrics_instrumented", False):
+            continue
+        if tool.func is not None:
+            tool.func = _timed_tool(tool.name, tool.func)
+        if tool.coroutine is not None:
+            tool.coroutine = _atimed_tool(tool.name, tool.coroutine)
@@ -0,0 +1,334 @@
+# profiling.py
+"""
+Enterprise Ops Copilot — On-Demand Run Profiling
+Captures one graph run: a wall-clock sampling profile of the threads doing
+its work, plus tracemalloc allocation data, attributed to graph nodes,
+tools and prompt rendering.
+
+  with ProfileCapture() as capture:
+      result = copilot_graph.invoke(state, config={"callbacks": capture.callbacks})
+  capture.save()   # PROFILE_DIR/<trace_id>.json and <trace_id>.collapsed
+
+The .collapsed file is the folded-stack format flamegraph tools read
+(flamegraph.pl, speedscope, inferno): one "outer;…;inner count" line per
+distinct stack. The .json report has the attribution:
+
+  cpu     seconds per node, per tool and in prompt rendering (share of
+          samples × run time; wall time, so waits on LLM calls count)
+  memory  peak and net traced memory for the run, per node (from node
+          start/end callbacks), and the top allocation sites still alive
+          at the end of the run
+
+Sampling covers the calling thread and any other thread while it runs
+code from this package (the retrieval and summary pools). Nothing is
+instrumented unless a capture is running, and only one capture runs at a
+time — tracemalloc is process-wide.
+"""
+from __future__ import annotations
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Iterable, Optional
+from config import (
+    PROFILE_DIR,
+    PROFILE_MAX_ARTIFACTS,
+    PROFILE_SAMPLE_INTERVAL_MS,
+    PROFILE_TRACEMALLOC_FRAMES,
+)
+
+_ROOT = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_PROMPTS_FILE = os.path.join(_ROOT, "prompts", "registry.py")
+_TRACE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+_capture_lock = threading.Lock()
+
+
+class ProfileBusy(RuntimeError):
+    """Another capture is already running in this process."""
+
+
+# ── Stack sampling ───────────────────────────────────────────────
+
+_labels: dict[Any, str] = {}
+
+
+def _frame_label(code) -> str:
+    """'module:function' for a code object — one flamegraph box per function."""
+    label = _labels.get(code)
+    if label is None:
+        path = code.co_filename
+        if path.startswith(_ROOT):
+            module = path[len(_ROOT):-3].replace(os.sep, ".") if path.endswith(".py") else path[len(_ROOT):]
+        else:
+            module = os.path.basename(path).removesuffix(".py")
+        label = _labels[code] = f"{module}:{code.co_qualname}"
+    return label
+
+
+def _tool_codes() -> dict[Any, str]:
+    """Code object of each tool's implementation → tool name."""
+    from tools import ALL_TOOLS
+    codes = {}
+    for tool in ALL_TOOLS:
+        for func in (tool.func, tool.coroutine):
+            func = getattr(func, "__wrapped__", func)   # unwrap metrics.instrument_tools
+            if func is not None:
+                codes[func.__code__] = tool.name
+    return codes
+
+
+def _attribute(frame, tool_codes: dict) -> tuple[Optional[str], bool, bool]:
+    """(tool, in prompt rendering, runs package code) for a sampled stack, innermost frame first."""
+    tool = None
+    prompt = ours = False
+    while frame is not None:
+        code = frame.f_code
+        if code.co_filename.startswith(_ROOT):
+            ours = True
+            if tool is None:
+                tool = tool_codes.get(code)
+            if code.co_filename == _PROMPTS_FILE:
+                prompt = True
+        frame = frame.f_back
+    return tool, prompt, ours
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, target_thread: int, interval_s: float, exclude: Iterable[int], running_nodes: dict):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.target_thread = target_thread
+        self.running_nodes = running_nodes   # thread id → node it is executing (NodeTracker)
+        self.tool_codes = _tool_codes()
+        self.interval_s = interval_s
+        self.exclude = set(exclude)
+        self.stop_event = threading.Event()
+        self.stacks: Counter = Counter()
+        self.nodes: Counter = Counter()
+        self.tools: Counter = Counter()
+        self.prompt_samples = 0
+        self.samples = 0
+
+    def run(self) -> None:
+        me = threading.get_ident()
+        while not self.stop_event.wait(self.interval_s):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me or thread_id in self.exclude:
+                    continue
+                tool, prompt, ours = _attribute(frame, self.tool_codes)
+                if thread_id != self.target_thread and not ours:
+                    continue   # idle pool threads and unrelated work
+                node = self.running_nodes.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                if node:
+                    self.nodes[node] += 1
+                if tool:
+                    self.tools[tool] += 1
+                if prompt:
+                    self.prompt_samples += 1
+
+
+# ── Node boundaries (callbacks) ──────────────────────────────────
+
+def _node_tracker():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class NodeTracker(BaseCallbackHandler):
+        """Which node each thread is running (for the sampler), and traced memory per node execution."""
+
+        def __init__(self):
+            self._open: dict = {}
+            self.running: dict[int, str] = {}
+            self.nodes: dict[str, dict] = defaultdict(lambda: {"calls": 0, "peak_kib": 0.0, "net_kib": 0.0})
+
+        def on_chain_start(self, serialized, inputs, *, run_id, tags=None, metadata=None, **kwargs):
+            node = (metadata or {}).get("langgraph_node")
+            if node is None or kwargs.get("name") != node or not any(t.startswith("graph:step:") for t in tags or ()):
+                return
+            tracemalloc.reset_peak()
+            self._open[run_id] = (node, tracemalloc.get_traced_memory()[0])
+            self.running[threading.get_ident()] = node
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            opened = self._open.pop(run_id, None)
+            if opened is None:
+                return
+            self.running.pop(threading.get_ident(), None)
+            node, start = opened
+            current, peak = tracemalloc.get_traced_memory()
+            stats = self.nodes[node]
+            stats["calls"] += 1
+            stats["peak_kib"] = max(stats["peak_kib"], round((peak - start) / 1024, 1))
+            stats["net_kib"] = round(stats["net_kib"] + (current - start) / 1024, 1)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            if self._open.pop(run_id, None) is not None:
+                self.running.pop(threading.get_ident(), None)
+
+    return NodeTracker()
+
+
+# ── Capture ──────────────────────────────────────────────────────
+
+class ProfileCapture:
+    """Profile everything run inside the with-block; pass .callbacks to the graph run."""
+
+    def __init__(
+        self,
+        label: str = "",
+        interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS,
+        exclude_threads: Iterable[int] = (),
+        trace_id: Optional[str] = None,
+    ):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.label = label
+        self.interval_s = interval_ms / 1000
+        self.exclude_threads = tuple(exclude_threads)
+        self.report: dict = {}
+        self.collapsed = ""
+        self._nodes = _node_tracker()
+        self.callbacks = [self._nodes]
+
+    def __enter__(self) -> "ProfileCapture":
+        if not _capture_lock.acquire(blocking=False):
+            raise ProfileBusy("A profile capture is already running")
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        self._start_snapshot = tracemalloc.take_snapshot()
+        self._start_memory = tracemalloc.get_traced_memory()[0]
+        self._sampler = _Sampler(threading.get_ident(), self.interval_s, self.exclude_threads, self._nodes.running)
+        self._started_at = time.time()
+        self._start = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            duration = time.perf_counter() - self._start
+            self._sampler.stop_event.set()
+            self._sampler.join()
+            current, peak = tracemalloc.get_traced_memory()
+            end_snapshot = tracemalloc.take_snapshot()
+            if self._started_tracing:
+                tracemalloc.stop()
+            self._build_report(duration, current, peak, end_snapshot)
+            if exc is not None:
+                self.report["error"] = f"{exc_type.__name__}: {exc}"
+        finally:
+            _capture_lock.release()
+
+    def _build_report(self, duration: float, current: int, peak: int, end_snapshot) -> None:
+        sampler = self._sampler
+        # Each sample stands for an equal slice of the run (the sampler can't always keep its interval)
+        seconds = lambda count: round(count / max(1, sampler.samples) * duration, 4)   # noqa: E731
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        diffs = end_snapshot.filter_traces(ignore).compare_to(
+            self._start_snapshot.filter_traces(ignore), "traceback"
+        )
+        grown = [d for d in diffs if d.size_diff > 0]
+
+        tool_files = {code.co_filename: name for code, name in sampler.tool_codes.items()}
+        tool_bytes, prompt_bytes = Counter(), 0
+        for diff in grown:
+            files = [frame.filename for frame in diff.traceback]
+            tools = [tool_files[f] for f in files if f in tool_files]
+            if tools:
+                tool_bytes[tools[-1]] += diff.size_diff
+            if _PROMPTS_FILE in files:
+                prompt_bytes += diff.size_diff
+
+        self.collapsed = "".join(f"{stack} {count}\n" for stack, count in sampler.stacks.most_common())
+        self.report = {
+            "trace_id": self.trace_id,
+            "label": self.label,
+            "started_at": self._started_at,
+            "duration_s": round(duration, 4),
+            "interval_ms": self.interval_s * 1000,
+            "samples": sampler.samples,
+            "cpu": {
+                "nodes_s": {node: seconds(n) for node, n in sampler.nodes.most_common()},
+                "tools_s": {tool: seconds(n) for tool, n in sampler.tools.most_common()},
+                "prompt_rendering_s": seconds(sampler.prompt_samples),
+            },
+            "memory": {
+                "peak_kib": round((peak - self._start_memory) / 1024, 1),
+                "net_kib": round((current - self._start_memory) / 1024, 1),
+                "nodes": dict(self._nodes.nodes),
+                "tools_net_kib": {tool: round(b / 1024, 1) for tool, b in tool_bytes.most_common()},
+                "prompt_rendering_net_kib": round(prompt_bytes / 1024, 1),
+                "top_sites": [
+                    {
+                        "site": f"{_short_path(d.traceback[-1].filename)}:{d.traceback[-1].lineno}",
+                        "net_kib": round(d.size_diff / 1024, 1),
+                        "blocks": d.count_diff,
+                    }
+                    for d in grown[:15]
+                ],
+            },
+        }
+
+    def save(self, directory: str = PROFILE_DIR) -> str:
+        """Write <trace_id>.json and <trace_id>.collapsed; returns the JSON path."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.trace_id)
+        with open(base + ".collapsed", "w") as f:
+            f.write(self.collapsed)
+        with open(base + ".json", "w") as f:
+            json.dump(self.report, f, indent=2)
+        _prune(directory, PROFILE_MAX_ARTIFACTS)
+        return base + ".json"
+
+
+def _short_path(path: str) -> str:
+    return path[len(_ROOT):] if path.startswith(_ROOT) else path
+
+
+def _prune(directory: str, keep: int) -> None:
+    """Delete all but the newest `keep` captures."""
+    reports = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in reports[keep:]:
+        for suffix in (".json", ".collapsed"):
+            try:
+                os.remove(entry.path[:-len(".json")] + suffix)
+            except FileNotFoundError:
+                pass
+
+
+def load_profile(trace_id: str, kind: str = "json", directory: str = PROFILE_DIR) -> Optional[str]:
+    """Stored artifact text for a trace id ("json" | "collapsed"), or None if there is none."""
+    if not _TRACE_ID.match(trace_id) or kind not in ("json", "collapsed"):
+        return None
+    try:
+        with open(os.path.join(directory, f"{trace_id}.{kind}")) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def format_summary(report: dict, top: int = 5) -> str:
+    """A few lines for the CLI: run time, top nodes and tools, prompt rendering and memory."""
+    cpu, memory = report["cpu"], report["memory"]
+    lines = [f"profile {report['trace_id']}  {report['duration_s'] * 1000:.1f} ms, {report['samples']} samples"]
+    for title, values in (("nodes", cpu["nodes_s"]), ("tools", cpu["tools_s"])):
+        if values:
+            shown = ", ".join(f"{name} {s * 1000:.1f} ms" for name, s in list(values.items())[:top])
+            lines.append(f"  {title}: {shown}")
+    lines.append(f"  prompt rendering: {cpu['prompt_rendering_s'] * 1000:.1f} ms")
+    lines.append(f"  memory: peak {memory['peak_kib']:.1f} KiB, net {memory['net_kib']:.1f} KiB")
+    return "\n".join(lines)
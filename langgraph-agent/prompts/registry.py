@@ -3,8 +3,21 @@
 Enterprise Ops Copilot — Dynamic Prompt Registry
 Versioned, parameterized prompt templates.
 Each skill requests its prompt by name + version.
+
+Templates are compiled once, when registered, into alternating literal
+and slot segments: {name} is a slot, {{ and }} are literal braces. A
+malformed template fails at registration and a render with missing or
+unknown parameters raises, instead of leaking "{placeholder}" text into
+a prompt. Rendering is a single join.
+
+Layout "static_prefix" moves every blank-line-separated section that
+contains a slot after all fully static sections, so the instructions form
+a byte-identical prefix across calls and provider prompt caching can
+reuse it. static_prefix is the text every rendering starts with.
 """
 from __future__ import annotations
+import hashlib
+import re
 from typing import Optional
 
 
@@ -61,6 +74,24 @@ USER QUESTION:
 {question}""",
     },
 
+    "rag_answer:v2": {
+        "name": "rag_answer",
+        "version": "v2",
+        "domain": "support",
+        "risk_tier": 1,
+        "layout": "static_prefix",
+        "template": """You are a grounded Q&A assistant for enterprise support.
+
+RULES:
+- Answer the user's latest question ONLY based on the context chunks at the end of this message
+- If the context is insufficient, say "I don't have enough information to answer this confidently"
+- Include citation markers like [1], [2] when referencing sources
+- Be concise and direct
+
+CONTEXT CHUNKS:
+{retrieved_chunks}""",
+    },
+
     "action:v1": {
         "name": "action",
         "version": "v1",
@@ -115,6 +146,36 @@ Respond with JSON:
 }}""",
     },
 
+    "compliance:v2": {
+        "name": "compliance",
+        "version": "v2",
+        "domain": "legal",
+        "risk_tier": 2,
+        "layout": "static_prefix",
+        "template": """You are a compliance assessment specialist. BE EXTREMELY CAREFUL.
+
+RULES:
+- Assess the user's request against the policy context at the end of this message
+- If medical, legal, or financial risk is HIGH or CRITICAL, recommend escalation
+- Never provide definitive legal or medical advice
+- Always cite policy sources
+- If uncertain, err on the side of caution and ESCALATE
+
+Respond with JSON:
+{{
+  "status": "compliant|non_compliant|needs_review",
+  "recommendation": "what to do",
+  "cited_policies": ["source1", "source2"],
+  "escalation_needed": true or false,
+  "confidence": 0.0 to 1.0
+}}
+
+RISK LEVEL: {risk_level}
+
+POLICY CONTEXT:
+{policy_context}""",
+    },
+
     "summarize:v1": {
         "name": "summarize",
         "version": "v1",
@@ -134,16 +195,155 @@ CONTENT:
 {content}""",
     },
 
+    "summarize:v2": {
+        "name": "summarize",
+        "version": "v2",
+        "domain": "general",
+        "risk_tier": 0,
+        "template": """Summarize the content in the user's message.
+
+Format: {format}
+Max length: {max_tokens} tokens
+
+Rules:
+- Be precise, retain key facts, dates, and action items
+- Do not add information not present in the source
+- Use {format} format""",
+    },
+
+    "summarize_partial:v1": {
+        "name": "summarize_partial",
+        "version": "v1",
+        "domain": "general",
+        "risk_tier": 0,
+        "template": """The user's message is {part} of a longer text that is being summarized piece by piece.
+
+Summarize only this piece in at most {max_tokens} tokens.
+
+Rules:
+- Retain key facts, names, dates, figures, and action items
+- Do not add information not present in the piece
+- Plain prose, no preamble""",
+    },
+
+    "history_summary:v1": {
+        "name": "history_summary",
+        "version": "v1",
+        "domain": "general",
+        "risk_tier": 0,
+        "template": """You maintain a running summary of a support conversation.
+
+Update the existing summary with the new turns below.
+
+Rules:
+- Keep names, IDs, numbers, dates, decisions, and open questions
+- Drop greetings, filler, and anything already superseded
+- Write in third person ("The user asked...", "The assistant answered...")
+- Stay under {max_tokens} tokens
+
+EXISTING SUMMARY:
+{summary}
+
+NEW TURNS:
+{turns}""",
+    },
+
 }
 
 
+# ── Compiled Templates ──────────────────────────────────────────
+
+_TOKEN_RE = re.compile(r"\{\{|\}\}|\{([A-Za-z_][A-Za-z0-9_]*)\}|[{}]")
+LAYOUTS = ("inline", "static_prefix")
+
+
+class CompiledTemplate:
+    """A template split into literal and slot segments.
+
+    parts alternates literal, slot name, literal, ... and always starts and
+    ends with a literal (possibly empty).
+    """
+
+    def __init__(self, key: str, text: str, layout: str = "inline"):
+        if layout not in LAYOUTS:
+            raise ValueError(f"Prompt template '{key}': unknown layout '{layout}' (expected one of {LAYOUTS})")
+        self.key = key
+        self.layout = layout
+        sections = text.split("\n\n")
+        if layout == "static_prefix":
+            parsed = [_parse(key, section) for section in sections]
+            static = [p for p in parsed if len(p) == 1]
+            dynamic = [p for p in parsed if len(p) > 1]
+            parts = _join_sections(static + dynamic)
+        else:
+            parts = _parse(key, text)
+        self.parts = parts
+        self.slots = parts[1::2]
+        self.params = frozenset(self.slots)
+        self.static_prefix = parts[0]
+        self.literal_text = "".join(parts[0::2])
+
+    def render(self, **params) -> str:
+        return self.render_map(params)
+
+    def render_map(self, params: dict) -> str:
+        """render() with the parameters as a dict."""
+        try:
+            values = [str(params[slot]) for slot in self.slots]
+        except KeyError:
+            values = None
+        if values is None or len(params) != len(self.params):
+            missing = self.params - params.keys()
+            unknown = params.keys() - self.params
+            problems = [f"{label} params {sorted(names)}" for label, names in
+                        (("missing", missing), ("unknown", unknown)) if names]
+            raise ValueError(f"Prompt template '{self.key}': " + ", ".join(problems))
+        out = list(self.parts)
+        out[1::2] = values
+        return "".join(out)
+
+
+def _parse(key: str, text: str) -> list[str]:
+    """Split text into [literal, slot, literal, ...]; raises ValueError on stray braces."""
+    parts, literal, pos = [], [], 0
+    for match in _TOKEN_RE.finditer(text):
+        literal.append(text[pos:match.start()])
+        token = match.group(0)
+        if token in ("{{", "}}"):
+            literal.append(token[0])
+        elif match.group(1):
+            parts.append("".join(literal))
+            parts.append(match.group(1))
+            literal = []
+        else:
+            line = text.count("\n", 0, match.start()) + 1
+            raise ValueError(f"Prompt template '{key}': unmatched '{token}' on line {line} (use {{{{ or }}}} for a literal brace)")
+        pos = match.end()
+    literal.append(text[pos:])
+    parts.append("".join(literal))
+    return parts
+
+
+def _join_sections(sections: list[list[str]]) -> list[str]:
+    """Concatenate parsed sections with blank lines, merging adjacent literals."""
+    parts = [""]
+    for i, section in enumerate(sections):
+        parts[-1] += ("\n\n" if i else "") + section[0]
+        parts.extend(section[1:])
+    return parts
+
+
 # ── Registry Class ───────────────────────────────────────────────
 
 class PromptRegistry:
     """Retrieves and renders prompt templates by name and version."""
 
     def __init__(self):
-        self._templates = TEMPLATES.copy()
+        self._templates: dict[str, dict] = {}
+        self._compiled: dict[str, CompiledTemplate] = {}
+        self._fingerprint: Optional[str] = None
+        for key, template in TEMPLATES.items():
+            self.register(key, template)
 
     def get(self, name: str, version: str = "v1") -> dict:
         """Get a raw template by name:version."""
@@ -152,6 +352,13 @@ class PromptRegistry:
             raise KeyError(f"Prompt template '{key}' not found. Available: {list(self._templates.keys())}")
         return self._templates[key]
 
+    def compiled(self, name: str, version: str = "v1") -> CompiledTemplate:
+        """Get the compiled form of name:version."""
+        compiled = self._compiled.get(f"{name}:{version}")
+        if compiled is None:
+            self.get(name, version)   # raises KeyError listing what's available
+        return compiled
+
     def render(self, name: str, version: str = "v1", **params) -> str:
         """Get template and fill in parameters.
         
@@ -162,23 +369,34 @@ class PromptRegistry:
                 available_tools="search_docs, salesforce_lookup"
             )
         """
-        template = self.get(name, version)
-        rendered = template["template"]
-        for key, value in params.items():
-            rendered = rendered.replace(f"{{{key}}}", str(value))
-        return rendered
+        return self.compiled(name, version).render_map(params)
 
     def list_templates(self) -> list[dict]:
         """List all available templates (metadata only, no template text)."""
         return [
-            {"name": t["name"], "version": t["version"], "domain": t["domain"], "risk_tier": t["risk_tier"]}
-            for t in self._templates.values()
+            {
+                "name": t["name"], "version": t["version"], "domain": t["domain"], "risk_tier": t["risk_tier"],
+                "layout": self._compiled[key].layout, "params": sorted(self._compiled[key].params),
+            }
+            for key, t in self._templates.items()
         ]
 
     def register(self, key: str, template: dict) -> None:
-        """Add or override a template at runtime."""
+        """Add or override a template at runtime. Raises ValueError if it doesn't compile."""
+        self._compiled[key] = CompiledTemplate(key, template["template"], template.get("layout", "inline"))
         self._templates[key] = template
+        self._fingerprint = None
+
+    def fingerprint(self) -> str:
+        """Short digest of every registered template — changes whenever a prompt does."""
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for key in sorted(self._compiled):
+                compiled = self._compiled[key]
+                digest.update(f"{key}\x1f{compiled.layout}\x1f{''.join(compiled.parts)}\x1e".encode("utf-8"))
+            self._fingerprint = digest.hexdigest()[:16]
+        return self._fingerprint
 
 
 # ── Singleton instance ───────────────────────────────────────────
-prompt_registry = PromptRegistry()
\ No newline at end of file
+prompt_registry = PromptRegistry()
@@ -0,0 +1,11 @@
+"""
+Enterprise Ops Copilot — Search Indexes
+In-process retrieval engines used by tools.search_docs.
+"""
+from search_index.bm25 import BM25Index, tokenize
+from search_index.corpus import Corpus
+
+# search_index.dense (DenseIndex, HashingEmbedder) needs NumPy and is imported
+# on first dense/hybrid query rather than here.
+
+__all__ = ["BM25Index", "Corpus", "tokenize"]
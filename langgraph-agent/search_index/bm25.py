@@ -0,0 +1,165 @@
+"""
+BM25 inverted index.
+
+Documents are tokenized once at add() time into postings lists
+(term → {doc slot: term frequency}). A query only touches the postings of
+its own terms, and top-k is selected with a heap instead of sorting every
+document, so query cost scales with the matching postings — not with
+corpus size or document length.
+
+Supports incremental add / upsert / remove by document id. Mutations and
+queries share one lock, so documents can be indexed while searches run on
+other threads (a query sees the index before or after an add, never halfway).
+"""
+from __future__ import annotations
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Iterable, Optional
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its "
+    "me my of on or our so than that the their them then there these this to was we "
+    "what when where which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, split on non-alphanumerics, drop stopwords, fold simple plurals."""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, dict[int, int]] = {}
+        self._slots: dict[str, int] = {}            # doc id → slot
+        self._ids: list[Optional[str]] = []          # slot → doc id (None = free)
+        self._lengths: list[int] = []
+        self._terms: list[tuple[str, ...]] = []      # slot → unique terms (for removal)
+        self._payloads: list[Any] = []
+        self._free: list[int] = []
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._slots
+
+    def get(self, doc_id: str) -> Any:
+        """Payload stored for a document, or None."""
+        with self._lock:
+            slot = self._slots.get(doc_id)
+            return None if slot is None else self._payloads[slot]
+
+    def items(self) -> Iterable[tuple[str, Any]]:
+        """(doc_id, payload) for every indexed document, as of the call."""
+        with self._lock:
+            return [(doc_id, self._payloads[slot]) for doc_id, slot in self._slots.items()]
+
+    # ── Mutation ─────────────────────────────────────────────────
+
+    def add(self, doc_id: str, text: str, payload: Any = None) -> None:
+        """Index a document; replaces any existing document with the same id."""
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        with self._lock:
+            self._remove(doc_id)
+            self._add(doc_id, tokens, counts, payload)
+
+    def _add(self, doc_id: str, tokens: list[str], counts: Counter, payload: Any) -> None:
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = doc_id
+            self._lengths[slot] = len(tokens)
+            self._terms[slot] = tuple(counts)
+            self._payloads[slot] = payload
+        else:
+            slot = len(self._ids)
+            self._ids.append(doc_id)
+            self._lengths.append(len(tokens))
+            self._terms.append(tuple(counts))
+            self._payloads.append(payload)
+
+        self._slots[doc_id] = slot
+        self._total_length += len(tokens)
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[slot] = tf
+
+    def add_many(self, docs: Iterable[tuple[str, str, Any]]) -> None:
+        """Index (doc_id, text, payload) triples."""
+        for doc_id, text, payload in docs:
+            self.add(doc_id, text, payload)
+
+    def remove(self, doc_id: str) -> bool:
+        """Drop a document from the index. Returns False if it wasn't indexed."""
+        with self._lock:
+            return self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> bool:
+        slot = self._slots.pop(doc_id, None)
+        if slot is None:
+            return False
+
+        for term in self._terms[slot]:
+            postings = self._postings[term]
+            del postings[slot]
+            if not postings:
+                del self._postings[term]
+
+        self._total_length -= self._lengths[slot]
+        self._ids[slot] = None
+        self._lengths[slot] = 0
+        self._terms[slot] = ()
+        self._payloads[slot] = None
+        self._free.append(slot)
+        return True
+
+    # ── Query ────────────────────────────────────────────────────
+
+    def search(self, query: str, k: int = 3) -> list[tuple[float, str, Any]]:
+        """Top-k documents for a query as (score, doc_id, payload), best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            return self._search(terms, k)
+
+    def _search(self, terms: set[str], k: int) -> list[tuple[float, str, Any]]:
+        n_docs = len(self._slots)
+        if n_docs == 0 or k <= 0:
+            return []
+
+        k1, b = self.k1, self.b
+        avg_len = self._total_length / n_docs or 1.0
+        lengths = self._lengths
+        scores: dict[int, float] = {}
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for slot, tf in postings.items():
+                norm = k1 * (1.0 - b + b * lengths[slot] / avg_len)
+                scores[slot] = scores.get(slot, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(score, self._ids[slot], self._payloads[slot]) for slot, score in top]
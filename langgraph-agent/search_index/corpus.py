@@ -0,0 +1,341 @@
+"""
+Memory-mapped document corpus.
+
+A read-only, on-disk document store that also carries its BM25 postings.
+Every file is opened with mmap (ACCESS_READ), so opening a corpus costs
+the same for ten documents or ten million, nothing is copied onto the
+Python heap, and all worker processes on a host share the same page
+cache. Offsets and postings are read in place through memoryview casts.
+A search scores rows from the postings of the query terms only, and only
+the top-k rows are decoded into dicts.
+
+Layout of a corpus directory:
+    meta.json        {"format", "count", "columns", "terms", "total_length", "byteorder"}
+    <column>.off     uint64 × (count + 1) byte offsets into <column>.txt
+    <column>.txt     the column's values, UTF-8, back to back (id, text, source, ...)
+    order.u32        rows sorted by id (id lookup by binary search)
+    lengths.u32      BM25 document length (tokens) per row
+    terms.off/.txt   the vocabulary, sorted by UTF-8 bytes
+    postings.off     uint64 × (terms + 1) offsets into postings.u32, in entries
+    postings.u32     (row, term frequency) pairs per term
+
+Integers are native-endian; meta.json records the byte order and load()
+refuses a corpus written on the other one.
+
+Supports the read side of the BM25Index interface (len, in, get, items,
+search), so tools.search_docs can use either. Build one with Corpus.build()
+and open it with Corpus.load().
+"""
+from __future__ import annotations
+import heapq
+import json
+import math
+import mmap
+import os
+import shutil
+import sys
+from array import array
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+from typing import Iterable, Iterator, Optional
+from search_index.bm25 import tokenize
+
+FORMAT_VERSION = 1
+KEY_COLUMNS = ("id", "text")
+
+# (row, tf) pairs Corpus.build holds in memory before spilling a sorted
+# run to disk (~8 bytes each).
+SPILL_ENTRIES = 8_000_000
+
+
+def _map(path: str) -> memoryview:
+    """Read-only view of a whole file (empty files can't be mmapped)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return memoryview(b"")
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+class _StringColumn:
+    """Variable-length UTF-8 values addressed by an offsets table."""
+
+    def __init__(self, path: str, name: str):
+        self.offsets = _map(os.path.join(path, f"{name}.off")).cast("Q")
+        self.data = _map(os.path.join(path, f"{name}.txt"))
+
+    def raw(self, row: int) -> bytes:
+        return bytes(self.data[self.offsets[row]:self.offsets[row + 1]])
+
+    def __getitem__(self, row: int) -> str:
+        return str(self.data[self.offsets[row]:self.offsets[row + 1]], "utf-8")
+
+
+class _StringColumnWriter:
+    def __init__(self, path: str, name: str):
+        self._data = open(os.path.join(path, f"{name}.txt"), "wb")
+        self._offsets = open(os.path.join(path, f"{name}.off"), "wb")
+        self._position = 0
+        array("Q", [0]).tofile(self._offsets)
+
+    def append(self, value: str) -> None:
+        encoded = value.encode("utf-8")
+        self._data.write(encoded)
+        self._position += len(encoded)
+        array("Q", [self._position]).tofile(self._offsets)
+
+    def close(self) -> None:
+        self._data.close()
+        self._offsets.close()
+
+
+class Corpus:
+    """BM25 search and id lookup over a memory-mapped corpus directory."""
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported corpus format {meta.get('format')!r}")
+        if meta["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path}: corpus was written on a {meta['byteorder']}-endian host")
+
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.columns = tuple(meta["columns"])
+        self._count = meta["count"]
+        self._total_length = meta["total_length"]
+        self._n_terms = meta["terms"]
+        self._values = {name: _StringColumn(path, name) for name in self.columns}
+        self._ids = self._values["id"]
+        self._order = _map(os.path.join(path, "order.u32")).cast("I")
+        self._lengths = _map(os.path.join(path, "lengths.u32")).cast("I")
+        self._terms = _StringColumn(path, "terms")
+        self._postings_offsets = _map(os.path.join(path, "postings.off")).cast("Q")
+        self._postings = _map(os.path.join(path, "postings.u32")).cast("I")
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, doc_id: str) -> bool:
+        return self._row(doc_id) is not None
+
+    # ── Lookup ───────────────────────────────────────────────────
+
+    def document(self, row: int) -> dict:
+        """Decode one row into {column: value}."""
+        return {name: column[row] for name, column in self._values.items()}
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        """Decoded document for an id, or None."""
+        row = self._row(doc_id)
+        return None if row is None else self.document(row)
+
+    def items(self) -> Iterable[tuple[str, dict]]:
+        """(doc_id, document) for every row, decoded one at a time."""
+        return ((self._ids[row], self.document(row)) for row in range(self._count))
+
+    def _row(self, doc_id: str) -> Optional[int]:
+        key = doc_id.encode("utf-8")
+        order, ids = self._order, self._ids
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if ids.raw(order[mid]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and ids.raw(order[lo]) == key:
+            return order[lo]
+        return None
+
+    def _postings_of(self, term: str) -> Optional[memoryview]:
+        """(row, tf) pairs of a term, flattened, read in place."""
+        key = term.encode("utf-8")
+        terms = self._terms
+        lo, hi = 0, self._n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if terms.raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self._n_terms or terms.raw(lo) != key:
+            return None
+        offsets = self._postings_offsets
+        return self._postings[2 * offsets[lo]:2 * offsets[lo + 1]]
+
+    # ── Query ────────────────────────────────────────────────────
+
+    def search(self, query: str, k: int = 3) -> list[tuple[float, str, dict]]:
+        """Top-k documents for a query as (score, doc_id, document), best first.
+
+        Scores match BM25Index over the same documents.
+        """
+        n_docs = self._count
+        if n_docs == 0 or k <= 0:
+            return []
+
+        k1, b = self.k1, self.b
+        avg_len = self._total_length / n_docs or 1.0
+        lengths = self._lengths
+        scores: dict[int, float] = {}
+
+        for term in set(tokenize(query)):
+            postings = self._postings_of(term)
+            if postings is None:
+                continue
+            df = len(postings) // 2
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for row, tf in zip(postings[::2], postings[1::2]):
+                norm = k1 * (1.0 - b + b * lengths[row] / avg_len)
+                scores[row] = scores.get(row, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+
+        top = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        results = []
+        for row, score in top:   # only the winners are decoded
+            document = self.document(row)
+            results.append((score, document["id"], document))
+        return results
+
+    # ── Construction ─────────────────────────────────────────────
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        docs: Iterable[dict],
+        columns: Iterable[str] = ("source",),
+        spill_entries: int = SPILL_ENTRIES,
+    ) -> "Corpus":
+        """Write documents ({id, text, <columns>...}) to a corpus directory, then open it.
+
+        Text and metadata stream straight to disk. Postings are held as
+        compact uint32 arrays per term; once spill_entries (row, tf) pairs
+        are held they are written out as a sorted run, and the runs are
+        merged term by term at the end, so memory stays bounded by
+        spill_entries plus the encoded ids (needed for the sorted id table).
+        Duplicate ids raise ValueError. Missing metadata values are stored as "".
+        """
+        columns = KEY_COLUMNS + tuple(c for c in columns if c not in KEY_COLUMNS)
+        os.makedirs(path, exist_ok=True)
+        runs_dir = os.path.join(path, "_runs")
+        writers = {name: _StringColumnWriter(path, name) for name in columns}
+        ids: list[bytes] = []
+        lengths = array("I")
+        postings: dict[str, array] = {}
+        held = 0
+        runs: list[str] = []
+        try:
+            for row, doc in enumerate(docs):
+                for name, writer in writers.items():
+                    writer.append(str(doc.get(name) or ""))
+                ids.append(doc["id"].encode("utf-8"))
+                tokens = tokenize(doc["text"])
+                lengths.append(len(tokens))
+                counts = Counter(tokens)
+                for term, tf in counts.items():
+                    entries = postings.get(term)
+                    if entries is None:
+                        entries = postings[term] = array("I")
+                    entries.append(row)
+                    entries.append(tf)
+                held += len(counts)
+                if held >= spill_entries:
+                    runs.append(_write_run(runs_dir, len(runs), postings))
+                    postings, held = {}, 0
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        order = array("I", sorted(range(len(ids)), key=ids.__getitem__))
+        for a, b in zip(order, order[1:]):
+            if ids[a] == ids[b]:
+                raise ValueError(f"duplicate document id {ids[a].decode('utf-8')!r}")
+        with open(os.path.join(path, "order.u32"), "wb") as f:
+            order.tofile(f)
+        with open(os.path.join(path, "lengths.u32"), "wb") as f:
+            lengths.tofile(f)
+        count = len(ids)
+        del ids
+
+        if runs:
+            if postings:
+                runs.append(_write_run(runs_dir, len(runs), postings))
+            merged = _merge_runs(runs)
+        else:
+            merged = ((term, postings[term]) for term in sorted(postings, key=lambda t: t.encode("utf-8")))
+        n_terms = 0
+        terms = _StringColumnWriter(path, "terms")
+        position = array("Q", [0])
+        with open(os.path.join(path, "postings.u32"), "wb") as f:
+            for term, entries in merged:
+                terms.append(term)
+                entries.tofile(f)
+                position.append(position[-1] + len(entries) // 2)
+                n_terms += 1
+        terms.close()
+        with open(os.path.join(path, "postings.off"), "wb") as f:
+            position.tofile(f)
+        shutil.rmtree(runs_dir, ignore_errors=True)
+
+        meta = {
+            "format": FORMAT_VERSION,
+            "count": count,
+            "columns": list(columns),
+            "terms": n_terms,
+            "total_length": sum(lengths),
+            "byteorder": sys.byteorder,
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str) -> "Corpus":
+        """Open a corpus directory read-only via mmap (no documents are read yet)."""
+        return cls(path)
+
+
+# ── Postings runs (bounded-memory build) ─────────────────────────
+
+def _write_run(directory: str, number: int, postings: dict[str, array]) -> str:
+    """Write held postings in term order: per term a (term bytes, pairs) header, the term, the pairs."""
+    os.makedirs(directory, exist_ok=True)
+    run_path = os.path.join(directory, f"run-{number:05d}")
+    with open(run_path, "wb") as f:
+        for term in sorted(postings, key=lambda t: t.encode("utf-8")):
+            encoded = term.encode("utf-8")
+            entries = postings[term]
+            array("Q", [len(encoded), len(entries)]).tofile(f)
+            f.write(encoded)
+            entries.tofile(f)
+    return run_path
+
+
+def _read_run(run_path: str) -> Iterator[tuple[bytes, array]]:
+    with open(run_path, "rb") as f:
+        while True:
+            header = array("Q")
+            try:
+                header.fromfile(f, 2)
+            except EOFError:
+                return
+            term = f.read(header[0])
+            entries = array("I")
+            entries.fromfile(f, header[1])
+            yield term, entries
+
+
+def _merge_runs(run_paths: list[str]) -> Iterator[tuple[str, array]]:
+    """Postings per term across runs, in term order. Runs cover ascending
+    row ranges and heapq.merge keeps equal terms in run order, so each
+    term's rows stay ascending."""
+    streams = [_read_run(run_path) for run_path in run_paths]
+    merged = heapq.merge(*streams, key=itemgetter(0))
+    for term, group in groupby(merged, key=itemgetter(0)):
+        entries = array("I")
+        for _, part in group:
+            entries.extend(part)
+        yield term.decode("utf-8"), entries
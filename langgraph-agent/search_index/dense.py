@@ -0,0 +1,189 @@
+"""
+Dense vector index.
+
+Embeddings live in one contiguous float32 (or float16) matrix. On disk the
+matrix is a .npy file opened with mmap_mode="r", so loading is instant and
+every worker process shares the same page cache. A query is a single
+vectorized matmul (blockwise for float16) plus argpartition for top-k.
+
+Layout of an index directory:
+    vectors.npy   (N, dim) float32|float16, rows L2-normalized
+    ids.json      row → document id
+    meta.json     {"dim", "dtype", "count", "embedder"}
+
+Embedders follow the LangChain Embeddings interface (embed_documents /
+embed_query), so OpenAIEmbeddings plugs in directly. HashingEmbedder is a
+deterministic, offline stand-in for tests and mock mode.
+"""
+from __future__ import annotations
+import json
+import os
+import zlib
+from typing import Any, Iterable, Iterator
+import numpy as np
+from search_index.bm25 import tokenize
+
+# Rows upcast per matmul when scoring a float16 matrix — bounds the float32
+# scratch space.
+SCORE_BLOCK_ROWS = 65536
+
+
+class HashingEmbedder:
+    """Deterministic offline embedder: signed feature hashing of tokens + bigrams."""
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _embed(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        tokens = tokenize(text)
+        features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vec[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def embed_array(self, texts: list[str]) -> np.ndarray:
+        """Fast path for DenseIndex: embeddings as one float32 matrix."""
+        return np.stack([self._embed(t) for t in texts]) if texts else np.zeros((0, self.dim), np.float32)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text).tolist()
+
+
+def _embed_rows(embedder: Any, texts: list[str]) -> np.ndarray:
+    """Embed texts as a float32 matrix, using embed_array() when available."""
+    if hasattr(embedder, "embed_array"):
+        return embedder.embed_array(texts).astype(np.float32, copy=False)
+    return np.asarray(embedder.embed_documents(texts), dtype=np.float32)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class DenseIndex:
+    """Cosine-similarity search over a (possibly memory-mapped) embedding matrix."""
+
+    def __init__(self, vectors: np.ndarray, ids: list[str], embedder: Any):
+        if vectors.ndim != 2 or vectors.shape[0] != len(ids):
+            raise ValueError(f"vectors shape {vectors.shape} does not match {len(ids)} ids")
+        self.vectors = vectors
+        self.ids = ids
+        self.embedder = embedder
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ── Construction ─────────────────────────────────────────────
+
+    @classmethod
+    def from_texts(
+        cls,
+        ids: list[str],
+        texts: list[str],
+        embedder: Any,
+        dtype: str = "float32",
+    ) -> "DenseIndex":
+        """Build an in-memory index."""
+        vectors = _embed_rows(embedder, list(texts))
+        if len(ids) == 0:
+            vectors = vectors.reshape(0, len(embedder.embed_query("")))
+        return cls(_normalize_rows(vectors).astype(dtype), list(ids), embedder)
+
+    @classmethod
+    def build(
+        cls,
+        path: str,
+        docs: Iterable[tuple[str, str]],
+        embedder: Any,
+        count: int,
+        dtype: str = "float32",
+        batch_size: int = 1024,
+    ) -> "DenseIndex":
+        """Embed (doc_id, text) pairs straight into an on-disk matrix, then mmap it.
+
+        Rows are written batch by batch through np.lib.format.open_memmap, so
+        memory stays bounded by batch_size regardless of corpus size.
+        """
+        os.makedirs(path, exist_ok=True)
+        dim = len(embedder.embed_query(""))
+        matrix = np.lib.format.open_memmap(
+            os.path.join(path, "vectors.npy"), mode="w+", dtype=dtype, shape=(count, dim)
+        )
+        ids: list[str] = []
+        for batch in _batched(docs, batch_size):
+            rows = _embed_rows(embedder, [text for _, text in batch])
+            matrix[len(ids):len(ids) + len(batch)] = _normalize_rows(rows)
+            ids.extend(doc_id for doc_id, _ in batch)
+        if len(ids) != count:
+            raise ValueError(f"expected {count} documents, got {len(ids)}")
+        matrix.flush()
+        del matrix
+
+        with open(os.path.join(path, "ids.json"), "w") as f:
+            json.dump(ids, f)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"dim": dim, "dtype": dtype, "count": count, "embedder": getattr(embedder, "name", "")}, f)
+        return cls.load(path, embedder)
+
+    @classmethod
+    def load(cls, path: str, embedder: Any) -> "DenseIndex":
+        """Open an on-disk index read-only via mmap (no vectors are read yet)."""
+        vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        with open(os.path.join(path, "ids.json")) as f:
+            ids = json.load(f)
+        return cls(vectors, ids, embedder)
+
+    # ── Query ────────────────────────────────────────────────────
+
+    def search(self, query: str, k: int = 3) -> list[tuple[float, str]]:
+        """Top-k documents as (cosine score, doc_id), best first."""
+        n = len(self.ids)
+        if n == 0 or k <= 0:
+            return []
+        q = np.asarray(self.embedder.embed_query(query), dtype=np.float32)
+        scores = self.score(q)
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(float(scores[i]), self.ids[i]) for i in top]
+
+    def score(self, q: np.ndarray) -> np.ndarray:
+        """Cosine score of every row against a query vector."""
+        q = q / (np.linalg.norm(q) or 1.0)
+        if self.vectors.dtype == np.float32:
+            return self.vectors @ q
+        # float16: upcast block by block to keep scratch memory bounded
+        out = np.empty(self.vectors.shape[0], dtype=np.float32)
+        for start in range(0, self.vectors.shape[0], SCORE_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            out[start:start + len(block)] = block @ q
+        return out
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = 60) -> list[tuple[float, str]]:
+    """Fuse ranked doc-id lists: score(d) = Σ 1 / (k + rank_i(d)), best first."""
+    fused: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(((score, doc_id) for doc_id, score in fused.items()), key=lambda x: -x[0])
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,100 @@
+"""
+Index generations.
+
+An ingestion root holds immutable corpus generations and a CURRENT file
+naming the live one:
+
+    <root>/CURRENT         "gen-000042"
+    <root>/gen-000041/     a Corpus directory (plus dense/ when built)
+    <root>/gen-000042/
+    <root>/.lock           held while a generation is built and published
+
+A generation is built under a hidden .build-* directory and renamed to
+gen-N only once complete. CURRENT is then replaced with os.replace, so a
+reader sees the old generation or the new one — never a partial build —
+and readers never take a lock. Older generations are pruned after the
+swap. A worker that still has one mapped keeps serving from it until it
+switches, because unlinked files stay readable through an open mmap.
+"""
+from __future__ import annotations
+import os
+import re
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:   # non-POSIX: writers are not serialized
+    fcntl = None
+
+CURRENT_FILE = "CURRENT"
+_GENERATION_RE = re.compile(r"^gen-(\d+)$")
+
+
+def generations(root: str) -> list[str]:
+    """Names of the published generations, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    names = [name for name in os.listdir(root) if _GENERATION_RE.match(name)]
+    return sorted(names, key=lambda name: int(_GENERATION_RE.match(name).group(1)))
+
+
+def current(root: str) -> Optional[str]:
+    """Path of the live generation, or None before the first publish."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(root, name) if name else None
+
+
+@contextmanager
+def writer(root: str) -> Iterator[str]:
+    """Exclusive build directory for a new generation; the lock is held until exit.
+
+    Publish the directory with publish() before leaving the block; an
+    unpublished build is deleted on exit.
+    """
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, ".lock"), "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        build = tempfile.mkdtemp(prefix=".build-", dir=root)
+        try:
+            yield build
+        finally:
+            shutil.rmtree(build, ignore_errors=True)
+
+
+def publish(root: str, build: str, keep: int = 3) -> str:
+    """Rename a finished build to the next gen-N, point CURRENT at it, prune; returns its path."""
+    existing = generations(root)
+    number = int(_GENERATION_RE.match(existing[-1]).group(1)) + 1 if existing else 1
+    name = f"gen-{number:06d}"
+    path = os.path.join(root, name)
+    os.rename(build, path)
+
+    pointer = os.path.join(root, f".{CURRENT_FILE}.tmp")
+    with open(pointer, "w") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+
+    prune(root, keep)
+    return path
+
+
+def prune(root: str, keep: int) -> list[str]:
+    """Delete all but the newest `keep` generations (never the live one); returns the names removed."""
+    live = current(root)
+    live_name = os.path.basename(live) if live else None
+    removed = []
+    for name in generations(root)[:-max(keep, 1)]:
+        if name != live_name:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+            removed.append(name)
+    return removed
@@ -5,16 +5,68 @@ HTTP wrapper around the LangGraph agent.
 NestJS backend calls these endpoints.
 """
 from __future__ import annotations
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from typing import Optional
-from langchain_core.messages import HumanMessage
-from graph import copilot_graph
+from tokens import run_usage
+from metrics import metrics
+from profiling import ProfileBusy, ProfileCapture, load_profile
+from singleflight import SingleFlight, normalize_question, request_key
+from prompts.registry import prompt_registry
+from config import (
+    BATCH_CONCURRENCY,
+    BATCH_MAX_CONCURRENCY,
+    BATCH_MAX_QUESTIONS,
+    CHECKPOINT_DURABILITY,
+    COALESCE_QUERIES,
+    METRICS_ENABLED,
+    PROFILING_ENABLED,
+    SIDE_EFFECT_TOOLS,
+    WARMUP_ON_STARTUP,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ── Startup ──────────────────────────────────────────────────────
+# LangChain, LangGraph and the compiled graph are imported on first use
+# (see _user_message / _run_target), so importing this module — and
+# answering /health — is fast. The warm-up task loads all of it in the
+# background; /ready turns 200 once it has finished.
+
+_readiness: dict = {"ready": not WARMUP_ON_STARTUP, "warmup": {}, "error": None}
+
+
+async def _warm_up() -> None:
+    from warmup import warm_up
+    try:
+        _readiness["warmup"] = await asyncio.to_thread(warm_up)
+        _readiness["ready"] = True
+    except Exception as e:
+        logger.exception("Warm-up failed")
+        _readiness["error"] = f"{type(e).__name__}: {e}"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = asyncio.create_task(_warm_up()) if WARMUP_ON_STARTUP else None
+    yield
+    if task is not None:
+        task.cancel()
+
 
 app = FastAPI(
     title="Enterprise Ops Copilot — LangGraph Agent",
     version="1.0.0",
     description="ReAct reasoning engine for the Enterprise Ops Copilot",
+    lifespan=lifespan,
 )
 
 
@@ -24,12 +76,24 @@ class QueryRequest(BaseModel):
     question: str
     session_id: Optional[str] = None
     user_role: str = "support_agent"
+    tenant_id: Optional[str] = None
 
 
 class ActionRequest(BaseModel):
     action: str
     payload: dict
     session_id: Optional[str] = None
+    user_role: str = "support_agent"
+    tenant_id: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    questions: list[str]
+    concurrency: int = BATCH_CONCURRENCY
+    batch_llm_calls: bool = True
+    session_id: Optional[str] = None   # ledger account only; batch runs are not checkpointed
+    user_role: str = "support_agent"
+    tenant_id: Optional[str] = None
 
 
 class AgentResponse(BaseModel):
@@ -37,59 +101,359 @@ class AgentResponse(BaseModel):
     intent: Optional[str] = None
     llm_tier: Optional[int] = None
     risk_level: Optional[str] = None
-    total_cost: float = 0.0
+    total_cost: float = 0.0            # this request
+    session_cost: float = 0.0          # all turns of session_id so far
+    usage: dict = {}                   # this request's tokens, cache hits and savings (tokens.run_usage)
+    coalesced: bool = False            # answered by an identical in-flight request's run (costs are that run's)
+    trace_id: Optional[str] = None     # profiled runs only: GET /agent/profiles/{trace_id}
     citations: list[str] = []
     trace_log: list[dict] = []
 
 
+# ── Sessions ─────────────────────────────────────────────────────
+
+def _run_target(session_id: Optional[str]) -> tuple:
+    """(graph, run kwargs): the checkpointed graph resumes session_id; otherwise stateless."""
+    from graph import get_graph, get_session_graph, session_config
+
+    session_graph = get_session_graph() if session_id else None
+    if session_graph is None:
+        return get_graph(), {}
+    return session_graph, {"config": session_config(session_id), "durability": CHECKPOINT_DURABILITY}
+
+
+def _user_message(content: str):
+    from langchain_core.messages import HumanMessage
+    return HumanMessage(content=content, id=str(uuid.uuid4()))
+
+
+def _caller_state(req) -> dict:
+    """Caller fields for the initial state — they key the budget ledger."""
+    caller = {"user_role": req.user_role}
+    if req.session_id:
+        caller["session_id"] = req.session_id
+    if req.tenant_id:
+        caller["tenant_id"] = req.tenant_id
+    return caller
+
+
+def _agent_response(result: dict, default_answer: str = "No answer generated.") -> AgentResponse:
+    """Build the response from final state; total_cost is this run's share of session_cost."""
+    session_cost = result.get("total_cost", 0.0)
+    return AgentResponse(
+        final_answer=result.get("final_answer") or default_answer,
+        intent=result.get("intent"),
+        llm_tier=result.get("llm_tier"),
+        risk_level=result.get("risk_level"),
+        total_cost=session_cost - result.get("run_cost_start", 0.0),
+        session_cost=session_cost,
+        usage=run_usage(result.get("trace_log", [])),
+        citations=result.get("citations", []),
+        trace_log=result.get("trace_log", []),
+    )
+
+
+# ── Request Coalescing ───────────────────────────────────────────
+
+_query_flight = SingleFlight()
+
+
+def _coalesce_key(req: QueryRequest) -> str:
+    """Requests with this key get the same answer: question, caller and prompt set."""
+    return request_key(
+        normalize_question(req.question), req.user_role, req.tenant_id or "", prompt_registry.fingerprint(),
+    )
+
+
+def _called_side_effect_tool(result: dict) -> bool:
+    return any(entry.get("tool_called") in SIDE_EFFECT_TOOLS for entry in result.get("trace_log", []))
+
+
+async def _run_coalesced(req: QueryRequest, initial_state: dict) -> tuple[dict, bool]:
+    """Run a stateless query, sharing one copilot_graph run among identical concurrent requests.
+
+    A shared run that called a side-effecting tool (e.g. created a Jira
+    ticket) is not handed out: each waiting request runs on its own, as if
+    it had never been coalesced.
+    """
+    from graph import get_graph
+
+    graph = get_graph()
+    result, shared = await _query_flight.do(_coalesce_key(req), lambda: graph.ainvoke(initial_state))
+    if shared and _called_side_effect_tool(result):
+        _query_flight.stats["reruns"] += 1
+        return await graph.ainvoke(initial_state), False
+    return result, shared
+
+
+# ── Profiling ────────────────────────────────────────────────────
+
+def _wants_profile(query_flag: bool, header: Optional[str]) -> bool:
+    return PROFILING_ENABLED and (query_flag or (header or "").lower() in ("1", "true", "yes"))
+
+
+async def _run_profiled(req: QueryRequest, initial_state: dict) -> tuple[dict, str]:
+    """Run the query under a ProfileCapture; returns (final state, trace id).
+
+    The run takes the sync graph path on a worker thread of its own, so the
+    sampler sees only this request — not others sharing the event loop.
+    """
+    graph, run_kwargs = _run_target(req.session_id)
+    loop_thread = threading.get_ident()
+
+    def run() -> tuple[dict, str]:
+        capture = ProfileCapture(label=req.question[:200], exclude_threads=(loop_thread,))
+        config = {**run_kwargs.get("config", {}), "callbacks": capture.callbacks}
+        try:
+            with capture:
+                result = graph.invoke(initial_state, **{**run_kwargs, "config": config})
+        finally:
+            if capture.report:
+                capture.save()
+        return result, capture.trace_id
+
+    return await asyncio.to_thread(run)
+
+
 # ── Endpoints ────────────────────────────────────────────────────
 
 @app.post("/agent/query", response_model=AgentResponse)
-async def query_agent(req: QueryRequest):
-    """Send a question to the ReAct agent."""
+async def query_agent(
+    req: QueryRequest,
+    profile: bool = False,
+    x_profile: Optional[str] = Header(default=None),
+):
+    """Send a question to the ReAct agent.
+
+    With session_id, the question is appended to that session's
+    conversation and cost is tracked across turns. Without one, identical
+    concurrent questions (same role and tenant) share a single run.
+
+    ?profile=true or an X-Profile: 1 header profiles this run (never
+    coalesced); the response's trace_id retrieves the capture.
+    """
     try:
         initial_state = {
-            "messages": [HumanMessage(content=req.question)],
+            "messages": [_user_message(req.question)],
+            **_caller_state(req),
         }
 
-        result = copilot_graph.invoke(initial_state)
+        if _wants_profile(profile, x_profile):
+            result, trace_id = await _run_profiled(req, initial_state)
+            response = _agent_response(result)
+            response.trace_id = trace_id
+            return response
 
-        return AgentResponse(
-            final_answer=result.get("final_answer", "No answer generated."),
-            intent=result.get("intent"),
-            llm_tier=result.get("llm_tier"),
-            risk_level=result.get("risk_level"),
-            total_cost=result.get("total_cost", 0.0),
-            citations=result.get("citations", []),
-            trace_log=result.get("trace_log", []),
-        )
+        if req.session_id is None and COALESCE_QUERIES:
+            result, shared = await _run_coalesced(req, initial_state)
+            response = _agent_response(result)
+            response.coalesced = shared
+            return response
+
+        graph, run_kwargs = _run_target(req.session_id)
+        result = await graph.ainvoke(initial_state, **run_kwargs)
+
+        return _agent_response(result)
+    except ProfileBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# State keys worth pushing to the client as soon as a node sets them
+STREAMED_FIELDS = (
+    "intent", "required_tools", "llm_tier", "risk_level",
+    "budget_remaining", "citations", "error",
+)
+
+
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _node_event(node: str, update: dict) -> dict:
+    """Compact per-node progress payload (no message objects, latest trace entry only)."""
+    payload = {"node": node}
+    payload.update({k: update[k] for k in STREAMED_FIELDS if k in update})
+    trace = update.get("trace_log")
+    if isinstance(trace, list) and trace:   # not Overwrite(...) from ingest_user
+        payload["trace"] = trace[-1]
+    return payload
+
+
+@app.post("/agent/query/stream")
+async def query_agent_stream(req: QueryRequest):
+    """Send a question to the agent and stream progress as Server-Sent Events.
+
+    Events:
+        node  — a graph node finished (route decision, budget outcome, citations, ...)
+        token — an answer token from answer_with_citations / summarize / compliance_check
+        final — the complete AgentResponse
+        error — the run failed
+    """
+    initial_state = {
+        "messages": [_user_message(req.question)],
+        **_caller_state(req),
+    }
+
+    graph, run_kwargs = _run_target(req.session_id)
+
+    async def event_stream():
+        result = {}
+        try:
+            async for mode, chunk in graph.astream(
+                initial_state, stream_mode=["updates", "custom", "values"], **run_kwargs
+            ):
+                if mode == "custom" and chunk.get("type") == "token":
+                    yield _sse("token", {"node": chunk["node"], "content": chunk["content"]})
+                elif mode == "updates":
+                    for node, update in chunk.items():
+                        if update:
+                            yield _sse("node", _node_event(node, update))
+                elif mode == "values":
+                    result = chunk
+            yield _sse("final", _agent_response(result).model_dump())
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/agent/batch")
+async def batch_query(req: BatchRequest):
+    """Run many questions with bounded concurrency; stream JSONL results.
+
+    One JSON object per line, in completion order:
+        {index, question, final_answer, intent, llm_tier, risk_level,
+         total_cost, usage, citations, trace_log, error}
+
+    Every run is charged to the caller's ledger accounts (session_id,
+    tenant_id, user_role) like /agent/query.
+    """
+    if not req.questions:
+        raise HTTPException(status_code=422, detail="questions must not be empty")
+    if len(req.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Too many questions ({len(req.questions)} > {BATCH_MAX_QUESTIONS})",
+        )
+    concurrency = max(1, min(req.concurrency, BATCH_MAX_CONCURRENCY))
+    from batch import arun_batch
+
+    async def lines():
+        async for item in arun_batch(
+            req.questions,
+            concurrency=concurrency,
+            batch_llm_calls=req.batch_llm_calls,
+            caller=_caller_state(req),
+        ):
+            yield json.dumps(item, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @app.post("/agent/action", response_model=AgentResponse)
 async def execute_action(req: ActionRequest):
-    """Execute an action through the agent."""
-    try:
+    """Execute an action through the agent.
+
+    If `action` names a registered tool, the payload is validated against
+    that tool's argument schema and dispatched directly (budget guard +
+    trace, zero LLM calls). Any other action is framed as a message and
+    parsed by the LLM as before.
+    """
+    from tools import TOOL_MAP
+
+    if req.action in TOOL_MAP:
+        try:
+            params = _validate_tool_payload(req.action, req.payload)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+        message = _user_message(f"[ACTION: {req.action}] {json.dumps(params, default=str)}")
+        initial_state = {
+            "messages": [message],
+            "dispatch": {"tool": req.action, "params": params, "message_id": message.id},
+            "intent": "action",
+            "required_tools": [req.action],
+            "llm_tier": 0,
+            "risk_level": "low",
+            **_caller_state(req),
+        }
+    else:
         # Frame the action as a message
         message = f"[ACTION: {req.action}] {str(req.payload)}"
         initial_state = {
-            "messages": [HumanMessage(content=message)],
+            "messages": [_user_message(message)],
+            "dispatch": {},
+            **_caller_state(req),
         }
 
-        result = copilot_graph.invoke(initial_state)
+    try:
+        graph, run_kwargs = _run_target(req.session_id)
+        result = await graph.ainvoke(initial_state, **run_kwargs)
 
+        session_cost = result.get("total_cost", 0.0)
         return AgentResponse(
-            final_answer=result.get("final_answer", "Action could not be completed."),
+            final_answer=result.get("final_answer") or "Action could not be completed.",
             intent=result.get("intent"),
             llm_tier=result.get("llm_tier"),
-            total_cost=result.get("total_cost", 0.0),
+            total_cost=session_cost - result.get("run_cost_start", 0.0),
+            session_cost=session_cost,
+            usage=run_usage(result.get("trace_log", [])),
             trace_log=result.get("trace_log", []),
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _validate_tool_payload(tool_name: str, payload: dict) -> dict:
+    """Validate a payload against the tool's args schema; returns the coerced params."""
+    from tools import TOOL_MAP
+
+    schema = TOOL_MAP[tool_name].args_schema
+    return schema.model_validate(payload).model_dump(exclude_unset=False)
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok", "service": "langgraph-agent", "mock_mode": True}
\ No newline at end of file
+    """Liveness: the process is up and serving HTTP (it may still be warming up)."""
+    return {"status": "ok", "service": "langgraph-agent", "mock_mode": True}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 once warm-up has finished (graph compiled, clients, indexes and templates built)."""
+    if _readiness["ready"]:
+        return {"status": "ready", "warmup_s": _readiness["warmup"]}
+    status = "warmup_failed" if _readiness["error"] else "warming_up"
+    return JSONResponse({"status": status, "error": _readiness["error"]}, status_code=503)
+
+
+@app.get("/agent/stats")
+async def agent_stats():
+    """Request coalescing counters: executions, coalesced, reruns, in_flight."""
+    return {"coalescing": _query_flight.snapshot()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Node/tool latency histograms and LLM token, cost and cache counters (Prometheus text format)."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=false)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/agent/profiles/{trace_id}")
+async def get_profile(trace_id: str, format: str = "json"):
+    """A stored profile capture: the JSON report, or format=collapsed for folded stacks (flamegraph input)."""
+    kind = "collapsed" if format == "collapsed" else "json"
+    text = load_profile(trace_id, kind)
+    if text is None:
+        raise HTTPException(status_code=404, detail=f"No profile with trace id {trace_id!r}")
+    if kind == "collapsed":
+        return PlainTextResponse(text)
+    return Response(text, media_type="application/json")
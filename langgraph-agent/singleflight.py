@@ -0,0 +1,63 @@
+# singleflight.py
+"""
+Enterprise Ops Copilot — Single-Flight Request Coalescing
+Concurrent calls with the same key share one execution: the first caller
+starts it, later callers await the same result (or exception) instead of
+running their own. The key leaves the in-flight table when the execution
+finishes, so only overlapping calls coalesce — nothing is cached.
+
+The shared execution runs as its own task, so a caller that disconnects
+or is cancelled doesn't cancel it for the others.
+
+Usage:
+    flight = SingleFlight()
+    result, shared = await flight.do(key, lambda: graph.ainvoke(state))
+"""
+from __future__ import annotations
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent same-key coroutine calls into one execution."""
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self.stats = {"executions": 0, "coalesced": 0, "reruns": 0}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Run fn() once per in-flight key. Returns (result, shared) — shared=True if another call ran it."""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+        self.stats["executions"] += 1
+        task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task), False
+
+    def _done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()   # mark retrieved — every waiter re-raises it from its own await
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "in_flight": self.in_flight}
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question, for coalescing keys."""
+    return " ".join(question.casefold().split())
+
+
+def request_key(*parts: str) -> str:
+    """Stable digest of key parts (keeps long questions out of the in-flight table)."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
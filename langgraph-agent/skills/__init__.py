@@ -1,20 +1,34 @@
-# __init__.py
 """
 Enterprise Ops Copilot — Skills Registry
 Exports all skill functions for the graph.
 """
-from skills.router import route_intent
-from skills.retrieval import retrieve
-from skills.answer_with_citations import answer_with_citations
-from skills.action_executor import execute_action
-from skills.compliance_check import compliance_check
-from skills.summarizer import summarize
+from skills.router import route_intent, aroute_intent
+from skills.retrieval import retrieve, aretrieve
+from skills.answer_with_citations import answer_with_citations, aanswer_with_citations
+from skills.action_executor import execute_action, aexecute_action, dispatch_action, adispatch_action
+from skills.compliance_check import compliance_check, acompliance_check
+from skills.summarizer import summarize, asummarize
+from skills.compaction import compact_history, acompact_history
 
 ALL_SKILLS = {
     "route_intent": route_intent,
     "retrieve": retrieve,
     "answer_with_citations": answer_with_citations,
     "execute_action": execute_action,
+    "dispatch_action": dispatch_action,
     "compliance_check": compliance_check,
     "summarize": summarize,
-}
\ No newline at end of file
+    "compact_history": compact_history,
+}
+
+# Async variants, used when the graph is driven via ainvoke/astream
+ALL_ASYNC_SKILLS = {
+    "route_intent": aroute_intent,
+    "retrieve": aretrieve,
+    "answer_with_citations": aanswer_with_citations,
+    "execute_action": aexecute_action,
+    "dispatch_action": adispatch_action,
+    "compliance_check": acompliance_check,
+    "summarize": asummarize,
+    "compact_history": acompact_history,
+}
@@ -7,9 +7,11 @@ from __future__ import annotations
 import json
 from langchain_core.messages import HumanMessage, SystemMessage
 from state import AgentState
-from llm_selector import get_llm, estimate_cost
+from llm_selector import get_llm, estimate_cost, cache_savings
+from tokens import cached_input_tokens, usage_tokens
 from prompts.registry import prompt_registry
 from tools import TOOL_MAP
+from config import TIER_MODELS
 
 
 def execute_action(state: AgentState) -> dict:
@@ -19,11 +21,117 @@ def execute_action(state: AgentState) -> dict:
     Sets: final_answer, action_result
     Appends to: trace_log, total_cost
     """
+    question, prompt = _build_action_prompt(state)
+    if prompt is None:
+        return {"final_answer": "No request to execute.", "error": "No messages"}
+
+    llm = get_llm(tier=0)
+    response = llm.invoke(prompt)
+
+    tool_name, params, user_message = _plan_action(state, response, question)
+
+    # Execute the tool
+    if tool_name in TOOL_MAP:
+        try:
+            action_result = TOOL_MAP[tool_name].invoke(params)
+        except Exception as e:
+            action_result = {"error": f"Tool '{tool_name}' failed: {str(e)}"}
+    else:
+        action_result = {"error": f"Tool '{tool_name}' not found"}
+
+    return _apply_action(state, response, prompt, tool_name, params, user_message, action_result)
+
+
+async def aexecute_action(state: AgentState) -> dict:
+    """Async variant of execute_action — awaits the Tier 0 call and the tool."""
+    question, prompt = _build_action_prompt(state)
+    if prompt is None:
+        return {"final_answer": "No request to execute.", "error": "No messages"}
+
+    llm = get_llm(tier=0)
+    response = await llm.ainvoke(prompt)
+
+    tool_name, params, user_message = _plan_action(state, response, question)
+
+    if tool_name in TOOL_MAP:
+        try:
+            action_result = await TOOL_MAP[tool_name].ainvoke(params)
+        except Exception as e:
+            action_result = {"error": f"Tool '{tool_name}' failed: {str(e)}"}
+    else:
+        action_result = {"error": f"Tool '{tool_name}' not found"}
+
+    return _apply_action(state, response, prompt, tool_name, params, user_message, action_result)
+
+
+def dispatch_action(state: AgentState) -> dict:
+    """Run a pre-validated structured action straight against its tool — no LLM calls.
+
+    Reads: dispatch ({"tool": name, "params": {...}})
+    Sets: final_answer, action_result
+    Appends to: trace_log
+    """
+    tool_name, params = _dispatch_target(state)
+    if tool_name in TOOL_MAP:
+        try:
+            action_result = TOOL_MAP[tool_name].invoke(params)
+        except Exception as e:
+            action_result = {"error": f"Tool '{tool_name}' failed: {str(e)}"}
+    else:
+        action_result = {"error": f"Tool '{tool_name}' not found"}
+    return _apply_dispatch(state, tool_name, params, action_result)
+
+
+async def adispatch_action(state: AgentState) -> dict:
+    """Async variant of dispatch_action — awaits the tool."""
+    tool_name, params = _dispatch_target(state)
+    if tool_name in TOOL_MAP:
+        try:
+            action_result = await TOOL_MAP[tool_name].ainvoke(params)
+        except Exception as e:
+            action_result = {"error": f"Tool '{tool_name}' failed: {str(e)}"}
+    else:
+        action_result = {"error": f"Tool '{tool_name}' not found"}
+    return _apply_dispatch(state, tool_name, params, action_result)
+
+
+def _dispatch_target(state: AgentState) -> tuple[str, dict]:
+    dispatch = state.get("dispatch") or {}
+    return dispatch.get("tool", ""), dict(dispatch.get("params", {}))
+
+
+def _apply_dispatch(state: AgentState, tool_name: str, params: dict, action_result: dict) -> dict:
+    """Build the answer + trace for a dispatched action (zero LLM cost)."""
+    if "error" in action_result:
+        final_answer = f"Action failed: {action_result['error']}"
+    else:
+        final_answer = _format_action_result(tool_name, action_result, "")
+
+    trace_entry = {
+        "node": "dispatch_action",
+        "model": None,
+        "tool_called": tool_name,
+        "tool_params": params,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cost": 0.0,
+    }
+
+    return {
+        "final_answer": final_answer,
+        "action_result": action_result,
+        "trace_log": [trace_entry],
+        "current_node": "dispatch_action",
+    }
+
+
+def _build_action_prompt(state: AgentState) -> tuple[str, list | None]:
+    """Render the action-parsing prompt for the last user message."""
     messages = state.get("messages", [])
     required_tools = state.get("required_tools", [])
 
     if not messages:
-        return {"final_answer": "No request to execute.", "error": "No messages"}
+        return "", None
 
     question = messages[-1].content if hasattr(messages[-1], "content") else str(messages[-1])
 
@@ -34,11 +142,15 @@ def execute_action(state: AgentState) -> dict:
         available_tools=", ".join(required_tools),
     )
 
-    llm = get_llm(tier=0)
-    response = llm.invoke([
+    return question, [
         SystemMessage(content=system_prompt),
         HumanMessage(content=question),
-    ])
+    ]
+
+
+def _plan_action(state: AgentState, response, question: str) -> tuple[str, dict, str]:
+    """Turn the Tier 0 response into (tool_name, params, user_message)."""
+    required_tools = state.get("required_tools", [])
 
     # Parse LLM response to get tool name + params
     try:
@@ -55,18 +167,19 @@ def execute_action(state: AgentState) -> dict:
 
     # Adapt params to match tool's expected input
     params = _adapt_params(tool_name, params, question)
+    return tool_name, params, user_message
 
-    # Execute the tool
-    action_result = {}
-    if tool_name in TOOL_MAP:
-        try:
-            tool_fn = TOOL_MAP[tool_name]
-            action_result = tool_fn.invoke(params)
-        except Exception as e:
-            action_result = {"error": f"Tool '{tool_name}' failed: {str(e)}"}
-    else:
-        action_result = {"error": f"Tool '{tool_name}' not found"}
 
+def _apply_action(
+    state: AgentState,
+    response,
+    prompt: list,
+    tool_name: str,
+    params: dict,
+    user_message: str,
+    action_result: dict,
+) -> dict:
+    """Build the final answer + cost/trace update for an executed action."""
     # Build final answer
     if "error" in action_result:
         final_answer = f"Action failed: {action_result['error']}"
@@ -75,10 +188,9 @@ def execute_action(state: AgentState) -> dict:
 
     # Cost tracking
     # Calculate cost for this step
-    usage = getattr(response, "usage_metadata", None) or {}
-    input_tokens = usage.get("input_tokens", 50)
-    output_tokens = usage.get("output_tokens", 30)
-    step_cost = estimate_cost(0, input_tokens, output_tokens)
+    input_tokens, output_tokens = usage_tokens(response, prompt, TIER_MODELS[0])
+    cached_tokens = cached_input_tokens(response)
+    step_cost = estimate_cost(0, input_tokens, output_tokens, cached_tokens)
 
     trace_entry = {
         "node": "execute_action",
@@ -87,17 +199,17 @@ def execute_action(state: AgentState) -> dict:
         "tool_params": params,
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "cached_input_tokens": cached_tokens,
         "cost": step_cost,
+        "cache_savings": cache_savings(0, cached_tokens),
     }
 
-    prev_cost = state.get("total_cost", 0.0)
-    prev_trace = state.get("trace_log", [])
-
     return {
         "final_answer": final_answer,
         "action_result": action_result,
-        "total_cost": prev_cost + step_cost,
-        "trace_log": prev_trace + [trace_entry],
+        "total_cost": step_cost,
+        "token_usage": {"input": input_tokens, "cached_input": cached_tokens, "output": output_tokens},
+        "trace_log": [trace_entry],
         "current_node": "execute_action",
     }
 
@@ -1,28 +1,60 @@
 """
 Skill 3: Answer with Citations
 Uses retrieved chunks + RAG prompt to generate a grounded answer.
+Chunks are packed into the tier's context budget first (see context_packer).
 Refuses if confidence is low.
 """
 from __future__ import annotations
 from langchain_core.messages import HumanMessage, SystemMessage
 from state import AgentState
-from llm_selector import get_llm, estimate_cost
+from llm_selector import get_llm, estimate_cost, cache_savings, astream_llm
+from tokens import cached_input_tokens, usage_tokens
+from context_packer import pack_context, format_chunks, filter_citations
+from config import TIER_MODELS, TIER_CONTEXT_TOKENS
 from prompts.registry import prompt_registry
+from skills.compaction import conversation_context
 
 
 def answer_with_citations(state: AgentState) -> dict:
     """Generate a grounded answer using retrieved chunks.
     
-    Reads: messages, retrieved_chunks, llm_tier
-    Sets: final_answer, citations
+    Reads: messages, conversation_summary, retrieved_chunks, llm_tier
+    Sets: final_answer, citations (only sources that made it into the prompt)
     Appends to: trace_log, total_cost
     """
+    early, prompt, packing = _build_answer_prompt(state)
+    if early is not None:
+        return early
+
+    # Use the tier selected by the router
+    tier = state.get("llm_tier", 1)
+    llm = get_llm(tier=tier)
+    response = llm.invoke(prompt)
+    return _apply_answer(state, response, prompt, packing)
+
+
+async def aanswer_with_citations(state: AgentState) -> dict:
+    """Async variant of answer_with_citations — streams answer tokens as they arrive."""
+    early, prompt, packing = _build_answer_prompt(state)
+    if early is not None:
+        return early
+
+    tier = state.get("llm_tier", 1)
+    llm = get_llm(tier=tier)
+    response = await astream_llm(llm, prompt, node="answer_with_citations")
+    return _apply_answer(state, response, prompt, packing)
+
+
+def _build_answer_prompt(state: AgentState) -> tuple[dict | None, list | None, dict | None]:
+    """Pack chunks and render the RAG prompt, or return an early result if there is nothing to answer.
+
+    Returns (early_result, prompt, packing) where packing = {"chunks", "stats"}.
+    """
     messages = state.get("messages", [])
     chunks = state.get("retrieved_chunks", [])
-    tier = state.get("llm_tier", 1)
 
     if not messages:
-        return {"final_answer": "No question provided.", "error": "No messages"}
+        return {"final_answer": "No question provided.", "error": "No messages"}, None, None
 
     question = messages[-1].content if hasattr(messages[-1], "content") else str(messages[-1])
 
@@ -31,52 +63,50 @@ def answer_with_citations(state: AgentState) -> dict:
         return {
             "final_answer": "I don't have enough information to answer this question. No relevant documents were found.",
             "current_node": "answer_with_citations",
-        }
-
-    # Format chunks for the prompt
-    chunks_text = "\n\n".join(
-        f"{c.get('marker', '[?]')} {c['text']}\n   Source: {c['source']}"
-        for c in chunks
-    )
-
-    # Build prompt
-    system_prompt = prompt_registry.render(
-        "rag_answer", "v1",
-        retrieved_chunks=chunks_text,
-        citation_instruction="Include citation markers like [1], [2] when referencing sources",
-        question=question,
-    )
+        }, None, None
 
-    # Use the tier selected by the router
-    llm = get_llm(tier=tier)
-    response = llm.invoke([
+    # Fit the chunks into this tier's context budget
+    tier = state.get("llm_tier", 1)
+    packed, stats = pack_context(chunks, TIER_CONTEXT_TOKENS[tier], TIER_MODELS[tier])
+    chunks_text = format_chunks(packed)
+
+    # Build prompt — static instructions first so the provider can cache them
+    system_prompt = prompt_registry.render("rag_answer", "v2", retrieved_chunks=chunks_text)
+
+    # Earlier turns (compacted summary + recent window) let follow-ups resolve references
+    return None, [
         SystemMessage(content=system_prompt),
+        *conversation_context(state),
         HumanMessage(content=question),
-    ])
+    ], {"chunks": packed, "stats": stats}
+
+
+def _apply_answer(state: AgentState, response, prompt: list, packing: dict) -> dict:
+    """Turn the LLM response into the answer + cost/trace update."""
+    tier = state.get("llm_tier", 1)
 
     # Calculate cost
-    usage = getattr(response, "usage_metadata", {})
-    input_tokens = usage.get("input_tokens", 100)
-    output_tokens = usage.get("output_tokens", 80)
-    step_cost = estimate_cost(tier, input_tokens, output_tokens)
+    input_tokens, output_tokens = usage_tokens(response, prompt, TIER_MODELS[tier])
+    cached_tokens = cached_input_tokens(response)
+    step_cost = estimate_cost(tier, input_tokens, output_tokens, cached_tokens)
 
     trace_entry = {
         "node": "answer_with_citations",
         "model": f"tier_{tier}",
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "cached_input_tokens": cached_tokens,
         "cost": step_cost,
-        "chunks_used": len(chunks),
+        "cache_savings": cache_savings(tier, cached_tokens),
+        "chunks_used": len(packing["chunks"]),
+        "context_packing": packing["stats"],
     }
 
-    prev_cost = state.get("total_cost", 0.0)
-    prev_trace = state.get("trace_log", [])
-    existing_citations = state.get("citations", [])
-
     return {
         "final_answer": response.content,
-        "citations": existing_citations,
-        "total_cost": prev_cost + step_cost,
-        "trace_log": prev_trace + [trace_entry],
+        "citations": filter_citations(state.get("citations", []), packing["chunks"]),
+        "total_cost": step_cost,
+        "token_usage": {"input": input_tokens, "cached_input": cached_tokens, "output": output_tokens},
+        "trace_log": [trace_entry],
         "current_node": "answer_with_citations",
     }
\ No newline at end of file
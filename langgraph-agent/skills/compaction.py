@@ -0,0 +1,149 @@
+"""
+Skill 7: Conversation Compaction
+Keeps prompt size flat on long sessions. Once the earlier turns of a
+conversation exceed COMPACTION_TRIGGER_TOKENS, everything older than a
+window of recent turns (COMPACTION_WINDOW_TOKENS) is folded into a running
+Tier 0 summary and removed from messages. Each compaction sends only the
+previous summary plus the newly evicted turns, never the full history.
+"""
+from __future__ import annotations
+from langchain_core.messages import BaseMessage, HumanMessage, RemoveMessage, SystemMessage
+from state import AgentState
+from llm_selector import get_llm, estimate_cost, cache_savings
+from prompts.registry import prompt_registry
+from tokens import cached_input_tokens, count_message_tokens, count_tokens, message_text, usage_tokens
+from config import TIER_MODELS, COMPACTION_TRIGGER_TOKENS, COMPACTION_WINDOW_TOKENS, COMPACTION_SUMMARY_MAX_TOKENS
+
+
+def compact_history(state: AgentState) -> dict:
+    """Fold older turns into conversation_summary once history exceeds the trigger.
+
+    Reads: messages, conversation_summary
+    Sets: conversation_summary
+    Removes from: messages (compacted turns)
+    Appends to: trace_log, total_cost
+    """
+    plan = _plan_compaction(state)
+    if plan is None:
+        return {"current_node": "compact_history"}
+
+    llm = get_llm(tier=0)
+    response = llm.invoke(plan["prompt"])
+    return _apply_compaction(plan, response)
+
+
+async def acompact_history(state: AgentState) -> dict:
+    """Async variant of compact_history — awaits the Tier 0 call."""
+    plan = _plan_compaction(state)
+    if plan is None:
+        return {"current_node": "compact_history"}
+
+    llm = get_llm(tier=0)
+    response = await llm.ainvoke(plan["prompt"])
+    return _apply_compaction(plan, response)
+
+
+def conversation_context(state: AgentState) -> list[BaseMessage]:
+    """Earlier turns for a skill prompt: the running summary, then the recent window.
+
+    Excludes the current question (messages[-1]).
+    """
+    context: list[BaseMessage] = []
+    summary = state.get("conversation_summary")
+    if summary:
+        context.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+    context.extend(state.get("messages", [])[:-1])
+    return context
+
+
+def _plan_compaction(state: AgentState) -> dict | None:
+    """Pick the turns to evict and render the summary prompt; None if under the trigger."""
+    messages = state.get("messages", [])
+    history = messages[:-1]
+    history_tokens = count_message_tokens(history)
+    if history_tokens <= COMPACTION_TRIGGER_TOKENS:
+        return None
+
+    split = _window_start(history)
+    evicted = history[:split]
+    if not evicted:
+        return None
+
+    summary = state.get("conversation_summary", "")
+    system_prompt = prompt_registry.render(
+        "history_summary", "v1",
+        max_tokens=str(COMPACTION_SUMMARY_MAX_TOKENS),
+        summary=summary or "(none yet)",
+        turns=_format_turns(evicted),
+    )
+    return {
+        "evicted": evicted,
+        "history_tokens": history_tokens + count_tokens(summary),
+        "window_tokens": count_message_tokens(history[split:]),
+        "prompt": [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content="Update the running summary."),
+        ],
+    }
+
+
+def _window_start(history: list) -> int:
+    """Index of the first message kept verbatim.
+
+    Walks back from the newest message while the window fits in
+    COMPACTION_WINDOW_TOKENS, then moves forward to a user message so the
+    window never starts mid-turn.
+    """
+    start = len(history)
+    kept = 0
+    for i in range(len(history) - 1, -1, -1):
+        kept += count_message_tokens([history[i]])
+        if kept > COMPACTION_WINDOW_TOKENS:
+            break
+        start = i
+    while start < len(history) and not isinstance(history[start], HumanMessage):
+        start += 1
+    return start
+
+
+def _format_turns(messages: list) -> str:
+    lines = []
+    for m in messages:
+        role = "User" if isinstance(m, HumanMessage) else "Assistant"
+        lines.append(f"{role}: {message_text(m)}")
+    return "\n".join(lines)
+
+
+def _apply_compaction(plan: dict, response) -> dict:
+    """Replace evicted turns with the updated summary + cost/trace update."""
+    summary = response.content.strip()
+
+    input_tokens, output_tokens = usage_tokens(response, plan["prompt"], TIER_MODELS[0])
+    cached_tokens = cached_input_tokens(response)
+    step_cost = estimate_cost(0, input_tokens, output_tokens, cached_tokens)
+
+    before = plan["history_tokens"]
+    after = plan["window_tokens"] + count_tokens(summary)
+    trace_entry = {
+        "node": "compact_history",
+        "model": "tier_0",
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "cached_input_tokens": cached_tokens,
+        "cost": step_cost,
+        "cache_savings": cache_savings(0, cached_tokens),
+        "messages_compacted": len(plan["evicted"]),
+        "history_tokens_before": before,
+        "history_tokens_after": after,
+        "tokens_saved": before - after,
+        "compaction_ratio": round(after / before, 3) if before else 1.0,   # kept / original
+    }
+
+    return {
+        "messages": [RemoveMessage(id=m.id) for m in plan["evicted"] if m.id],
+        "conversation_summary": summary,
+        "total_cost": step_cost,
+        "token_usage": {"input": input_tokens, "cached_input": cached_tokens, "output": output_tokens},
+        "trace_log": [trace_entry],
+        "current_node": "compact_history",
+    }
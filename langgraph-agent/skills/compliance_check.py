@@ -8,7 +8,10 @@ from __future__ import annotations
 import json
 from langchain_core.messages import HumanMessage, SystemMessage
 from state import AgentState
-from llm_selector import get_llm, estimate_cost
+from llm_selector import get_llm, estimate_cost, cache_savings, astream_llm
+from tokens import cached_input_tokens, usage_tokens
+from context_packer import pack_context, format_chunks, filter_citations
+from config import TIER_MODELS, TIER_CONTEXT_TOKENS
 from prompts.registry import prompt_registry
 
 
@@ -16,40 +19,68 @@ def compliance_check(state: AgentState) -> dict:
     """Assess compliance risk and recommend action.
     
     Reads: messages, retrieved_chunks, risk_level
-    Sets: final_answer, compliance_result
+    Sets: final_answer, compliance_result, citations (packed policy chunks only)
     Appends to: trace_log, total_cost
     """
+    prompt, packing = _build_compliance_prompt(state)
+    if prompt is None:
+        return {"final_answer": "No request to assess.", "error": "No messages"}
+
+    llm = get_llm(tier=2)
+    response = llm.invoke(prompt)
+    return _apply_compliance(state, response, prompt, packing)
+
+
+async def acompliance_check(state: AgentState) -> dict:
+    """Async variant of compliance_check — streams the Tier 2 call."""
+    prompt, packing = _build_compliance_prompt(state)
+    if prompt is None:
+        return {"final_answer": "No request to assess.", "error": "No messages"}
+
+    llm = get_llm(tier=2)
+    response = await astream_llm(llm, prompt, node="compliance_check")
+    return _apply_compliance(state, response, prompt, packing)
+
+
+def _build_compliance_prompt(state: AgentState) -> tuple[list | None, dict | None]:
+    """Pack policy chunks into the Tier 2 context budget and render the compliance prompt.
+
+    Returns (prompt, packing) where packing = {"chunks", "stats"}.
+    """
     messages = state.get("messages", [])
     chunks = state.get("retrieved_chunks", [])
     risk_level = state.get("risk_level", "high")
 
     if not messages:
-        return {"final_answer": "No request to assess.", "error": "No messages"}
+        return None, None
 
     question = messages[-1].content if hasattr(messages[-1], "content") else str(messages[-1])
 
-    # Build policy context from retrieved chunks
-    if chunks:
-        policy_context = "\n\n".join(
-            f"[{c.get('marker', '?')}] {c['text']}\n   Source: {c['source']}"
-            for c in chunks
-        )
+    # Build policy context from retrieved chunks, fit to the Tier 2 budget
+    packed, stats = pack_context(chunks, TIER_CONTEXT_TOKENS[2], TIER_MODELS[2])
+    if packed:
+        policy_context = format_chunks(packed)
     else:
         policy_context = "No policy documents retrieved. Exercise maximum caution."
 
     # Always use Tier 2 for compliance — strongest model
     system_prompt = prompt_registry.render(
-        "compliance", "v1",
+        "compliance", "v2",
         policy_context=policy_context,
         risk_level=risk_level,
-        question=question,
     )
 
-    llm = get_llm(tier=2)
-    response = llm.invoke([
+    return [
         SystemMessage(content=system_prompt),
         HumanMessage(content=question),
-    ])
+    ], {"chunks": packed, "stats": stats}
+
+
+def _apply_compliance(state: AgentState, response, prompt: list, packing: dict) -> dict:
+    """Parse the compliance verdict and build the answer + cost/trace update."""
+    messages = state.get("messages", [])
+    risk_level = state.get("risk_level", "high")
+    question = messages[-1].content if hasattr(messages[-1], "content") else str(messages[-1])
 
     # Parse compliance result
     try:
@@ -78,29 +109,31 @@ def compliance_check(state: AgentState) -> dict:
     final_answer = _format_compliance_answer(result, question)
 
     # Cost tracking — Tier 2 is expensive
-    usage = getattr(response, "usage_metadata", {})
-    input_tokens = usage.get("input_tokens", 200)
-    output_tokens = usage.get("output_tokens", 150)
-    step_cost = estimate_cost(2, input_tokens, output_tokens)
+    input_tokens, output_tokens = usage_tokens(response, prompt, TIER_MODELS[2])
+    cached_tokens = cached_input_tokens(response)
+    step_cost = estimate_cost(2, input_tokens, output_tokens, cached_tokens)
 
     trace_entry = {
         "node": "compliance_check",
         "model": "tier_2",
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "cached_input_tokens": cached_tokens,
         "cost": step_cost,
+        "cache_savings": cache_savings(2, cached_tokens),
         "risk_level": risk_level,
         "escalation": result.get("escalation_needed", False),
+        "chunks_used": len(packing["chunks"]),
+        "context_packing": packing["stats"],
     }
 
-    prev_cost = state.get("total_cost", 0.0)
-    prev_trace = state.get("trace_log", [])
-
     return {
         "final_answer": final_answer,
         "compliance_result": result,
-        "total_cost": prev_cost + step_cost,
-        "trace_log": prev_trace + [trace_entry],
+        "citations": filter_citations(state.get("citations", []), packing["chunks"]),
+        "total_cost": step_cost,
+        "token_usage": {"input": input_tokens, "cached_input": cached_tokens, "output": output_tokens},
+        "trace_log": [trace_entry],
         "current_node": "compliance_check",
     }
 
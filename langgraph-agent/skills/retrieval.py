@@ -2,10 +2,20 @@
 Skill 2: Retrieval
 Calls search tools and formats results with citation markers.
 No LLM call here — just tool execution and formatting.
+
+Selected tools run concurrently, each under its own timeout; a slow or
+failing backend is dropped from the result instead of stalling the answer.
 """
 from __future__ import annotations
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from state import AgentState
 from tools import TOOL_MAP
+from config import TOOL_TIMEOUT_S, TOOL_TIMEOUTS
+
+# Shared pool for the sync path — tool calls are I/O-bound backend lookups
+_tool_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="retrieve")
 
 
 def retrieve(state: AgentState) -> dict:
@@ -16,85 +26,170 @@ def retrieve(state: AgentState) -> dict:
     Appends to: trace_log
     """
     messages = state.get("messages", [])
-    required_tools = state.get("required_tools", [])
+    if not messages:
+        return {"error": "No messages for retrieval"}
 
+    calls = _plan_tool_calls(state)
+    start = time.perf_counter()
+    futures = {name: _tool_pool.submit(_timed_invoke, name, args) for name, args in calls}
+
+    outcomes = {}
+    for name, future in futures.items():
+        # All tools started together, so each deadline counts from `start`
+        remaining = _tool_timeout(name) - (time.perf_counter() - start)
+        try:
+            outcomes[name] = future.result(timeout=max(0.0, remaining))
+        except FutureTimeout:
+            future.cancel()
+            outcomes[name] = (None, _tool_timeout(name) * 1000, "timeout")
+    return _apply_retrieval(state, calls, outcomes)
+
+
+async def aretrieve(state: AgentState) -> dict:
+    """Async variant of retrieve — awaits all tool calls concurrently."""
+    messages = state.get("messages", [])
     if not messages:
         return {"error": "No messages for retrieval"}
 
+    calls = _plan_tool_calls(state)
+    gathered = await asyncio.gather(*(_atimed_invoke(name, args) for name, args in calls))
+    outcomes = {name: outcome for (name, _), outcome in zip(calls, gathered)}
+    return _apply_retrieval(state, calls, outcomes)
+
+
+def _tool_timeout(name: str) -> float:
+    return TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT_S)
+
+
+def _timed_invoke(name: str, args: dict) -> tuple:
+    """Run one tool; returns (result | None, latency_ms, status)."""
+    start = time.perf_counter()
+    try:
+        result = TOOL_MAP[name].invoke(args)
+        status = "ok"
+    except Exception as e:
+        result, status = None, f"error: {e}"
+    return result, (time.perf_counter() - start) * 1000, status
+
+
+async def _atimed_invoke(name: str, args: dict) -> tuple:
+    """Await one tool under its timeout; returns (result | None, latency_ms, status)."""
+    start = time.perf_counter()
+    try:
+        result = await asyncio.wait_for(TOOL_MAP[name].ainvoke(args), timeout=_tool_timeout(name))
+        status = "ok"
+    except asyncio.TimeoutError:
+        result, status = None, "timeout"
+    except Exception as e:
+        result, status = None, f"error: {e}"
+    return result, (time.perf_counter() - start) * 1000, status
+
+
+def _plan_tool_calls(state: AgentState) -> list[tuple[str, dict]]:
+    """Work out which retrieval tools to call, and with which arguments."""
+    required_tools = state.get("required_tools", [])
+
     # Extract query from last user message
-    query = messages[-1].content if hasattr(messages[-1], "content") else str(messages[-1])
+    query = _last_query(state)
 
-    chunks = []
-    citations = []
+    calls = []
 
     # Run search_docs if selected by router
     if "search_docs" in required_tools and "search_docs" in TOOL_MAP:
-        search_tool = TOOL_MAP["search_docs"]
-        results = search_tool.invoke({"query": query})
-
-        # Handle both list and string returns
-        if isinstance(results, list):
-            for i, doc in enumerate(results):
-                marker = f"[{i + 1}]"
-                chunks.append({
-                    "id": doc.get("id", f"chunk-{i}"),
-                    "text": doc.get("text", ""),
-                    "source": doc.get("source", "Unknown"),
-                    "score": doc.get("score", 0.0),
-                    "marker": marker,
-                })
-                citations.append(f"{marker} {doc.get('source', 'Unknown')}")
+        calls.append(("search_docs", {"query": query}))
 
     # Run salesforce_lookup if selected
     if "salesforce_lookup" in required_tools and "salesforce_lookup" in TOOL_MAP:
         # Extract case ID from query (simple pattern match)
         case_id = _extract_case_id(query)
         if case_id:
-            sf_tool = TOOL_MAP["salesforce_lookup"]
-            result = sf_tool.invoke({"case_id": case_id})
-            if "error" not in result:
-                chunks.append({
-                    "id": result.get("id", "sf-case"),
-                    "text": str(result),
-                    "source": f"Salesforce Case {case_id}",
-                    "score": 1.0,
-                    "marker": f"[SF-{case_id}]",
-                })
-                citations.append(f"[SF-{case_id}] Salesforce Case {case_id}")
+            calls.append(("salesforce_lookup", {"case_id": case_id}))
 
     # Run cpq_rules if selected
     if "cpq_rules_lookup" in required_tools and "cpq_rules_lookup" in TOOL_MAP:
         product = _extract_product(query)
         if product:
-            cpq_tool = TOOL_MAP["cpq_rules_lookup"]
-            result = cpq_tool.invoke({"product": product})
-            if "error" not in result:
-                chunks.append({
-                    "id": f"cpq-{product}",
-                    "text": str(result),
-                    "source": f"CPQ Rules: {product}",
-                    "score": 1.0,
-                    "marker": f"[CPQ]",
-                })
-                citations.append(f"[CPQ] CPQ Rules: {product}")
+            calls.append(("cpq_rules_lookup", {"product": product}))
+
+    return calls
+
+
+def _apply_retrieval(state: AgentState, calls: list[tuple[str, dict]], outcomes: dict) -> dict:
+    """Format tool results into citation-marked chunks + trace.
+
+    Chunks are assembled in a fixed tool order (search_docs, salesforce,
+    CPQ), so citation markers don't depend on which tool finished first.
+    """
+    args = dict(calls)
+    results = {name: result for name, (result, _, _) in outcomes.items()}
+
+    chunks = []
+    citations = []
+
+    # Handle both list and string returns
+    docs = results.get("search_docs")
+    if isinstance(docs, list):
+        for i, doc in enumerate(docs):
+            marker = f"[{i + 1}]"
+            chunks.append({
+                "id": doc.get("id", f"chunk-{i}"),
+                "text": doc.get("text", ""),
+                "source": doc.get("source", "Unknown"),
+                "score": doc.get("score", 0.0),
+                "marker": marker,
+                "tool": "search_docs",
+            })
+            citations.append(f"{marker} {doc.get('source', 'Unknown')}")
+
+    result = results.get("salesforce_lookup")
+    if result is not None and "error" not in result:
+        case_id = args["salesforce_lookup"]["case_id"]
+        chunks.append({
+            "id": result.get("id", "sf-case"),
+            "text": str(result),
+            "source": f"Salesforce Case {case_id}",
+            "score": 1.0,
+            "marker": f"[SF-{case_id}]",
+            "tool": "salesforce_lookup",
+        })
+        citations.append(f"[SF-{case_id}] Salesforce Case {case_id}")
+
+    result = results.get("cpq_rules_lookup")
+    if result is not None and "error" not in result:
+        product = args["cpq_rules_lookup"]["product"]
+        chunks.append({
+            "id": f"cpq-{product}",
+            "text": str(result),
+            "source": f"CPQ Rules: {product}",
+            "score": 1.0,
+            "marker": "[CPQ]",
+            "tool": "cpq_rules_lookup",
+        })
+        citations.append(f"[CPQ] CPQ Rules: {product}")
 
     trace_entry = {
         "node": "retrieve",
-        "tools_called": [t for t in required_tools if t in TOOL_MAP],
+        "tools_called": [name for name, _ in calls],
         "chunks_found": len(chunks),
+        "tool_latency_ms": {name: round(ms, 2) for name, (_, ms, _) in outcomes.items()},
+        "tool_status": {name: status for name, (_, _, status) in outcomes.items()},
         "cost": 0.0,  # No LLM call in retrieval
     }
 
-    prev_trace = state.get("trace_log", [])
-
     return {
         "retrieved_chunks": chunks,
         "citations": citations,
-        "trace_log": prev_trace + [trace_entry],
+        "trace_log": [trace_entry],
         "current_node": "retrieve",
     }
 
 
+def _last_query(state: AgentState) -> str:
+    """Text of the last message in state."""
+    messages = state.get("messages", [])
+    return messages[-1].content if hasattr(messages[-1], "content") else str(messages[-1])
+
+
 def _extract_case_id(query: str) -> str | None:
     """Simple extraction of CASE-XXX pattern from query."""
     import re
@@ -7,9 +7,10 @@ from __future__ import annotations
 import json
 from langchain_core.messages import HumanMessage, SystemMessage
 from state import AgentState
-from llm_selector import get_llm, estimate_cost
+from llm_selector import get_llm, estimate_cost, cache_savings
+from tokens import cached_input_tokens, usage_tokens
 from prompts.registry import prompt_registry
-from config import AVAILABLE_TOOLS
+from config import AVAILABLE_TOOLS, TIER_MODELS
 
 
 def route_intent(state: AgentState) -> dict:
@@ -18,9 +19,31 @@ def route_intent(state: AgentState) -> dict:
     Sets: intent, required_tools, llm_tier, risk_level
     Appends to: trace_log, total_cost
     """
+    prompt = _build_router_prompt(state)
+    if prompt is None:
+        return {"error": "No messages to route"}
+
+    llm = get_llm(tier=0)
+    response = llm.invoke(prompt)
+    return _apply_route(state, response, prompt)
+
+
+async def aroute_intent(state: AgentState) -> dict:
+    """Async variant of route_intent — awaits the Tier 0 call."""
+    prompt = _build_router_prompt(state)
+    if prompt is None:
+        return {"error": "No messages to route"}
+
+    llm = get_llm(tier=0)
+    response = await llm.ainvoke(prompt)
+    return _apply_route(state, response, prompt)
+
+
+def _build_router_prompt(state: AgentState) -> list | None:
+    """Render the router prompt for the last user message."""
     messages = state.get("messages", [])
     if not messages:
-        return {"error": "No messages to route"}
+        return None
 
     # Get the last user message
     last_msg = messages[-1].content if hasattr(messages[-1], "content") else str(messages[-1])
@@ -28,16 +51,18 @@ def route_intent(state: AgentState) -> dict:
     # Build the router prompt (Tier 0 — cheapest)
     system_prompt = prompt_registry.render(
         "router", "v1",
-        user_role="support_agent",
+        user_role=state.get("user_role") or "support_agent",
         available_tools=", ".join(AVAILABLE_TOOLS),
     )
 
-    llm = get_llm(tier=0)
-    response = llm.invoke([
+    return [
         SystemMessage(content=system_prompt),
         HumanMessage(content=last_msg),
-    ])
+    ]
+
 
+def _apply_route(state: AgentState, response, prompt: list) -> dict:
+    """Parse the router response into routing decisions + trace."""
     # Parse the JSON response
     try:
         result = json.loads(response.content)
@@ -52,10 +77,9 @@ def route_intent(state: AgentState) -> dict:
         }
 
     # Calculate cost for this step
-    usage = getattr(response, "usage_metadata", None) or {}
-    input_tokens = usage.get("input_tokens", 50)
-    output_tokens = usage.get("output_tokens", 30)
-    step_cost = estimate_cost(0, input_tokens, output_tokens)
+    input_tokens, output_tokens = usage_tokens(response, prompt, TIER_MODELS[0])
+    cached_tokens = cached_input_tokens(response)
+    step_cost = estimate_cost(0, input_tokens, output_tokens, cached_tokens)
 
     # Build trace entry
     trace_entry = {
@@ -63,19 +87,19 @@ def route_intent(state: AgentState) -> dict:
         "model": "tier_0",
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "cached_input_tokens": cached_tokens,
         "cost": step_cost,
+        "cache_savings": cache_savings(0, cached_tokens),
         "result": result,
     }
 
-    prev_cost = state.get("total_cost", 0.0)
-    prev_trace = state.get("trace_log", [])
-
     return {
         "intent": result.get("intent", "qa"),
         "required_tools": result.get("required_tools", []),
         "llm_tier": result.get("llm_tier", 1),
         "risk_level": result.get("risk_level", "low"),
-        "total_cost": prev_cost + step_cost,
-        "trace_log": prev_trace + [trace_entry],
+        "total_cost": step_cost,
+        "token_usage": {"input": input_tokens, "cached_input": cached_tokens, "output": output_tokens},
+        "trace_log": [trace_entry],
         "current_node": "route_intent",
     }
\ No newline at end of file
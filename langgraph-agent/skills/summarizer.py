@@ -1,72 +1,231 @@
 """
 Skill 6: Summarizer
 Cheap model, token-limited. Summarizes or rewrites content.
+
+Content up to SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS goes out in one Tier 0
+call. Longer content (case histories, documents) is summarized map-reduce:
+it is split at paragraph/sentence boundaries into SUMMARY_CHUNK_TOKENS
+pieces, the pieces are summarized concurrently, and the partial summaries
+are merged level by level until they fit one final call.
 """
 from __future__ import annotations
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.messages import HumanMessage, SystemMessage
 from state import AgentState
-from llm_selector import get_llm, estimate_cost
+from llm_selector import get_llm, estimate_cost, cache_savings, astream_llm
+from tokens import cached_input_tokens, count_prompt_tokens, count_tokens, message_text, usage_tokens
+from text_split import pack_paragraphs
+from config import (
+    TIER_MODELS,
+    EXPECTED_OUTPUT_TOKENS,
+    SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS,
+    SUMMARY_CHUNK_TOKENS,
+    SUMMARY_PARTIAL_MAX_TOKENS,
+    SUMMARY_MAX_CONCURRENCY,
+)
 from prompts.registry import prompt_registry
 
+SUMMARY_MAX_TOKENS = 200
+
+
+# Shared pool for the sync path's concurrent map calls
+_summary_pool = ThreadPoolExecutor(max_workers=SUMMARY_MAX_CONCURRENCY, thread_name_prefix="summarize")
+
 
 def summarize(state: AgentState) -> dict:
     """Summarize content from messages or retrieved chunks.
-    
+
     Reads: messages, retrieved_chunks (optional)
     Sets: final_answer
     Appends to: trace_log, total_cost
     """
-    messages = state.get("messages", [])
-    chunks = state.get("retrieved_chunks", [])
+    content = summary_content(state)
+    if content is None:
+        return {"final_answer": "Nothing to summarize.", "error": "No messages"}
 
-    if not messages:
+    llm = get_llm(tier=0)
+    calls: list[tuple[list, object]] = []
+    pieces = split_content(content)
+    map_chunks = len(pieces) if len(pieces) > 1 else 0
+    levels = 0
+    while len(pieces) > 1:
+        prompts = _build_partial_prompts(pieces)
+        responses = list(_summary_pool.map(llm.invoke, prompts))
+        calls.extend(zip(prompts, responses))
+        pieces = _group_partials([r.content for r in responses])
+        levels += 1
+
+    prompt = _build_summary_prompt(pieces[0])
+    response = llm.invoke(prompt)
+    return _apply_summary(state, response, content, prompt, calls, map_chunks, levels)
+
+
+async def asummarize(state: AgentState) -> dict:
+    """Async variant of summarize — map calls run concurrently, the final call streams."""
+    content = summary_content(state)
+    if content is None:
         return {"final_answer": "Nothing to summarize.", "error": "No messages"}
 
-    question = messages[-1].content if hasattr(messages[-1], "content") else str(messages[-1])
+    llm = get_llm(tier=0)
+    semaphore = asyncio.Semaphore(SUMMARY_MAX_CONCURRENCY)
+
+    async def call(prompt: list):
+        async with semaphore:
+            return await llm.ainvoke(prompt)
+
+    calls: list[tuple[list, object]] = []
+    pieces = split_content(content)
+    map_chunks = len(pieces) if len(pieces) > 1 else 0
+    levels = 0
+    while len(pieces) > 1:
+        prompts = _build_partial_prompts(pieces)
+        responses = await asyncio.gather(*(call(p) for p in prompts))
+        calls.extend(zip(prompts, responses))
+        pieces = _group_partials([r.content for r in responses])
+        levels += 1
 
-    # Determine what to summarize
-    # If there are retrieved chunks, summarize those; otherwise summarize the user's input
+    prompt = _build_summary_prompt(pieces[0])
+    response = await astream_llm(llm, prompt, node="summarize")
+    return _apply_summary(state, response, content, prompt, calls, map_chunks, levels)
+
+
+def summary_content(state: AgentState) -> str | None:
+    """The text to summarize: retrieved chunks if any, else the user's input (None without messages)."""
+    messages = state.get("messages", [])
+    if not messages:
+        return None
+    chunks = state.get("retrieved_chunks", [])
     if chunks:
-        content = "\n\n".join(c.get("text", "") for c in chunks)
-    else:
-        content = question
+        return "\n\n".join(c.get("text", "") for c in chunks)
+    return message_text(messages[-1])
 
-    # Build prompt — always Tier 0 (cheapest)
+
+def split_content(content: str, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> list[str]:
+    """Split content into pieces of at most max_tokens for the map step.
+
+    Content under SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS stays whole. Pieces
+    break at paragraphs, then sentences, then words.
+    """
+    model = TIER_MODELS[0]
+    if count_tokens(content, model) <= SUMMARY_MAP_REDUCE_THRESHOLD_TOKENS:
+        return [content]
+
+    return list(pack_paragraphs(content, max_tokens, model))
+
+
+def _group_partials(partials: list[str]) -> list[str]:
+    """Merge partial summaries into pieces of at most SUMMARY_CHUNK_TOKENS (one piece = done).
+
+    Each group takes at least two partials, so every reduce level shrinks the input.
+    """
+    model = TIER_MODELS[0]
+    if count_tokens("\n\n".join(partials), model) <= SUMMARY_CHUNK_TOKENS:
+        return ["\n\n".join(partials)]
+    groups: list[list[str]] = []
+    used = 0
+    for partial in partials:
+        cost = count_tokens(partial, model) + 1
+        if groups and (len(groups[-1]) < 2 or used + cost <= SUMMARY_CHUNK_TOKENS):
+            groups[-1].append(partial)
+            used += cost
+        else:
+            groups.append([partial])
+            used = cost
+    return ["\n\n".join(g) for g in groups]
+
+
+def _build_partial_prompts(pieces: list[str]) -> list[list]:
+    """One map/reduce prompt per piece."""
+    return [
+        [
+            SystemMessage(content=prompt_registry.render(
+                "summarize_partial", "v1",
+                part=f"part {i} of {len(pieces)}",
+                max_tokens=str(SUMMARY_PARTIAL_MAX_TOKENS),
+            )),
+            HumanMessage(content=piece),
+        ]
+        for i, piece in enumerate(pieces, 1)
+    ]
+
+
+def _build_summary_prompt(content: str) -> list:
+    """Render the final summary prompt — the content goes in the human message only."""
+    # Always Tier 0 (cheapest)
     system_prompt = prompt_registry.render(
-        "summarize", "v1",
+        "summarize", "v2",
         format="bullet points",
-        max_tokens="200",
-        content=content,
+        max_tokens=str(SUMMARY_MAX_TOKENS),
     )
 
-    llm = get_llm(tier=0)
-    response = llm.invoke([
+    return [
         SystemMessage(content=system_prompt),
         HumanMessage(content=f"Summarize this:\n\n{content}"),
-    ])
+    ]
+
+
+def estimate_summary_tokens(state: AgentState) -> tuple[int, int, int]:
+    """(input_tokens, output_tokens, llm_calls) summarize is expected to use.
+
+    Map calls are counted from the actual split; reduce levels assume every
+    partial summary comes back at SUMMARY_PARTIAL_MAX_TOKENS.
+    """
+    model = TIER_MODELS[0]
+    content = summary_content(state) or ""
+    pieces = split_content(content)
+    final_output = min(EXPECTED_OUTPUT_TOKENS["summarize"], SUMMARY_MAX_TOKENS)
+    final_template = prompt_registry.compiled("summarize", "v2").literal_text
+    if len(pieces) == 1:
+        return count_prompt_tokens([final_template, f"Summarize this:\n\n{content}"], model), final_output, 1
+
+    partial_template = prompt_registry.compiled("summarize_partial", "v1").literal_text
+    overhead = count_prompt_tokens([partial_template, ""], model)
+    input_tokens = sum(overhead + count_tokens(piece, model) for piece in pieces)
+    calls = partials = len(pieces)
+    while partials * SUMMARY_PARTIAL_MAX_TOKENS > SUMMARY_CHUNK_TOKENS:
+        groups = max(1, min(math.ceil(partials * SUMMARY_PARTIAL_MAX_TOKENS / SUMMARY_CHUNK_TOKENS), partials // 2))
+        input_tokens += groups * overhead + partials * SUMMARY_PARTIAL_MAX_TOKENS
+        calls += groups
+        partials = groups
+
+    input_tokens += count_prompt_tokens([final_template, "Summarize this:\n\n"], model)
+    input_tokens += partials * SUMMARY_PARTIAL_MAX_TOKENS
+    output_tokens = calls * SUMMARY_PARTIAL_MAX_TOKENS + final_output
+    return input_tokens, output_tokens, calls + 1
 
-    # Cost
-    # Calculate cost for this step
-    usage = getattr(response, "usage_metadata", None) or {}
-    input_tokens = usage.get("input_tokens", 50)
-    output_tokens = usage.get("output_tokens", 30)
-    step_cost = estimate_cost(0, input_tokens, output_tokens)
+
+def _apply_summary(state: AgentState, response, content: str, prompt: list,
+                   calls: list[tuple[list, object]], map_chunks: int, levels: int) -> dict:
+    """Build the summary answer + cost/trace update (final call plus any map/reduce calls)."""
+    input_tokens = output_tokens = cached_tokens = 0
+    for call_prompt, call_response in [*calls, (prompt, response)]:
+        call_in, call_out = usage_tokens(call_response, call_prompt, TIER_MODELS[0])
+        input_tokens += call_in
+        output_tokens += call_out
+        cached_tokens += cached_input_tokens(call_response)
+    step_cost = estimate_cost(0, input_tokens, output_tokens, cached_tokens)
 
     trace_entry = {
         "node": "summarize",
         "model": "tier_0",
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "cached_input_tokens": cached_tokens,
         "cost": step_cost,
+        "cache_savings": cache_savings(0, cached_tokens),
         "content_length": len(content),
+        "mode": "map_reduce" if calls else "single",
+        "llm_calls": len(calls) + 1,
+        "map_chunks": map_chunks,
+        "reduce_levels": levels,      # merge rounds, the final call included
     }
 
-    prev_cost = state.get("total_cost", 0.0)
-    prev_trace = state.get("trace_log", [])
-
     return {
         "final_answer": response.content,
-        "total_cost": prev_cost + step_cost,
-        "trace_log": prev_trace + [trace_entry],
+        "total_cost": step_cost,
+        "token_usage": {"input": input_tokens, "cached_input": cached_tokens, "output": output_tokens},
+        "trace_log": [trace_entry],
         "current_node": "summarize",
     }
@@ -2,39 +2,79 @@
 """
 Enterprise Ops Copilot — Agent State
 Central TypedDict that flows through every LangGraph node.
+
+Accumulating fields use LangGraph reducers, so nodes return only their
+delta (one trace entry, this step's cost/tokens) and LangGraph merges it.
+That keeps updates from parallel branches from overwriting each other.
+
+With a session checkpointer the state outlives a single run: messages and
+total_cost / token_usage carry over between turns, while ingest_user
+resets the per-run fields (answer, citations, retrieved chunks, results).
 """
 from __future__ import annotations
-from typing import Any, Optional
+import operator
+from typing import Annotated, Any, Optional
 from typing_extensions import TypedDict
 from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
+from config import TRACE_LOG_MAX_ENTRIES
+
+
+# ── Reducers ────────────────────────────────────────────────────
+
+def append_trace(left: Optional[list], right: Optional[list]) -> list:
+    """Append trace entries; keep only the newest TRACE_LOG_MAX_ENTRIES (0 = unbounded)."""
+    merged = (left or []) + (right or [])
+    if TRACE_LOG_MAX_ENTRIES and len(merged) > TRACE_LOG_MAX_ENTRIES:
+        merged = merged[-TRACE_LOG_MAX_ENTRIES:]
+    return merged
+
+
+def add_usage(left: Optional[dict], right: Optional[dict]) -> dict:
+    """Sum token counters key by key ({"input": N, "output": M, ...})."""
+    merged = dict(left or {})
+    for key, value in (right or {}).items():
+        merged[key] = merged.get(key, 0) + value
+    return merged
 
 
 class AgentState(TypedDict, total=False):
     """Shared state for the Enterprise Ops Copilot graph."""
 
     # ── Conversation ────────────────────────────────────────────
-    messages: list[BaseMessage]
+    messages: Annotated[list[BaseMessage], add_messages]   # new turns append; history persists per session
+    conversation_summary: str          # Tier 0 summary of turns compacted out of messages
+
+    # ── Caller (set by the server; keys the budget ledger) ──────
+    session_id: str
+    tenant_id: str
+    user_role: str                     # e.g. "support_agent"; shown to the router
 
     # ── Routing decisions (set by router skill) ─────────────────
     intent: str                        # qa | action | multi_step | summarize | compliance
     required_tools: list[str]          # tool names the router selected
     llm_tier: int                      # 0, 1, or 2
     risk_level: str                    # low | medium | high | critical
+    dispatch: dict[str, Any]           # {"tool", "params", "message_id"} — structured action for the message with that id, skips the LLM
 
     # ── Budget tracking ─────────────────────────────────────────
-    budget_remaining: float            # USD remaining for this run
-    total_cost: float                  # USD spent so far
-    token_usage: dict[str, int]        # {"input": N, "output": M}
+    budget_remaining: float                          # USD remaining for this run
+    total_cost: Annotated[float, operator.add]       # USD spent so far (nodes return their step cost)
+    run_cost_start: float                            # total_cost when this run began (per-run budget)
+    token_usage: Annotated[dict[str, int], add_usage]  # {"input": N, "cached_input": C, "output": M}
+    cost_estimate: dict[str, Any]      # budget_guard's pre-flight estimate of the next LLM call
+    ledger_reservation: str            # budget ledger hold for this run, settled by final_response
 
     # ── Retrieval ───────────────────────────────────────────────
-    retrieved_chunks: list[dict[str, Any]]   # [{text, source, score}]
+    retrieved_chunks: list[dict[str, Any]]   # [{id, text, source, score, marker, tool}]
     citations: list[str]                     # formatted citation strings
 
     # ── Output ──────────────────────────────────────────────────
     final_answer: str
     action_result: dict[str, Any]      # result from tool execution
     compliance_result: dict[str, Any]  # {risk_level, recommendation, escalation_needed}
+    error: str                         # set when a node stops the run (e.g. budget_exhausted)
 
     # ── Observability ───────────────────────────────────────────
-    trace_log: list[dict[str, Any]]    # [{node, timestamp, model, tokens, cost}]
+    trace_log: Annotated[list[dict[str, Any]], append_trace]   # [{node, timestamp, model, tokens, cost}]
     current_node: str                  # which node is executing
\ No newline at end of file
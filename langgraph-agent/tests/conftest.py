@@ -0,0 +1,25 @@
+# conftest.py
+"""
+Enterprise Ops Copilot — Test Configuration
+Every test runs against the mock LLM with in-memory sessions and ledger;
+anything written to local state goes to a throwaway DATA_DIR. config.py
+reads the environment at import, so this runs before any project module.
+Tests that need a real backend (SQLite ledger, checkpointer, corpus
+files) build it themselves under tmp_path.
+"""
+import os
+import tempfile
+
+os.environ.update({
+    "MOCK_LLM": "true",
+    "MOCK_LLM_SIMULATE": "false",
+    "MOCK_LLM_LATENCY_MS": "0",
+    "MOCK_ERROR_RATE": "0",
+    "MOCK_TIMEOUT_RATE": "0",
+    "CHECKPOINT_BACKEND": "memory",
+    "LEDGER_BACKEND": "memory",
+    "WARMUP_ON_STARTUP": "false",
+    "CORPUS_PATH": "",
+    "INGEST_DIR": "",
+    "DATA_DIR": tempfile.mkdtemp(prefix="ops-copilot-tests-"),
+})
@@ -0,0 +1,74 @@
+"""Budget guard and ledger settlement on the async (server) path."""
+import asyncio
+import threading
+import pytest
+from langchain_core.messages import HumanMessage
+import budget
+from graph import get_graph
+from ledger import InMemoryLedger
+
+
+class RecordingLedger(InMemoryLedger):
+    """InMemoryLedger that records the thread each call runs on."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls: list[tuple[str, int]] = []
+
+    def headroom(self, accounts):
+        self.calls.append(("headroom", threading.get_ident()))
+        return super().headroom(accounts)
+
+    def reserve(self, accounts, amount):
+        self.calls.append(("reserve", threading.get_ident()))
+        return super().reserve(accounts, amount)
+
+    def settle(self, reservation_id, actual):
+        self.calls.append(("settle", threading.get_ident()))
+        return super().settle(reservation_id, actual)
+
+
+@pytest.fixture
+def ledger(monkeypatch):
+    ledger = RecordingLedger()
+    monkeypatch.setattr(budget, "get_ledger", lambda: ledger)
+    monkeypatch.setattr(budget, "LEDGER_RESERVE_MIN_TIER", 0)
+    return ledger
+
+
+def _state(question: str) -> dict:
+    return {"messages": [HumanMessage(content=question)], "session_id": "budget-async", "tenant_id": "acme"}
+
+
+def test_ainvoke_calls_the_ledger_off_the_event_loop(ledger):
+    async def run():
+        result = await get_graph().ainvoke(_state("Is this medical claim HIPAA compliant?"))
+        return result, threading.get_ident()
+
+    result, loop_thread = asyncio.run(run())
+    assert [name for name, _ in ledger.calls] == ["headroom", "reserve", "settle"]
+    assert all(thread != loop_thread for _, thread in ledger.calls)
+    assert result["ledger_reservation"] == ""
+    assert ledger.balances("tenant:acme")["reserved"] == 0.0
+
+
+def test_failed_skill_releases_its_reservation_off_the_event_loop(ledger, monkeypatch):
+    import graph
+
+    async def fail(state):
+        raise RuntimeError("compliance backend down")
+
+    monkeypatch.setitem(graph.ALL_ASYNC_SKILLS, "compliance_check", fail)
+    graph.get_graph.cache_clear()
+    try:
+        async def run():
+            with pytest.raises(RuntimeError):
+                await graph.get_graph().ainvoke(_state("Is this medical claim HIPAA compliant?"))
+            return threading.get_ident()
+
+        loop_thread = asyncio.run(run())
+    finally:
+        graph.get_graph.cache_clear()
+    assert [name for name, _ in ledger.calls] == ["headroom", "reserve", "settle"]
+    assert all(thread != loop_thread for _, thread in ledger.calls)
+    assert ledger.balances("tenant:acme")["reserved"] == 0.0
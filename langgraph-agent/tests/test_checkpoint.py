@@ -0,0 +1,166 @@
+"""SQLite checkpointer: session resume, retention, TTL expiry and the latest-checkpoint cache."""
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+import checkpoint as checkpoint_module
+from checkpoint import SQLiteCheckpointer
+from graph import build_graph, session_config
+
+QUESTIONS = [
+    "What is the refund policy?",
+    "And for enterprise customers?",
+    "Who approves exceptions?",
+]
+
+
+class Clock:
+    """Stands in for the time module inside checkpoint.py."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "checkpoints.db")
+
+
+@pytest.fixture
+def open_checkpointer(db_path):
+    opened = []
+
+    def open_(**kwargs):
+        checkpointer = SQLiteCheckpointer(db_path, **kwargs)
+        opened.append(checkpointer)
+        return checkpointer
+
+    yield open_
+    for checkpointer in opened:
+        checkpointer.close()
+
+
+def _ask(graph, session_id: str, question: str) -> dict:
+    return graph.invoke({"messages": [HumanMessage(content=question)]}, config=session_config(session_id))
+
+
+def _put(checkpointer: SQLiteCheckpointer, session_id: str) -> dict:
+    return checkpointer.put(session_config(session_id), empty_checkpoint(), {}, {})
+
+
+def _message_count(checkpointer: SQLiteCheckpointer, session_id: str) -> int:
+    latest = checkpointer.get_tuple(session_config(session_id))
+    return len(latest.checkpoint["channel_values"]["messages"])
+
+
+def test_session_resumes_from_a_fresh_connection(open_checkpointer):
+    first = build_graph(open_checkpointer())
+    _ask(first, "s1", QUESTIONS[0])
+    _ask(first, "s1", QUESTIONS[1])
+
+    resumed = build_graph(open_checkpointer())
+    result = _ask(resumed, "s1", QUESTIONS[2])
+
+    assert [m.content for m in result["messages"] if isinstance(m, HumanMessage)] == QUESTIONS
+    assert len(result["messages"]) == 6
+    assert _ask(resumed, "s2", QUESTIONS[0])["messages"][0].content == QUESTIONS[0]
+
+
+def test_retention_keeps_the_newest_checkpoints_and_their_writes(open_checkpointer):
+    checkpointer = open_checkpointer(keep_per_session=3)
+    graph = build_graph(checkpointer)
+    for question in QUESTIONS:
+        _ask(graph, "s1", question)
+    _ask(graph, "s2", QUESTIONS[0])
+
+    kept = list(checkpointer.list(session_config("s1")))
+    assert len(kept) == 3
+    assert [c.config["configurable"]["checkpoint_id"] for c in kept] == sorted(
+        (c.config["configurable"]["checkpoint_id"] for c in kept), reverse=True
+    )
+    assert kept[0].checkpoint == checkpointer.get_tuple(session_config("s1")).checkpoint
+    assert len(list(checkpointer.list(session_config("s2")))) == 3
+    orphaned = checkpointer._conn.execute(
+        "SELECT COUNT(*) FROM writes w WHERE NOT EXISTS (SELECT 1 FROM checkpoints c WHERE "
+        "c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns AND c.checkpoint_id = w.checkpoint_id)"
+    ).fetchone()[0]
+    assert orphaned == 0
+    assert len(_ask(graph, "s1", "One more question")["messages"]) == 8
+
+
+def test_idle_sessions_expire_after_ttl(open_checkpointer, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(checkpoint_module, "time", clock)
+    checkpointer = open_checkpointer(ttl_s=600)
+    _put(checkpointer, "idle")
+    _put(checkpointer, "active")
+
+    clock.now += 500
+    _put(checkpointer, "active")
+    assert checkpointer.delete_expired() == 0
+
+    clock.now += 200
+    assert checkpointer.delete_expired() == 1
+    assert checkpointer.get_tuple(session_config("idle")) is None
+    assert checkpointer.get_tuple(session_config("active")) is not None
+
+
+def test_put_sweeps_expired_sessions(open_checkpointer, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(checkpoint_module, "time", clock)
+    checkpointer = open_checkpointer(ttl_s=600)
+    _put(checkpointer, "idle")
+
+    clock.now += 30
+    _put(checkpointer, "active")
+    assert checkpointer.get_tuple(session_config("idle")) is not None
+
+    clock.now += 600
+    _put(checkpointer, "active")
+    assert checkpointer.get_tuple(session_config("idle")) is None
+    assert len(list(checkpointer.list(None))) == 2
+
+
+def test_ttl_zero_never_expires(open_checkpointer, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(checkpoint_module, "time", clock)
+    checkpointer = open_checkpointer(ttl_s=0)
+    _put(checkpointer, "s1")
+
+    clock.now += 10 * 365 * 86400
+    _put(checkpointer, "s2")
+    assert checkpointer.get_tuple(session_config("s1")) is not None
+
+
+def test_cache_sees_writes_from_another_connection(open_checkpointer):
+    ours, theirs = open_checkpointer(), open_checkpointer()
+    graph = build_graph(ours)
+    _ask(graph, "s1", QUESTIONS[0])
+    assert _message_count(ours, "s1") == 2
+    assert ("s1", "") in ours._cache
+
+    _ask(build_graph(theirs), "s1", QUESTIONS[1])
+    assert _message_count(ours, "s1") == 4
+    assert len(_ask(graph, "s1", QUESTIONS[2])["messages"]) == 6
+    assert _message_count(theirs, "s1") == 6
+
+    theirs.delete_thread("s1")
+    assert ours.get_tuple(session_config("s1")) is None
+    assert ("s1", "") not in ours._cache
+    assert len(_ask(graph, "s1", QUESTIONS[0])["messages"]) == 2
+
+
+def test_cache_is_bounded_and_optional(open_checkpointer):
+    cached = open_checkpointer(cache_sessions=2)
+    for session_id in ("s1", "s2", "s3"):
+        _put(cached, session_id)
+    assert list(cached._cache) == [("s2", ""), ("s3", "")]
+    assert cached.get_tuple(session_config("s1")) is not None
+    assert list(cached._cache) == [("s3", ""), ("s1", "")]
+
+    uncached = open_checkpointer(cache_sessions=0)
+    _put(uncached, "s4")
+    assert uncached.get_tuple(session_config("s4")) is not None
+    assert not uncached._cache
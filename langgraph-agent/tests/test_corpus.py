@@ -0,0 +1,130 @@
+"""Memory-mapped corpus: BM25 parity with BM25Index, spilled builds and id lookup."""
+import json
+import os
+import random
+import pytest
+import search_index.corpus as corpus_module
+from search_index import BM25Index, Corpus
+from tools.search_docs import MOCK_DOCS
+
+VOCABULARY = [f"term{n}" for n in range(300)] + ["refund", "escalation", "hipaa", "incident", "über", "naïve"]
+
+
+def _documents(count: int, seed: int = 7) -> list[dict]:
+    """Synthetic documents with a skewed vocabulary, plus the mock policy documents."""
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(len(VOCABULARY))]
+    docs = [
+        {
+            "id": f"CHUNK-{n:05d}",
+            "text": " ".join(rng.choices(VOCABULARY, weights, k=rng.randint(5, 60))),
+            "source": f"Synthetic source {n % 17}",
+        }
+        for n in range(count)
+    ]
+    docs += [{key: doc[key] for key in ("id", "text", "source")} for doc in MOCK_DOCS]
+    return docs
+
+
+def _queries(count: int, seed: int = 11) -> list[str]:
+    rng = random.Random(seed)
+    queries = [" ".join(rng.sample(VOCABULARY, rng.randint(1, 4))) for _ in range(count)]
+    return queries + ["refund policy", "HIPAA PHI compliance", "P1 escalation", "nothing-matches-this", ""]
+
+
+@pytest.fixture(scope="module")
+def docs():
+    return _documents(2000)
+
+
+def _files(path: str) -> dict[str, bytes]:
+    contents = {}
+    for name in sorted(os.listdir(path)):
+        with open(os.path.join(path, name), "rb") as f:
+            contents[name] = f.read()
+    return contents
+
+
+def test_search_ranks_like_bm25_index(docs, tmp_path):
+    corpus = Corpus.build(str(tmp_path / "corpus"), docs)
+    index = BM25Index()
+    for doc in docs:
+        index.add(doc["id"], doc["text"], doc)
+
+    for query in _queries(200):
+        for k in (1, 5, 20):
+            expected = index.search(query, k)
+            actual = corpus.search(query, k)
+            assert [doc_id for _, doc_id, _ in actual] == [doc_id for _, doc_id, _ in expected], query
+            assert [score for score, _, _ in actual] == pytest.approx([score for score, _, _ in expected])
+            assert [document for _, _, document in actual] == [document for _, _, document in expected]
+
+
+def test_spilled_build_is_byte_identical(docs, tmp_path, monkeypatch):
+    write_run = corpus_module._write_run
+    runs = []
+
+    def counted(*args):
+        runs.append(write_run(*args))
+        return runs[-1]
+
+    monkeypatch.setattr(corpus_module, "_write_run", counted)
+    in_memory = str(tmp_path / "in-memory")
+    spilled = str(tmp_path / "spilled")
+    Corpus.build(in_memory, docs)
+    assert runs == []
+
+    Corpus.build(spilled, docs, spill_entries=1000)
+    assert len(runs) > 10
+    assert not os.path.exists(os.path.join(spilled, "_runs"))
+    assert _files(spilled) == _files(in_memory)
+
+
+def test_load_reopens_a_built_corpus(docs, tmp_path):
+    path = str(tmp_path / "corpus")
+    Corpus.build(path, docs)
+    corpus = Corpus.load(path)
+
+    assert len(corpus) == len(docs)
+    assert [doc_id for doc_id, _ in corpus.items()] == [doc["id"] for doc in docs]
+    for doc in (docs[0], docs[1234], docs[-1]):
+        assert doc["id"] in corpus
+        assert corpus.get(doc["id"]) == doc
+    assert "CHUNK-99999" not in corpus
+    assert corpus.get("") is None
+
+
+def test_missing_columns_are_stored_empty(tmp_path):
+    corpus = Corpus.build(str(tmp_path / "corpus"), [
+        {"id": "a", "text": "refund policy", "source": "Policy Manual"},
+        {"id": "b", "text": "refund window"},
+    ], columns=("source", "doc_id"))
+
+    assert corpus.columns == ("id", "text", "source", "doc_id")
+    assert corpus.get("b") == {"id": "b", "text": "refund window", "source": "", "doc_id": ""}
+
+
+def test_empty_corpus(tmp_path):
+    corpus = Corpus.build(str(tmp_path / "corpus"), [])
+    assert len(corpus) == 0
+    assert corpus.search("refund") == []
+    assert corpus.get("a") is None
+    assert list(corpus.items()) == []
+
+
+def test_duplicate_ids_are_rejected(tmp_path):
+    with pytest.raises(ValueError, match="duplicate document id 'a'"):
+        Corpus.build(str(tmp_path / "corpus"), [{"id": "a", "text": "x"}, {"id": "b", "text": "y"}, {"id": "a", "text": "z"}])
+
+
+def test_load_rejects_another_format(tmp_path):
+    path = str(tmp_path / "corpus")
+    Corpus.build(path, [{"id": "a", "text": "x"}])
+    meta_path = os.path.join(path, "meta.json")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    with open(meta_path, "w") as f:
+        json.dump({**meta, "format": corpus_module.FORMAT_VERSION + 1}, f)
+
+    with pytest.raises(ValueError, match="unsupported corpus format"):
+        Corpus.load(path)
@@ -0,0 +1,64 @@
+"""Structured actions (/agent/action) in checkpointed sessions."""
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import server
+from tools import TOOL_MAP
+
+
+@pytest.fixture
+def client():
+    with TestClient(server.app, raise_server_exceptions=False) as client:
+        yield client
+
+
+@pytest.fixture
+def jira_calls(monkeypatch):
+    """Calls of create_jira_ticket; the first one is cancelled partway through the tool."""
+    tool = TOOL_MAP["create_jira_ticket"]
+    create = tool.func
+    calls = []
+
+    def cancelled_once(**params):
+        calls.append(params)
+        if len(calls) == 1:
+            raise asyncio.CancelledError()
+        return create(**params)
+
+    monkeypatch.setattr(tool, "func", cancelled_once)
+    return calls
+
+
+@pytest.mark.parametrize("durability", ["exit", "async"])
+def test_interrupted_action_is_not_replayed_by_next_query(client, jira_calls, monkeypatch, durability):
+    monkeypatch.setattr(server, "CHECKPOINT_DURABILITY", durability)
+    session_id = f"dispatch-interrupted-{durability}"
+
+    response = client.post("/agent/action", json={
+        "action": "create_jira_ticket",
+        "payload": {"summary": "Login fails on mobile", "description": "500 after SSO redirect"},
+        "session_id": session_id,
+    })
+    assert response.status_code == 500
+
+    response = client.post("/agent/query", json={"question": "What is the SLA for P1?", "session_id": session_id})
+    assert response.status_code == 200
+    assert response.json()["intent"] != "action"
+    assert len(jira_calls) == 1
+
+
+def test_each_action_dispatches_once_per_turn(client):
+    session_id = "dispatch-turns"
+    for expression in ("2+2", "3*3"):
+        response = client.post("/agent/action", json={
+            "action": "calculator", "payload": {"expression": expression}, "session_id": session_id,
+        })
+        assert response.status_code == 200
+        body = response.json()
+        assert body["intent"] == "action"
+        nodes = [entry["node"] for entry in body["trace_log"]]
+        assert nodes.count("dispatch_action") == 1
+        assert "route_intent" not in nodes
+
+    response = client.post("/agent/query", json={"question": "What is the refund policy?", "session_id": session_id})
+    assert response.json()["intent"] != "action"
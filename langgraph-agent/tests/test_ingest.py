@@ -0,0 +1,192 @@
+"""Document ingestion: upsert, delete and --full semantics, chunking, and the generation swap."""
+import json
+import os
+import pytest
+from ingest import chunk_document, ingest, read_documents
+from search_index import Corpus, generations
+from tokens import count_tokens
+
+FAQ = """# FAQ
+
+## Refunds
+
+Full refunds within 30 days of purchase.
+
+## Escalation
+
+P1 incidents page the on-call lead within 15 minutes.
+"""
+
+SLA = "Enterprise support answers P2 tickets within one business day."
+
+
+@pytest.fixture
+def docs_dir(tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "policies").mkdir(parents=True)
+    (docs / "faq.md").write_text(FAQ)
+    (docs / "policies" / "sla.txt").write_text(SLA)
+    (docs / "records.jsonl").write_text("\n".join(json.dumps(record) for record in [
+        {"id": "KB-1", "text": "Reset MFA from the admin console.", "source": "Knowledge Base"},
+        {"id": "KB-2", "text": "Export jobs retry three times."},
+    ]) + "\n")
+    return docs
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / "index")
+
+
+def _run(*args, **kwargs) -> dict:
+    kwargs.setdefault("dense", False)
+    return ingest(*args, **kwargs)
+
+
+def _live(root: str) -> Corpus:
+    return Corpus.load(generations.current(root))
+
+
+def _documents(corpus: Corpus) -> dict[str, list[str]]:
+    """document id → its chunks' text, in chunk order."""
+    documents: dict[str, list[str]] = {}
+    for chunk_id, chunk in sorted(corpus.items()):
+        assert chunk_id.startswith(chunk["doc_id"] + "#")
+        documents.setdefault(chunk["doc_id"], []).append(chunk["text"])
+    return documents
+
+
+def test_first_ingest_indexes_every_document(docs_dir, root):
+    report = _run([str(docs_dir)], root=root)
+
+    documents = _documents(_live(root))
+    assert sorted(documents) == ["KB-1", "KB-2", "faq.md", "policies/sla.txt"]
+    assert report["documents"] == 4
+    assert report["chunks"] == report["total_chunks"] == sum(map(len, documents.values()))
+    assert report["kept"] == 0 and report["deleted"] == 0
+    assert _live(root).get("KB-2#0")["source"] == "records.jsonl"
+    assert _live(root).get("faq.md#0")["source"] == "FAQ (faq.md)"
+    assert _live(root).search("refund")[0][2]["doc_id"] == "faq.md"
+
+
+def test_upsert_replaces_only_the_given_documents(docs_dir, root):
+    _run([str(docs_dir)], root=root)
+    before = _documents(_live(root))
+    (docs_dir / "policies" / "sla.txt").write_text("Enterprise support answers P2 tickets within four hours.")
+
+    report = _run([str(docs_dir / "policies" / "sla.txt")], root=root, base=str(docs_dir))
+
+    after = _documents(_live(root))
+    assert after["policies/sla.txt"] == ["Enterprise support answers P2 tickets within four hours."]
+    assert {doc_id: chunks for doc_id, chunks in after.items() if doc_id != "policies/sla.txt"} == {
+        doc_id: chunks for doc_id, chunks in before.items() if doc_id != "policies/sla.txt"
+    }
+    assert report["documents"] == 1
+    assert report["kept"] == sum(len(chunks) for doc_id, chunks in before.items() if doc_id != "policies/sla.txt")
+    assert report["total_chunks"] == report["chunks"] + report["kept"]
+
+
+def test_delete_drops_documents_and_reports_unknown_ids(docs_dir, root):
+    _run([str(docs_dir)], root=root)
+    before = _documents(_live(root))
+
+    report = _run(delete=["faq.md", "KB-2", "missing.md"], root=root)
+
+    after = _documents(_live(root))
+    assert sorted(after) == ["KB-1", "policies/sla.txt"]
+    assert report["deleted"] == 2
+    assert report["not_found"] == ["missing.md"]
+    assert report["kept"] == len(before["KB-1"]) + len(before["policies/sla.txt"])
+    assert "faq.md#0" not in _live(root)
+
+
+def test_upsert_and_delete_in_one_run(docs_dir, root):
+    _run([str(docs_dir / "records.jsonl")], root=root)
+    (docs_dir / "extra.jsonl").write_text(json.dumps({"id": "KB-3", "text": "Rotate API keys yearly."}) + "\n")
+
+    report = _run([str(docs_dir / "extra.jsonl")], ["KB-1"], root=root)
+
+    assert sorted(_documents(_live(root))) == ["KB-2", "KB-3"]
+    assert (report["documents"], report["kept"], report["deleted"]) == (1, 1, 1)
+
+
+def test_full_keeps_only_the_given_documents(docs_dir, root):
+    _run([str(docs_dir)], root=root)
+
+    report = _run([str(docs_dir / "policies")], root=root, base=str(docs_dir), full=True)
+
+    assert sorted(_documents(_live(root))) == ["policies/sla.txt"]
+    assert report["kept"] == 0
+    assert report["total_chunks"] == report["chunks"]
+
+
+def test_duplicate_input_document_publishes_nothing(docs_dir, root):
+    _run([str(docs_dir / "records.jsonl")], root=root)
+    live = generations.current(root)
+
+    with pytest.raises(ValueError, match="appears twice"):
+        _run([str(docs_dir / "records.jsonl"), str(docs_dir / "records.jsonl")], root=root)
+
+    assert generations.current(root) == live
+    assert generations.generations(root) == ["gen-000001"]
+    assert not [name for name in os.listdir(root) if name.startswith(".build-")]
+
+
+def test_generations_swap_and_prune(docs_dir, root):
+    _run([str(docs_dir)], root=root, keep=2)
+    first = _live(root)
+    for _ in range(3):
+        _run([str(docs_dir / "faq.md")], root=root, keep=2)
+
+    assert generations.generations(root) == ["gen-000003", "gen-000004"]
+    assert generations.current(root) == os.path.join(root, "gen-000004")
+    # A worker still mapping a pruned generation keeps serving from it
+    assert first.get("KB-1#0")["text"] == "Reset MFA from the admin console."
+
+
+def test_prune_never_removes_the_live_generation(root):
+    for _ in range(3):
+        with generations.writer(root) as build:
+            generations.publish(root, build, keep=10)
+    with open(os.path.join(root, generations.CURRENT_FILE), "w") as f:
+        f.write("gen-000001\n")
+
+    assert generations.prune(root, keep=1) == ["gen-000002"]
+    assert generations.generations(root) == ["gen-000001", "gen-000003"]
+
+
+def test_unpublished_build_is_discarded(root):
+    with pytest.raises(RuntimeError):
+        with generations.writer(root) as build:
+            open(os.path.join(build, "partial"), "w").close()
+            raise RuntimeError("build failed")
+
+    assert generations.current(root) is None
+    assert generations.generations(root) == []
+    assert not [name for name in os.listdir(root) if name.startswith(".build-")]
+
+
+def test_markdown_sections_never_share_a_chunk():
+    chunks = list(chunk_document({"id": "faq.md", "text": FAQ}, max_tokens=500))
+
+    assert [chunk["id"] for chunk in chunks] == ["faq.md#0", "faq.md#1"]
+    assert chunks[0]["text"].startswith("# FAQ\n\n## Refunds")
+    assert chunks[1]["text"].startswith("## Escalation")
+
+
+def test_long_paragraphs_split_under_the_token_limit():
+    text = " ".join(f"Sentence number {n} describes the export retry policy." for n in range(200))
+    chunks = list(chunk_document({"id": "long.txt", "text": text}, max_tokens=64))
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk["text"]) <= 64 for chunk in chunks)
+    assert " ".join(chunk["text"] for chunk in chunks).split() == text.split()
+
+
+def test_read_documents_rejects_missing_paths_and_bad_records(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        list(read_documents([str(tmp_path / "missing.md")]))
+    bad = tmp_path / "bad.jsonl"
+    bad.write_text(json.dumps({"id": "KB-9"}) + "\n")
+    with pytest.raises(ValueError, match="bad.jsonl:1"):
+        list(read_documents([str(bad)]))
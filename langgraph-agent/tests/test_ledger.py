@@ -0,0 +1,131 @@
+"""Budget ledger backends: reservations, settlement, expiry and cross-connection atomicity."""
+import sqlite3
+import threading
+import pytest
+import ledger as ledger_module
+from ledger import InMemoryLedger, SQLiteLedger
+
+ACCOUNT = "tenant:acme"
+
+
+class Clock:
+    """Stands in for the time module inside ledger.py."""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ledger_module, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_ledger(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return InMemoryLedger(**kwargs)
+        return SQLiteLedger(str(tmp_path / "ledger.db"), **kwargs)
+    return make
+
+
+def test_reserve_refuses_more_than_the_limit(make_ledger):
+    ledger = make_ledger()
+    assert ledger.reserve({ACCOUNT: 1.0}, 0.6) is not None
+    assert ledger.reserve({ACCOUNT: 1.0}, 0.6) is None
+    assert ledger.headroom({ACCOUNT: 1.0})[ACCOUNT] == pytest.approx(0.4)
+    assert ledger.balances(ACCOUNT)["reserved"] == pytest.approx(0.6)
+
+
+def test_reserve_holds_all_accounts_or_none(make_ledger):
+    ledger = make_ledger()
+    accounts = {ACCOUNT: 10.0, "session:s1": 0.5}
+    assert ledger.reserve(accounts, 1.0) is None
+    assert ledger.balances(ACCOUNT)["reserved"] == 0.0
+    assert ledger.balances("session:s1")["reserved"] == 0.0
+
+
+def test_settle_refunds_the_unused_hold(make_ledger):
+    ledger = make_ledger()
+    reservation_id = ledger.reserve({ACCOUNT: 1.0, "session:s1": 1.0}, 0.6)
+    ledger.settle(reservation_id, 0.2)
+    for account in (ACCOUNT, "session:s1"):
+        assert ledger.balances(account)["spent"] == pytest.approx(0.2)
+        assert ledger.balances(account)["reserved"] == pytest.approx(0.0)
+    assert ledger.headroom({ACCOUNT: 1.0})[ACCOUNT] == pytest.approx(0.8)
+
+
+def test_debit_without_reservation(make_ledger):
+    ledger = make_ledger()
+    ledger.debit([ACCOUNT], 0.3)
+    ledger.debit([ACCOUNT], 0.3)
+    assert ledger.balances(ACCOUNT) == {"window": ledger.window(), "spent": pytest.approx(0.6), "reserved": 0.0}
+    assert ledger.reserve({ACCOUNT: 1.0}, 0.5) is None
+
+
+def test_abandoned_reservation_expires_after_ttl(make_ledger, clock):
+    ledger = make_ledger(window_s=0, reservation_ttl_s=300)
+    assert ledger.reserve({ACCOUNT: 1.0}, 0.8) is not None    # never settled: its worker crashed
+    clock.now += 299
+    assert ledger.reserve({ACCOUNT: 1.0}, 0.8) is None
+    clock.now += 2
+    assert ledger.reserve({ACCOUNT: 1.0}, 0.8) is not None
+    assert ledger.balances(ACCOUNT)["reserved"] == pytest.approx(0.8)
+
+
+def test_spend_resets_each_window(make_ledger, clock):
+    ledger = make_ledger(window_s=3600)
+    ledger.debit([ACCOUNT], 1.0)
+    assert ledger.headroom({ACCOUNT: 1.0})[ACCOUNT] == pytest.approx(0.0)
+    clock.now += 3600
+    assert ledger.headroom({ACCOUNT: 1.0})[ACCOUNT] == pytest.approx(1.0)
+
+
+def test_connections_contending_for_one_account_never_overcommit(tmp_path):
+    # Two ledgers on one file stand in for two uvicorn workers
+    path = str(tmp_path / "ledger.db")
+    workers = [SQLiteLedger(path), SQLiteLedger(path)]
+    granted, errors = [], []
+    start = threading.Barrier(16)
+
+    def reserve(ledger):
+        start.wait()
+        try:
+            for _ in range(10):
+                if ledger.reserve({ACCOUNT: 1.0}, 0.1) is not None:
+                    granted.append(1)
+        except sqlite3.Error as e:     # e.g. "database is locked" from a lock upgrade
+            errors.append(e)
+
+    threads = [threading.Thread(target=reserve, args=(workers[i % 2],)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(granted) == 10
+    assert workers[0].balances(ACCOUNT)["reserved"] == pytest.approx(1.0)
+    assert workers[1].headroom({ACCOUNT: 1.0})[ACCOUNT] == pytest.approx(0.0)
+
+
+def test_reserve_waits_for_another_connections_write_lock(tmp_path):
+    path = str(tmp_path / "ledger.db")
+    ledger = SQLiteLedger(path, busy_timeout_ms=5000)
+    other = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    other.execute("INSERT INTO balances (account, window, spent, reserved) VALUES (?, ?, 0.7, 0)", (ACCOUNT, ledger.window()))
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(ledger.reserve({ACCOUNT: 1.0}, 0.5)))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive()           # blocked on the write lock, not reading the uncommitted balance
+    other.execute("COMMIT")
+    waiter.join(5)
+    assert result == [None]            # sees the committed spend: 0.7 + 0.5 > 1.0
+    other.close()
@@ -0,0 +1,22 @@
+"""Retrieval skill: the trace records the tools that ran, not the ones the router asked for."""
+import asyncio
+import pytest
+from langchain_core.messages import HumanMessage
+from skills.retrieval import aretrieve, retrieve
+
+ROUTED = ["search_docs", "salesforce_lookup", "cpq_rules_lookup"]
+
+
+def _state(question: str) -> dict:
+    return {"messages": [HumanMessage(content=question)], "required_tools": ROUTED}
+
+
+@pytest.mark.parametrize("run", [retrieve, lambda state: asyncio.run(aretrieve(state))], ids=["sync", "async"])
+def test_trace_lists_only_tools_that_ran(run):
+    without_case = run(_state("What is the refund policy?"))["trace_log"][0]
+    assert without_case["tools_called"] == ["search_docs"]
+    assert set(without_case["tool_status"]) == {"search_docs"}
+
+    with_case = run(_state("Status of CASE-1042?"))["trace_log"][0]
+    assert with_case["tools_called"] == ["search_docs", "salesforce_lookup"]
+    assert set(with_case["tool_status"]) == set(with_case["tools_called"])
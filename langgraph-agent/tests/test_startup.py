@@ -0,0 +1,40 @@
+"""Cold start: `import server` stays cheap and leaves the heavy libraries unloaded."""
+import json
+import os
+import subprocess
+import sys
+
+HERE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Cumulative `import server` time, best of a few fresh interpreters. Eager
+# imports took ~1.3s here and lazy ones ~0.4s; override on slow runners.
+IMPORT_BUDGET_S = float(os.getenv("STARTUP_IMPORT_BUDGET_S", "0.9"))
+ATTEMPTS = 3
+
+# Deferred until the first graph run or warm-up (see benchmarks/bench_startup.py)
+HEAVY_MODULES = ("langchain_core", "langgraph", "openai", "numpy", "tiktoken")
+
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=HERE, env=os.environ.copy(), capture_output=True, text=True, check=True,
+    )
+
+
+def _import_seconds() -> float:
+    """Cumulative time of `import server` as reported by -X importtime."""
+    stderr = _python("-X", "importtime", "-c", "import server").stderr
+    for line in stderr.splitlines():
+        if line.startswith("import time:") and line.rstrip().endswith("| server"):
+            return int(line.split("|")[1]) / 1e6
+    raise AssertionError(f"no importtime line for server in:\n{stderr[-2000:]}")
+
+
+def test_import_server_within_budget():
+    seconds = min(_import_seconds() for _ in range(ATTEMPTS))
+    assert seconds <= IMPORT_BUDGET_S, f"import server took {seconds:.3f}s (budget {IMPORT_BUDGET_S:.3f}s)"
+
+
+def test_import_server_defers_heavy_modules():
+    probe = f"import json, sys, server; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    assert json.loads(_python("-c", probe).stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,56 @@
+# text_split.py
+"""
+Enterprise Ops Copilot — Text Splitting
+Token-bounded splitting shared by map-reduce summarization
+(skills/summarizer.py) and document ingestion (ingest.py).
+
+Text breaks at paragraphs first; a paragraph over the limit breaks at
+sentences, and a sentence over the limit into runs of words. Pieces are
+generated lazily, so a long document is never split all at once.
+"""
+from __future__ import annotations
+import re
+from typing import Iterator, Optional
+from tokens import count_tokens
+
+PARAGRAPH_RE = re.compile(r"\n\s*\n")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def split_unit(text: str, max_tokens: int, model: Optional[str] = None) -> Iterator[str]:
+    """A paragraph as-is, or its sentences (or word runs) if it's over max_tokens."""
+    if not text:
+        return
+    if count_tokens(text, model) <= max_tokens:
+        yield text
+        return
+    for sentence in SENTENCE_END_RE.split(text):
+        if count_tokens(sentence, model) <= max_tokens:
+            yield sentence
+            continue
+        words, used = [], 0
+        for word in sentence.split():
+            cost = count_tokens(word + " ", model)
+            if words and used + cost > max_tokens:
+                yield " ".join(words)
+                words, used = [], 0
+            words.append(word)
+            used += cost
+        if words:
+            yield " ".join(words)
+
+
+def pack_paragraphs(text: str, max_tokens: int, model: Optional[str] = None) -> Iterator[str]:
+    """Paragraphs of text joined into pieces of at most max_tokens."""
+    current, used = "", 0
+    for paragraph in PARAGRAPH_RE.split(text):
+        for i, unit in enumerate(split_unit(paragraph.strip(), max_tokens, model)):
+            cost = count_tokens(unit, model) + 1
+            if current and used + cost > max_tokens:
+                yield current
+                current, used = "", 0
+            sep = " " if i else "\n\n"
+            current = current + sep + unit if current else unit
+            used += cost
+    if current:
+        yield current
@@ -0,0 +1,98 @@
+# tokens.py
+"""
+Enterprise Ops Copilot — Token Counting
+Local token counts for rendered prompts and responses.
+
+Uses tiktoken's encoding for the model when the package (and its
+encoding file) is available, otherwise ~4 characters per token — close
+enough for English prose on OpenAI tokenizers. TOKENIZER=heuristic skips
+tiktoken entirely (e.g. air-gapped hosts where the encoding can't be
+fetched). Each chat message adds a few tokens of framing.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Any, Iterable, Optional
+from config import TOKENIZER, TIER_MODELS
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4   # role + separators per chat message
+REPLY_PRIMING_TOKENS = 3      # every reply is primed with <|start|>assistant<|message|>
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """tiktoken encoding for a model, or None to use the heuristic."""
+    if TOKENIZER == "heuristic":
+        return None
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Encoding file not cached and not downloadable — fall back for good
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Token count of a string for a model (default: the Tier 0 model)."""
+    if not text:
+        return 0
+    encoding = _encoding(model or TIER_MODELS[0])
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def message_text(message: Any) -> str:
+    """Text content of a chat message (or anything with a str())."""
+    content = getattr(message, "content", message)
+    if isinstance(content, list):   # multi-part content blocks
+        return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+
+def count_message_tokens(messages: Iterable[Any], model: Optional[str] = None) -> int:
+    """Prompt tokens for a list of chat messages."""
+    return sum(count_tokens(message_text(m), model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def count_prompt_tokens(messages: Iterable[Any], model: Optional[str] = None) -> int:
+    """Input tokens billed for a chat call: the messages plus reply priming."""
+    return count_message_tokens(messages, model) + REPLY_PRIMING_TOKENS
+
+
+def cached_input_tokens(response: Any) -> int:
+    """Prompt tokens the provider served from its prefix cache (0 if not reported)."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    return (usage.get("input_token_details") or {}).get("cache_read") or 0
+
+
+def run_usage(trace_log: list[dict]) -> dict:
+    """Token, cache and cost totals over one run's trace entries."""
+    totals = {"input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0, "cost": 0.0, "cache_savings": 0.0}
+    for entry in trace_log:
+        for key in totals:
+            totals[key] += entry.get(key) or 0
+    totals["cost"] = round(totals["cost"], 6)
+    totals["cache_savings"] = round(totals["cache_savings"], 6)
+    totals["cache_hit_rate"] = (
+        round(totals["cached_input_tokens"] / totals["input_tokens"], 3) if totals["input_tokens"] else 0.0
+    )
+    return totals
+
+
+def usage_tokens(response: Any, prompt: list, model: Optional[str] = None) -> tuple[int, int]:
+    """(input_tokens, output_tokens) from usage_metadata; counted locally if the provider omitted it."""
+    usage = getattr(response, "usage_metadata", None) or {}
+    input_tokens = usage.get("input_tokens")
+    output_tokens = usage.get("output_tokens")
+    if input_tokens is None:
+        input_tokens = count_prompt_tokens(prompt, model)
+    if output_tokens is None:
+        output_tokens = count_tokens(message_text(response), model)
+    return input_tokens, output_tokens
@@ -8,6 +8,7 @@ from tools.salesforce_lookup import salesforce_lookup
 from tools.cpq_rules import cpq_rules_lookup
 from tools.jira_ticket import create_jira_ticket
 from tools.calculator import calculator
+from metrics import instrument_tools
 
 ALL_TOOLS = [
     search_docs,
@@ -17,4 +18,7 @@ ALL_TOOLS = [
     calculator,
 ]
 
-TOOL_MAP = {tool.name: tool for tool in ALL_TOOLS}
\ No newline at end of file
+TOOL_MAP = {tool.name: tool for tool in ALL_TOOLS}
+
+# Per-tool latency and outcome counters (GET /metrics)
+instrument_tools(ALL_TOOLS)
@@ -1,5 +1,13 @@
 """Tool: Search internal docs + knowledge base."""
+import logging
+import os
+import threading
+import time
 from langchain_core.tools import tool
+from search_index import BM25Index, Corpus, generations
+from config import RETRIEVAL_MODE, CORPUS_PATH, DENSE_INDEX_PATH, RRF_K, INGEST_DIR, INGEST_RELOAD_S
+
+logger = logging.getLogger(__name__)
 
 
 MOCK_DOCS = [
@@ -36,15 +44,154 @@ MOCK_DOCS = [
 ]
 
 
+# ── BM25 index over the document store ───────────────────────────
+# In order of precedence:
+#   INGEST_DIR   the live generation published by ingest.py (a Corpus);
+#                each worker looks for a newer one every INGEST_RELOAD_S
+#                and swaps it in without pausing queries
+#   CORPUS_PATH  a read-only memory-mapped Corpus (documents and BM25
+#                postings on disk, shared by every worker)
+#   otherwise    built from MOCK_DOCS at import; use index_document() /
+#                remove_document() to update it incrementally
+doc_index = Corpus.load(CORPUS_PATH) if CORPUS_PATH else BM25Index()
+
+# Dense index, paired with the document index it was made for: the
+# generation's dense/ directory or DENSE_INDEX_PATH (memory-mapped), else
+# built in memory from the document index on first dense/hybrid query.
+_dense_index = None   # (doc_index, DenseIndex)
+
+_generation = None    # INGEST_DIR generation being served
+_checked_at = 0.0
+_reload_lock = threading.Lock()
+
+
+def _read_only(index) -> RuntimeError:
+    return RuntimeError(f"Corpus at {index.path} is read-only; update it with ingest.py or Corpus.build()")
+
+
+def index_document(doc: dict) -> None:
+    """Add or replace a document ({id, text, source, ...}) in the search index."""
+    global _dense_index
+    if isinstance(doc_index, Corpus):
+        raise _read_only(doc_index)
+    doc_index.add(doc["id"], doc["text"], {"id": doc["id"], "text": doc["text"], "source": doc["source"]})
+    if not DENSE_INDEX_PATH:
+        _dense_index = None   # in-memory dense index is rebuilt lazily
+
+
+def remove_document(doc_id: str) -> bool:
+    """Remove a document from the search index."""
+    global _dense_index
+    if isinstance(doc_index, Corpus):
+        raise _read_only(doc_index)
+    removed = doc_index.remove(doc_id)
+    if removed and not DENSE_INDEX_PATH:
+        _dense_index = None
+    return removed
+
+
+if not CORPUS_PATH:
+    for _doc in MOCK_DOCS:
+        index_document(_doc)
+
+
+def reload_index() -> bool:
+    """Switch to the live INGEST_DIR generation if it isn't served yet; returns whether it switched.
+
+    The new Corpus is opened before it replaces doc_index, so queries never
+    wait; a query already running finishes on the index it started with.
+    """
+    global doc_index, _generation
+    path = generations.current(INGEST_DIR) if INGEST_DIR else None
+    if path is None or path == _generation:
+        return False
+    with _reload_lock:
+        if path == _generation:
+            return False
+        try:
+            corpus = Corpus.load(path)
+        except (OSError, ValueError) as e:   # pruned or replaced between reading CURRENT and opening
+            logger.warning("Keeping the current index; cannot open %s: %s", path, e)
+            return False
+        doc_index, _generation = corpus, path
+    logger.info("Serving %s (%d chunks)", path, len(corpus))
+    return True
+
+
+def live_index():
+    """The document index a query should use, checking INGEST_DIR at most every INGEST_RELOAD_S."""
+    global _checked_at
+    if INGEST_DIR:
+        now = time.monotonic()
+        if now - _checked_at >= INGEST_RELOAD_S:
+            _checked_at = now
+            reload_index()
+    return doc_index
+
+
+reload_index()
+
+
+def get_dense_index(index=None):
+    """The dense index for a document index, default the live one (lazy; needs NumPy)."""
+    global _dense_index
+    index = live_index() if index is None else index
+    if _dense_index is None or _dense_index[0] is not index:
+        from search_index.dense import DenseIndex
+        from llm_selector import get_embedder
+
+        generation_dense = os.path.join(index.path, "dense") if isinstance(index, Corpus) else ""
+        if generation_dense and os.path.isdir(generation_dense):
+            dense = DenseIndex.load(generation_dense, get_embedder())
+        elif DENSE_INDEX_PATH:
+            dense = DenseIndex.load(DENSE_INDEX_PATH, get_embedder())
+        else:
+            docs = list(index.items())
+            dense = DenseIndex.from_texts(
+                [doc_id for doc_id, _ in docs],
+                [payload["text"] for _, payload in docs],
+                get_embedder(),
+            )
+        _dense_index = (index, dense)
+    return _dense_index[1]
+
+
+def _bm25(index, query: str, k: int) -> list[tuple[float, str]]:
+    return [(score, doc_id) for score, doc_id, _ in index.search(query, k=k)]
+
+
+def _dense(index, query: str, k: int) -> list[tuple[float, str]]:
+    # Orthogonal (score <= 0) documents share no features with the query
+    return [(score, doc_id) for score, doc_id in get_dense_index(index).search(query, k=k) if score > 0]
+
+
+def _hybrid(index, query: str, k: int) -> list[tuple[float, str]]:
+    from search_index.dense import reciprocal_rank_fusion
+
+    depth = max(k * 4, 20)   # fuse deeper candidate lists than we return
+    rankings = [
+        [doc_id for _, doc_id in _bm25(index, query, depth)],
+        [doc_id for _, doc_id in _dense(index, query, depth)],
+    ]
+    return reciprocal_rank_fusion(rankings, k=RRF_K)[:k]
+
+
+SEARCH_MODES = {"bm25": _bm25, "dense": _dense, "hybrid": _hybrid}
+
+
 @tool
-def search_docs(query: str) -> list[dict]:
-    """Search internal documents and knowledge base. Returns top matching chunks with citations."""
-    query_lower = query.lower()
-    scored = []
-    for doc in MOCK_DOCS:
-        relevance = sum(1 for word in query_lower.split() if word in doc["text"].lower())
-        scored.append({**doc, "relevance": relevance})
-
-    results = sorted(scored, key=lambda x: x["relevance"], reverse=True)[:3]
-    # Remove the relevance key before returning
-    return [{"id": r["id"], "text": r["text"], "source": r["source"], "score": r["score"]} for r in results]
\ No newline at end of file
+def search_docs(query: str, k: int = 3, mode: str = RETRIEVAL_MODE) -> list[dict]:
+    """Search internal documents and knowledge base. Returns top matching chunks with citations.
+
+    mode: "bm25" (keyword), "dense" (embedding similarity) or "hybrid" (both, fused by rank).
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'. Must be one of {list(SEARCH_MODES)}.")
+
+    index = live_index()   # one generation for the whole query, even across a swap
+    results = []
+    for score, doc_id in SEARCH_MODES[mode](index, query, k):
+        payload = index.get(doc_id)
+        if payload is not None:
+            results.append({**payload, "score": round(score, 4)})
+    return results
@@ -0,0 +1,78 @@
+# warmup.py
+"""
+Enterprise Ops Copilot — Startup Warm-up
+Does the work a cold worker would otherwise do on its first requests, so
+the server can report ready (GET /ready) only once it is done:
+
+  graph          import LangChain / LangGraph and the skills, compile
+                 copilot_graph and the session graph
+  llm_clients    build every tier's client (imports the provider SDK and
+                 opens the shared connection pools)
+  tokenizer      load each tier model's encoding
+  search_index   build or load the dense index when RETRIEVAL_MODE uses it
+                 (the BM25 index is built when the tool module is imported)
+  context_packer import NumPy and build the MinHash parameters
+  prompts        fingerprint the prompt set (request-coalescing key)
+
+No LLM calls are made. Each step is idempotent; warm_up() returns the
+seconds each one took.
+"""
+from __future__ import annotations
+import time
+
+
+def _graph() -> None:
+    from graph import get_graph, get_session_graph
+    get_graph()
+    get_session_graph()
+
+
+def _llm_clients() -> None:
+    from llm_selector import base_llm
+    from config import TIER_MODELS
+    for tier in TIER_MODELS:
+        base_llm(tier)
+
+
+def _tokenizer() -> None:
+    from tokens import count_tokens
+    from config import TIER_MODELS
+    for model in set(TIER_MODELS.values()):
+        count_tokens("warm-up", model)
+
+
+def _search_index() -> None:
+    from tools.search_docs import get_dense_index
+    from config import RETRIEVAL_MODE
+    if RETRIEVAL_MODE in ("dense", "hybrid"):
+        get_dense_index()
+
+
+def _context_packer() -> None:
+    from context_packer import minhash_signature
+    minhash_signature("warm-up")
+
+
+def _prompts() -> None:
+    from prompts.registry import prompt_registry
+    prompt_registry.fingerprint()
+
+
+STEPS = (
+    ("graph", _graph),
+    ("llm_clients", _llm_clients),
+    ("tokenizer", _tokenizer),
+    ("search_index", _search_index),
+    ("context_packer", _context_packer),
+    ("prompts", _prompts),
+)
+
+
+def warm_up() -> dict[str, float]:
+    """Run every warm-up step in order; returns {step: seconds}."""
+    timings = {}
+    for name, step in STEPS:
+        start = time.perf_counter()
+        step()
+        timings[name] = round(time.perf_counter() - start, 4)
+    return timings